@@ -0,0 +1,129 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+
+# Output budget per chunk in a batch (summary plus pseudo code of a small chunk)
+TOKENS_PER_CHUNK = 700
+MAX_BATCH_OUTPUT_TOKENS = 8000
+
+
+@dataclass
+class BatchItem:
+    """A chunk waiting for batched analysis"""
+    key: str
+    chunk: Any
+    flow_context: str = ""
+    tier: Optional[str] = None
+
+
+class BatchAnalyzer:
+    """Packs small chunks into one Claude request that returns a keyed JSON array of analyses"""
+
+    def __init__(self, complete: Callable[[str, int, Optional[str]], str],
+                 max_chunks: int = Config.BATCH_MAX_CHUNKS,
+                 max_chars: int = Config.BATCH_MAX_CHARS,
+                 max_chunk_lines: int = Config.BATCH_MAX_CHUNK_LINES):
+        self.complete = complete
+        self.max_chunks = max_chunks
+        self.max_chars = max_chars
+        self.max_chunk_lines = max_chunk_lines
+        self.stats = {"chunks": 0, "requests": 0, "missing": 0}
+
+    def accepts(self, chunk) -> bool:
+        """Only small chunks are batched; large ones keep a request of their own"""
+        return (chunk.end_line - chunk.start_line + 1 <= self.max_chunk_lines
+                and len(chunk.content) <= self.max_chars // 2)
+
+    def plan(self, items: List[BatchItem]) -> List[List[BatchItem]]:
+        """Group items by model tier and pack them greedily by count and characters"""
+        batches: List[List[BatchItem]] = []
+        by_tier: Dict[Optional[str], List[BatchItem]] = {}
+        for item in items:
+            by_tier.setdefault(item.tier, []).append(item)
+
+        for tier_items in by_tier.values():
+            current, size = [], 0
+            for item in tier_items:
+                item_size = len(item.chunk.content) + len(item.flow_context)
+                if current and (len(current) >= self.max_chunks or size + item_size > self.max_chars):
+                    batches.append(current)
+                    current, size = [], 0
+                current.append(item)
+                size += item_size
+            if current:
+                batches.append(current)
+        return batches
+
+    def build_prompt(self, batch: List[BatchItem]) -> str:
+        sections = []
+        for item in batch:
+            chunk = item.chunk
+            flow = f"Control flow: {item.flow_context}\n" if item.flow_context else ""
+            sections.append(
+                f"### Chunk {item.key}\n"
+                f"Section Type: {chunk.section_type}\n"
+                f"File: {chunk.file_name}\n"
+                f"Lines: {chunk.start_line}-{chunk.end_line}\n"
+                f"{flow}"
+                f"COBOL Code:\n{chunk.content}"
+            )
+        chunks_text = "\n\n".join(sections)
+        keys = ", ".join(item.key for item in batch)
+
+        return f"""
+        Analyze each of the following {len(batch)} COBOL code chunks independently.
+
+        For every chunk provide:
+        - "summary": a concise summary (2-3 sentences) of its main functionality, key variables/data
+          structures and business purpose
+        - "pseudo_code": detailed, structured pseudo code showing the logical flow, data operations and
+          business rules, with readable variable names and comments for complex logic
+
+        {chunks_text}
+
+        Respond with only a JSON array containing exactly one object per chunk, keyed by the chunk id
+        ({keys}):
+        [{{"id": "<chunk id>", "summary": "...", "pseudo_code": "..."}}]
+        """
+
+    @staticmethod
+    def parse_response(response: str, expected: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Valid (summary, pseudo code) per expected chunk id; malformed or unknown entries are dropped"""
+        start, end = response.find('['), response.rfind(']')
+        if start < 0 or end <= start:
+            return {}
+        try:
+            entries = json.loads(response[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+        if not isinstance(entries, list):
+            return {}
+
+        results = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            key = str(entry.get("id", ""))
+            summary, pseudo_code = entry.get("summary"), entry.get("pseudo_code")
+            if key in expected and isinstance(summary, str) and isinstance(pseudo_code, str) and summary.strip():
+                results[key] = (summary.strip(), pseudo_code.strip())
+        return results
+
+    def analyze(self, items: List[BatchItem]) -> Tuple[Dict[str, Tuple[str, str]], List[BatchItem]]:
+        """Analyze items in batched requests; returns results by key and the items that came back missing"""
+        results: Dict[str, Tuple[str, str]] = {}
+        missing: List[BatchItem] = []
+        for batch in self.plan(items):
+            max_tokens = min(MAX_BATCH_OUTPUT_TOKENS, TOKENS_PER_CHUNK * len(batch))
+            response = self.complete(self.build_prompt(batch), max_tokens, batch[0].tier)
+            parsed = self.parse_response(response or "", [item.key for item in batch])
+            results.update(parsed)
+            missing.extend(item for item in batch if item.key not in parsed)
+
+            self.stats["requests"] += 1
+            self.stats["chunks"] += len(batch)
+        self.stats["missing"] += len(missing)
+        return results, missing
@@ -0,0 +1,102 @@
+import os
+import glob
+from typing import List, Dict
+from config import Config
+from pseudocode import RAGPseudoCodeGenerator
+from member_classifier import classify_files, COBOL_TYPE, EXTENSION_HINTS
+from ingestion_pipeline import IngestionPipeline
+
+class BatchProcessor:
+    """Process multiple COBOL files in batch"""
+    
+    def __init__(self):
+        self.rag_generator = RAGPseudoCodeGenerator(
+            chroma_db_path=Config.CHROMA_DB_PATH,
+            region_name=Config.AWS_REGION
+        )
+        Config.ensure_output_dir()
+    
+    def find_cobol_files(self, directory: str) -> List[str]:
+        """Find all COBOL files in directory"""
+        patterns = ['*.cbl', '*.cob', '*.cobol', '*.CBL', '*.COB', '*.COBOL']
+        cobol_files = []
+        
+        for pattern in patterns:
+            cobol_files.extend(glob.glob(os.path.join(directory, '**', pattern), recursive=True))
+        
+        # PDS unloads often have no extension; classify those members by content
+        unknown_files = [
+            path for path in glob.glob(os.path.join(directory, '**', '*'), recursive=True)
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() not in EXTENSION_HINTS
+        ]
+        for path, result in classify_files(unknown_files).items():
+            if result.prog_type == COBOL_TYPE and result.confidence >= Config.CLASSIFIER_MIN_CONFIDENCE:
+                cobol_files.append(path)
+        
+        return cobol_files
+    
+    def classify_directory(self, directory: str) -> Dict[str, List[str]]:
+        """Group every member in a directory by detected member type"""
+        file_paths = [
+            path for path in glob.glob(os.path.join(directory, '**', '*'), recursive=True)
+            if os.path.isfile(path)
+        ]
+        
+        members_by_type = {}
+        for path, result in classify_files(file_paths).items():
+            members_by_type.setdefault(result.prog_type, []).append(path)
+        
+        return members_by_type
+    
+    def process_directory(self, directory: str, pipelined: bool = False):
+        """Process all COBOL files in a directory"""
+        cobol_files = self.find_cobol_files(directory)
+        
+        print(f"Found {len(cobol_files)} COBOL files in {directory}")
+        
+        if pipelined:
+            # Chunking, analysis, embedding and writes overlap, with bounded queues between them
+            IngestionPipeline(self.rag_generator).run(cobol_files)
+            return
+        
+        for i, file_path in enumerate(cobol_files, 1):
+            print(f"\nProcessing file {i}/{len(cobol_files)}: {file_path}")
+            try:
+                self.rag_generator.process_and_store_chunks(file_path)
+                print(f"Successfully processed: {file_path}")
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
+    
+    def generate_pseudocode_for_queries(self, queries: List[str]):
+        """Generate pseudo code for multiple queries"""
+        for query in queries:
+            output_file = os.path.join(
+                Config.OUTPUT_DIR,
+                f"pseudocode_{query.replace(' ', '_').replace('/', '_')}.md"
+            )
+            print(f"\nGenerating pseudo code for: {query}")
+            self.rag_generator.generate_comprehensive_pseudocode(query, output_file)
+
+# Example usage script
+def example_usage():
+    """Example of how to use the system"""
+    
+    # Single file processing
+    rag_gen = RAGPseudoCodeGenerator()
+    rag_gen.process_and_store_chunks("path/to/your/cobol/file.cbl")
+    
+    # Batch processing
+    batch_processor = BatchProcessor()
+    batch_processor.process_directory("path/to/cobol/directory")
+    
+    # Generate pseudo code for common queries
+    common_queries = [
+        "data validation and input processing logic",
+        "file handling and record processing",
+        "calculation and business logic",
+        "error handling and exception processing"
+    ]
+    batch_processor.generate_pseudocode_for_queries(common_queries)
+
+if __name__ == "__main__":
+    example_usage()
@@ -0,0 +1,339 @@
+import os
+import re
+import json
+import bisect
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Optional, Tuple
+
+from config import Config
+
+
+PERFORM = 'PERFORM'
+PERFORM_THRU = 'PERFORM THRU'
+GO_TO = 'GO TO'
+FALLS_THROUGH = 'FALLS THROUGH'
+
+# Implicit node for statements between PROCEDURE DIVISION and the first paragraph
+PROCEDURE_ENTRY = '(PROCEDURE DIVISION)'
+
+# Single-word lines that end with a period but are statements, not paragraph names
+NON_PARAGRAPH_WORDS = {'EXIT', 'GOBACK', 'CONTINUE', 'END-IF', 'END-PERFORM', 'END-EVALUATE', 'END-READ',
+                       'END-EXEC', 'ELSE', 'STOP', 'RETURN', 'END-CALL', 'END-STRING', 'END-SEARCH'}
+
+NAME = r"[A-Z0-9][A-Z0-9-]*"
+PARAGRAPH_HEADER = re.compile(rf"^({NAME})(\s+SECTION)?\s*\.\s*$")
+PROGRAM_ID = re.compile(rf"\bPROGRAM-ID\s*\.?\s*['\"]?({NAME})")
+PERFORM_STATEMENT = re.compile(
+    rf"\bPERFORM\s+({NAME})(?:\s+(?:THRU|THROUGH)\s+({NAME}))?(\s+(?:UNTIL|VARYING|WITH\s+TEST|{NAME}\s+TIMES)\b)?"
+)
+GO_TO_STATEMENT = re.compile(rf"\bGO\s+(?:TO\s+)?((?:{NAME}\s*)+)")
+TERMINAL_STATEMENT = re.compile(rf"(?:\bGO\s+(?:TO\s+)?{NAME}|\bSTOP\s+RUN|\bGOBACK|\bEXIT\s+PROGRAM)\s*\.?\s*$")
+LITERAL = re.compile(r"'[^']*'|\"[^\"]*\"")
+
+# Scopes opened and closed within a sentence; a terminal statement inside an open
+# scope is conditional, so the paragraph can still fall through
+SCOPE_OPEN = re.compile(r"(?<!-)\b(?:IF|EVALUATE|AT END|INVALID KEY|ON SIZE ERROR|ON EXCEPTION|ON OVERFLOW)\b")
+SCOPE_CLOSE = re.compile(r"\bEND-[A-Z]+\b")
+
+
+@dataclass
+class Paragraph:
+    """A paragraph or section of the PROCEDURE DIVISION"""
+    name: str
+    start_line: int
+    end_line: int
+    section: str = ""
+    is_section: bool = False
+    terminal: str = ""       # STOP RUN / GOBACK / GO TO ... ending the paragraph
+
+
+@dataclass
+class FlowEdge:
+    """PERFORM, PERFORM THRU, GO TO or fall-through transfer between paragraphs"""
+    src: str
+    dst: str
+    kind: str
+    line: int = 0
+    thru: str = ""
+    loop: bool = False
+
+
+@dataclass
+class ProgramControlFlow:
+    """Paragraph-level control-flow graph of one COBOL program"""
+    file_name: str
+    program: str
+    paragraphs: List[Paragraph] = field(default_factory=list)
+    edges: List[FlowEdge] = field(default_factory=list)
+    # (start_line, end_line, chunk_id) of the stored chunks of this program
+    chunks: List[Tuple[int, int, str]] = field(default_factory=list)
+
+    @property
+    def entry(self) -> Optional[str]:
+        return self.paragraphs[0].name if self.paragraphs else None
+
+    def paragraph(self, name: str) -> Optional[Paragraph]:
+        for paragraph in self.paragraphs:
+            if paragraph.name == name:
+                return paragraph
+        return None
+
+    def successors(self, name: str) -> List[FlowEdge]:
+        return [edge for edge in self.edges if edge.src == name]
+
+    def predecessors(self, name: str) -> List[FlowEdge]:
+        return [edge for edge in self.edges if edge.dst == name]
+
+    def paragraphs_in(self, start_line: int, end_line: int) -> List[Paragraph]:
+        """Paragraphs overlapping a line range (e.g. a retrieved chunk)"""
+        return [p for p in self.paragraphs if p.start_line <= end_line and p.end_line >= start_line]
+
+    def performed_range(self, edge: FlowEdge) -> List[Paragraph]:
+        """Paragraphs executed by a PERFORM: the THRU range, a whole section, or one paragraph"""
+        if edge.thru:
+            return self.thru_range(edge.dst, edge.thru)
+        target = self.paragraph(edge.dst)
+        if target is None:
+            return []
+        if target.is_section:
+            return [target] + [p for p in self.paragraphs if p.section == target.name]
+        return [target]
+
+    def thru_range(self, start: str, end: str) -> List[Paragraph]:
+        """Paragraphs executed by PERFORM start THRU end, in source order"""
+        names = [p.name for p in self.paragraphs]
+        if start not in names or end not in names:
+            return []
+        first, last = names.index(start), names.index(end)
+        return self.paragraphs[first:last + 1] if first <= last else []
+
+    def chunk_for_line(self, line: int) -> Optional[str]:
+        starts = [chunk[0] for chunk in self.chunks]
+        index = bisect.bisect_right(starts, line) - 1
+        if index >= 0 and self.chunks[index][1] >= line:
+            return self.chunks[index][2]
+        return None
+
+    def flow_context(self, start_line: int, end_line: int) -> str:
+        """One-line-per-paragraph callers/callees summary for a chunk prompt"""
+        lines = []
+        for paragraph in self.paragraphs_in(start_line, end_line):
+            performed_by = sorted({e.src for e in self.predecessors(paragraph.name) if e.kind != FALLS_THROUGH})
+            transfers = [_transfer_label(e) for e in self.successors(paragraph.name)]
+            parts = [paragraph.name]
+            if performed_by:
+                parts.append(f"entered from {', '.join(performed_by)}")
+            if transfers:
+                parts.append("; ".join(transfers))
+            if paragraph.terminal:
+                parts.append(f"ends with {paragraph.terminal}")
+            lines.append(" - ".join(parts))
+        return "\n".join(lines)
+
+    def outline(self, max_lines: int = 150) -> str:
+        """Ordered, indented execution outline starting from the entry paragraph"""
+        if not self.paragraphs:
+            return ""
+
+        lines: List[str] = [f"Control flow of {self.program} (entry {self.entry}):"]
+        expanded = set()
+
+        def describe(paragraph: Paragraph) -> str:
+            text = f"{paragraph.name} [lines {paragraph.start_line}-{paragraph.end_line}]"
+            if paragraph.terminal:
+                text += f" ends with {paragraph.terminal}"
+            return text
+
+        def expand(name: str, depth: int):
+            if len(lines) >= max_lines or depth > 12:
+                return
+            for edge in self.successors(name):
+                if edge.kind == FALLS_THROUGH:
+                    continue
+                target = self.paragraph(edge.dst)
+                label = _transfer_label(edge)
+                if target is None or edge.dst in expanded:
+                    lines.append("  " * depth + label + " (see above)")
+                    continue
+                lines.append("  " * depth + label + f" [lines {target.start_line}-{target.end_line}]")
+                steps = [target] if edge.kind == GO_TO else self.performed_range(edge) or [target]
+                for step in steps:
+                    expanded.add(step.name)
+                    if step.name != edge.dst:
+                        lines.append("  " * (depth + 1) + f"then {describe(step)}")
+                    expand(step.name, depth + 1)
+
+        # Main line: follow fall-through from the entry; performed-only paragraphs appear under their callers
+        performed = {
+            p.name for e in self.edges if e.kind in (PERFORM, PERFORM_THRU) for p in self.performed_range(e)
+        }
+
+        name = self.entry
+        while name and len(lines) < max_lines:
+            paragraph = self.paragraph(name)
+            if paragraph.name not in expanded:
+                expanded.add(paragraph.name)
+                lines.append(describe(paragraph))
+                expand(paragraph.name, 1)
+            fall = [e for e in self.successors(name) if e.kind == FALLS_THROUGH]
+            name = fall[0].dst if fall and fall[0].dst not in performed else None
+
+        unreached = [p.name for p in self.paragraphs if p.name not in expanded]
+        if unreached and len(lines) < max_lines:
+            lines.append(f"Not reached from the entry paragraph: {', '.join(unreached)}")
+
+        return "\n".join(lines[:max_lines])
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ProgramControlFlow':
+        return cls(
+            file_name=data['file_name'],
+            program=data['program'],
+            paragraphs=[Paragraph(**p) for p in data.get('paragraphs', [])],
+            edges=[FlowEdge(**e) for e in data.get('edges', [])],
+            chunks=[tuple(c) for c in data.get('chunks', [])],
+        )
+
+
+def _transfer_label(edge: FlowEdge) -> str:
+    kind = PERFORM if edge.kind == PERFORM_THRU else edge.kind
+    label = f"{kind} {edge.dst}" + (f" THRU {edge.thru}" if edge.thru else "")
+    return label + (" (loop)" if edge.loop else "")
+
+
+def _code_text(line: str) -> Tuple[str, bool]:
+    """Code area of a source line and whether it starts in Area A"""
+    line = line.rstrip('\n').upper()
+    if len(line) > 6 and (line[:6].strip() == '' or line[:6].strip().isdigit()):
+        if line[6:7] in ('*', '/'):
+            return "", False
+        text = line[7:72]
+        return text.strip(), len(text) - len(text.lstrip()) < 4
+    if line.lstrip().startswith('*'):
+        return "", False
+    return line.strip(), True
+
+
+def extract_control_flow(lines: List[str], file_name: str) -> ProgramControlFlow:
+    """Build the paragraph control-flow graph of a COBOL program from its source lines"""
+    program = os.path.splitext(file_name)[0].upper()
+    paragraphs: List[Paragraph] = []
+    bodies: Dict[str, List[Tuple[int, str]]] = {}
+    in_procedure = False
+    current: Optional[Paragraph] = None
+    section = ""
+
+    for line_no, raw in enumerate(lines, 1):
+        text, area_a = _code_text(raw)
+        if not text:
+            continue
+        if not in_procedure:
+            match = PROGRAM_ID.search(text)
+            if match:
+                program = match.group(1)
+            if re.match(r"PROCEDURE\s+DIVISION\b", text):
+                in_procedure = True
+            continue
+
+        header = PARAGRAPH_HEADER.match(text) if area_a else None
+        if header and header.group(1) not in NON_PARAGRAPH_WORDS:
+            if current is not None:
+                current.end_line = line_no - 1
+            is_section = bool(header.group(2))
+            if is_section:
+                section = header.group(1)
+            current = Paragraph(header.group(1), line_no, line_no, "" if is_section else section, is_section)
+            paragraphs.append(current)
+            bodies[current.name] = []
+            continue
+
+        if current is None:
+            current = Paragraph(PROCEDURE_ENTRY, line_no, line_no)
+            paragraphs.append(current)
+            bodies[current.name] = []
+        bodies[current.name].append((line_no, LITERAL.sub("''", text)))
+        current.end_line = line_no
+
+    if current is not None:
+        current.end_line = max(current.end_line, len(lines))
+
+    known = {p.name for p in paragraphs}
+    edges: List[FlowEdge] = []
+    for index, paragraph in enumerate(paragraphs):
+        body = bodies[paragraph.name]
+        # Statements span lines (PERFORM X THRU Y / UNTIL ...): match on the joined body
+        joined = " ".join(text for _, text in body)
+        line_starts = []
+        position = 0
+        for _, text in body:
+            line_starts.append(position)
+            position += len(text) + 1
+
+        def line_at(offset: int) -> int:
+            return body[bisect.bisect_right(line_starts, offset) - 1][0]
+
+        found = []
+        for match in PERFORM_STATEMENT.finditer(joined):
+            target, thru = match.group(1), match.group(2) or ""
+            if target not in known:
+                continue  # inline PERFORM ... END-PERFORM or PERFORM n TIMES
+            found.append((match.start(), FlowEdge(paragraph.name, target, PERFORM_THRU if thru else PERFORM,
+                                                  line_at(match.start()), thru, bool(match.group(3)))))
+        for match in GO_TO_STATEMENT.finditer(joined):
+            # GO TO a b c DEPENDING ON x: targets run until the first non-paragraph word
+            for target in match.group(1).split():
+                if target not in known:
+                    break
+                found.append((match.start(), FlowEdge(paragraph.name, target, GO_TO, line_at(match.start()))))
+        edges.extend(edge for _, edge in sorted(found, key=lambda item: item[0]))
+
+        terminal = TERMINAL_STATEMENT.search(joined)
+        sentence = joined[:terminal.start()].rsplit('.', 1)[-1] if terminal else ""
+        if terminal and len(SCOPE_OPEN.findall(sentence)) <= len(SCOPE_CLOSE.findall(sentence)):
+            paragraph.terminal = " ".join(terminal.group(0).rstrip(". ").split())
+        elif index + 1 < len(paragraphs):
+            edges.append(FlowEdge(paragraph.name, paragraphs[index + 1].name, FALLS_THROUGH))
+
+    return ProgramControlFlow(file_name=file_name, program=program, paragraphs=paragraphs, edges=edges)
+
+
+def extract_control_flow_file(file_path: str) -> ProgramControlFlow:
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        lines = f.readlines()
+    return extract_control_flow(lines, os.path.basename(file_path))
+
+
+class ControlFlowStore:
+    """Per-program control-flow graphs stored as JSON next to the vector DB"""
+
+    def __init__(self, store_dir: str = Config.CONTROL_FLOW_DIR):
+        self.store_dir = store_dir
+        self.cache: Dict[str, ProgramControlFlow] = {}
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.store_dir, f"{file_name}.cfg.json")
+
+    def save(self, flow: ProgramControlFlow):
+        tmp_path = self._path(flow.file_name) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(flow.to_dict(), f)
+        os.replace(tmp_path, self._path(flow.file_name))
+        self.cache[flow.file_name] = flow
+
+    def load(self, file_name: str) -> Optional[ProgramControlFlow]:
+        if file_name in self.cache:
+            return self.cache[file_name]
+        path = self._path(file_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                flow = ProgramControlFlow.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        self.cache[file_name] = flow
+        return flow
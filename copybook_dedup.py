@@ -0,0 +1,263 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from dataclasses import dataclass, replace
+from typing import List, Dict, Optional, Tuple
+
+from config import Config
+from member_classifier import classify_member, COPYBOOK_TYPE
+
+
+COPYBOOK_SECTION = 'COPYBOOK'
+
+# One- or two-line copybooks (a single 01 or 88) match too much incidental code to be worth sharing
+MIN_COPYBOOK_LINES = 3
+
+
+def normalize_line(line: str) -> str:
+    """Code area of a source line, uppercased with whitespace collapsed; '' for comments and blanks"""
+    line = line.rstrip('\n').upper()
+    if len(line) > 6 and (line[:6].strip() == '' or line[:6].strip().isdigit()):
+        if line[6:7] in ('*', '/'):
+            return ""
+        line = line[7:72]
+    elif line.lstrip().startswith('*'):
+        return ""
+    return " ".join(line.split())
+
+
+def normalized_lines(content: str) -> List[str]:
+    """Non-blank normalized code lines; sequence numbers, comments and layout don't affect the result"""
+    lines = []
+    for line in content.splitlines():
+        text = normalize_line(line)
+        if text:
+            lines.append(text)
+    return lines
+
+
+def normalized_hash(content: str) -> str:
+    return hashlib.sha256("\n".join(normalized_lines(content)).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class CopybookEntry:
+    """A copybook in the library with its normalized text"""
+    name: str
+    file_path: str
+    content_hash: str
+    lines: List[str]
+
+
+@dataclass
+class SharedAnalysis:
+    """Summary, pseudo code and embedding of a copybook, analyzed once for every program that inlines it"""
+    content_hash: str
+    name: str
+    summary: str
+    pseudo_code: str
+    embedding: List[float]
+    chunk_id: str
+
+
+class CopybookLibrary:
+    """Copybook library index used to recognise inlined copybook expansions in program chunks"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS copybooks (
+        file_path TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        normalized TEXT NOT NULL,
+        scanned_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_copybooks_hash ON copybooks(content_hash);
+
+    CREATE TABLE IF NOT EXISTS shared_analyses (
+        content_hash TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        summary TEXT,
+        pseudo_code TEXT,
+        embedding TEXT NOT NULL,
+        chunk_id TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS copybook_links (
+        file_name TEXT NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        PRIMARY KEY (file_name, start_line)
+    );
+    CREATE INDEX IF NOT EXISTS idx_copybook_links_hash ON copybook_links(content_hash);
+    """
+
+    def __init__(self, db_path: str = Config.COPYBOOK_LIBRARY_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.executescript(self.SCHEMA)
+        self._load()
+
+    def close(self):
+        self.conn.close()
+
+    def _load(self):
+        """Index copybooks by their first code line so chunk scanning only compares plausible candidates"""
+        with self.lock:
+            rows = self.conn.execute("SELECT name, file_path, content_hash, normalized FROM copybooks").fetchall()
+        self.by_hash: Dict[str, CopybookEntry] = {}
+        self.by_first_line: Dict[str, List[CopybookEntry]] = {}
+        for name, file_path, content_hash, normalized in rows:
+            entry = CopybookEntry(name, file_path, content_hash, normalized.split("\n"))
+            if len(entry.lines) < MIN_COPYBOOK_LINES or content_hash in self.by_hash:
+                continue
+            self.by_hash[content_hash] = entry
+            self.by_first_line.setdefault(entry.lines[0], []).append(entry)
+
+    def add_copybook(self, file_path: str, content: str):
+        lines = normalized_lines(content)
+        content_hash = hashlib.sha256("\n".join(lines).encode('utf-8')).hexdigest()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO copybooks VALUES (?, ?, ?, ?, ?)",
+                (os.path.abspath(file_path), os.path.basename(file_path), content_hash, "\n".join(lines),
+                 datetime.now().isoformat())
+            )
+
+    def scan_directory(self, source_dir: str, extensions: Optional[List[str]] = None) -> int:
+        """Add every copybook under source_dir to the library; returns the number of copybooks known"""
+        wanted = {ext.lower() for ext in extensions} if extensions else None
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.') or (wanted is not None and os.path.splitext(name)[1].lower() not in wanted):
+                    continue
+                file_path = os.path.join(root, name)
+                try:
+                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                        content = f.read()
+                except OSError as e:
+                    print(f"Error reading {file_path}: {e}")
+                    continue
+                if classify_member(content, file_path).prog_type == COPYBOOK_TYPE:
+                    self.add_copybook(file_path, content)
+
+        self._load()
+        print(f"Copybook library: {len(self.by_hash)} distinct copybooks")
+        return len(self.by_hash)
+
+    def match(self, content: str) -> Optional[CopybookEntry]:
+        """The library copybook whose normalized text equals content, if any"""
+        return self.by_hash.get(normalized_hash(content))
+
+    def split_chunk(self, chunk) -> List:
+        """Split a chunk at inlined copybook expansions.
+
+        Each expansion becomes its own chunk with section type COPYBOOK so it can be
+        linked to the shared analysis; the program's own lines around it keep the
+        original section type.
+        """
+        if not self.by_first_line:
+            return [chunk]
+
+        lines = chunk.content.splitlines(keepends=True)
+        code = [(i, text) for i, text in ((i, normalize_line(line)) for i, line in enumerate(lines)) if text]
+
+        segments: List[Tuple[int, int]] = []
+        k = 0
+        while k < len(code):
+            best = None
+            for entry in self.by_first_line.get(code[k][1], ()):
+                size = len(entry.lines)
+                if (best is None or size > len(best.lines)) and [text for _, text in code[k:k + size]] == entry.lines:
+                    best = entry
+            if best is None:
+                k += 1
+                continue
+            segments.append((code[k][0], code[k + len(best.lines) - 1][0] + 1))
+            k += len(best.lines)
+
+        if not segments:
+            return [chunk]
+
+        pieces = []
+        position = 0
+        for start, end in segments:
+            if start > position:
+                pieces.append((position, start, False))
+            pieces.append((start, end, True))
+            position = end
+        if position < len(lines):
+            pieces.append((position, len(lines), False))
+
+        result = []
+        for start, end, is_copybook in pieces:
+            content = ''.join(lines[start:end])
+            if not is_copybook and not normalized_lines(content):
+                continue
+            result.append(replace(
+                chunk,
+                content=content,
+                start_line=chunk.start_line + start,
+                end_line=chunk.start_line + end - 1,
+                section_type=COPYBOOK_SECTION if is_copybook else chunk.section_type
+            ))
+        return result
+
+    def split_chunks(self, chunks: List) -> List:
+        result = []
+        for chunk in chunks:
+            result.extend(self.split_chunk(chunk))
+        return result
+
+    def get_analysis(self, content_hash: str) -> Optional[SharedAnalysis]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content_hash, name, summary, pseudo_code, embedding, chunk_id FROM shared_analyses "
+                "WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return SharedAnalysis(row[0], row[1], row[2], row[3], json.loads(row[4]), row[5])
+
+    def save_analysis(self, analysis: SharedAnalysis):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shared_analyses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (analysis.content_hash, analysis.name, analysis.summary, analysis.pseudo_code,
+                 json.dumps(analysis.embedding), analysis.chunk_id, datetime.now().isoformat())
+            )
+
+    def clear_links(self, file_name: str):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM copybook_links WHERE file_name = ?", (file_name,))
+
+    def link(self, file_name: str, start_line: int, end_line: int, content_hash: str):
+        """Record that a program's lines are an expansion of a shared copybook"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO copybook_links VALUES (?, ?, ?, ?)",
+                              (file_name, start_line, end_line, content_hash))
+
+    def programs_using(self, content_hash: str) -> List[str]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT file_name FROM copybook_links WHERE content_hash = ? ORDER BY file_name",
+                (content_hash,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def copybooks_in(self, file_name: str) -> List[Tuple[int, int, str]]:
+        """(start line, end line, copybook name) of every shared copybook linked from a program"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT l.start_line, l.end_line, a.name FROM copybook_links l "
+                "JOIN shared_analyses a ON a.content_hash = l.content_hash "
+                "WHERE l.file_name = ? ORDER BY l.start_line", (file_name,)
+            ).fetchall()
+        return [tuple(row) for row in rows]
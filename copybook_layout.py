@@ -0,0 +1,459 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Optional, Any
+
+from config import Config
+
+
+# Bump when parsing or length rules change so cached layouts are recomputed
+LAYOUT_VERSION = 2
+
+USAGE_ALIASES = {
+    'COMP': 'COMP', 'COMPUTATIONAL': 'COMP', 'COMP-4': 'COMP', 'COMPUTATIONAL-4': 'COMP', 'BINARY': 'COMP',
+    'COMP-5': 'COMP-5', 'COMPUTATIONAL-5': 'COMP-5',
+    'COMP-3': 'COMP-3', 'COMPUTATIONAL-3': 'COMP-3', 'PACKED-DECIMAL': 'COMP-3',
+    'COMP-1': 'COMP-1', 'COMPUTATIONAL-1': 'COMP-1',
+    'COMP-2': 'COMP-2', 'COMPUTATIONAL-2': 'COMP-2',
+    'DISPLAY': 'DISPLAY', 'INDEX': 'INDEX', 'POINTER': 'POINTER',
+    'NATIONAL': 'NATIONAL', 'DISPLAY-1': 'DISPLAY-1',
+}
+
+# Usages stored as two-byte characters (UTF-16 national, DBCS)
+DOUBLE_BYTE_USAGES = {'NATIONAL', 'DISPLAY-1'}
+
+FIXED_USAGE_LENGTHS = {'COMP-1': 4, 'COMP-2': 8, 'INDEX': 4, 'POINTER': 4}
+
+# Keywords that end a clause's argument list
+CLAUSE_KEYWORDS = {
+    'PIC', 'PICTURE', 'USAGE', 'REDEFINES', 'OCCURS', 'VALUE', 'VALUES', 'SIGN', 'SYNC',
+    'SYNCHRONIZED', 'JUST', 'JUSTIFIED', 'BLANK', 'RENAMES', 'INDEXED', 'ASCENDING', 'DESCENDING',
+    'DEPENDING', 'EXTERNAL', 'GLOBAL',
+} | set(USAGE_ALIASES)
+
+
+@dataclass
+class ConditionName:
+    """88-level condition name"""
+    name: str
+    values: List[str]
+
+
+@dataclass
+class LayoutField:
+    """One data item with its computed storage characteristics"""
+    level: int
+    name: str
+    picture: str = ""
+    usage: str = "DISPLAY"
+    offset: int = 0
+    length: int = 0              # Total bytes including all occurrences
+    element_length: int = 0      # Bytes of a single occurrence
+    digits: int = 0
+    scale: int = 0
+    signed: bool = False
+    occurs: int = 1
+    occurs_min: int = 1
+    depending_on: str = ""
+    redefines: str = ""
+    value: str = ""
+    sign_separate: bool = False
+    conditions: List[ConditionName] = field(default_factory=list)
+    children: List['LayoutField'] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def is_group(self) -> bool:
+        return bool(self.children) and not self.picture
+
+
+def _source_text(code_content: str) -> str:
+    """Strip sequence/indicator/identification areas and comment lines from fixed-format source"""
+    lines = code_content.splitlines()
+    fixed = all(len(line) < 7 or line[:6].strip() == '' or line[:6].strip().isdigit()
+                for line in lines if line.strip())
+
+    text_lines = []
+    for line in lines:
+        if fixed:
+            indicator = line[6:7]
+            if indicator in ('*', '/', 'D', 'd'):
+                continue
+            text = line[7:72]
+            if indicator == '-' and text_lines:
+                # Continuation of a literal: resume after the opening quote
+                stripped = text.strip()
+                text_lines[-1] = text_lines[-1].rstrip() + stripped[1:]
+                continue
+        else:
+            if line.lstrip().startswith('*'):
+                continue
+            text = line
+        text_lines.append(text)
+
+    return '\n'.join(text_lines)
+
+
+def _statements(text: str) -> List[List[str]]:
+    """Split source into period-terminated statements of tokens, keeping literals intact"""
+    tokens = re.findall(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[^\s'\"]+", text)
+    statements, current = [], []
+    for token in tokens:
+        if token[0] in "'\"":
+            current.append(token)
+            continue
+        ends = token.endswith('.') and not re.match(r'^[0-9]*\.[0-9]+$', token)
+        if ends:
+            token = token[:-1]
+        if token:
+            current.append(token)
+        if ends and current:
+            statements.append(current)
+            current = []
+    if current:
+        statements.append(current)
+    return statements
+
+
+def expand_picture(picture: str) -> str:
+    """Expand repeat factors: 9(5)V9(2) -> 99999V99"""
+    return re.sub(r'(.)\((\d+)\)', lambda m: m.group(1) * int(m.group(2)), picture.upper())
+
+
+def analyse_picture(picture: str) -> Dict[str, Any]:
+    """Display length, digit count, scale and sign of a PICTURE string (N and G are double-byte)"""
+    expanded = expand_picture(picture)
+    signed = 'S' in expanded
+    digits = expanded.count('9')
+    scale = 0
+    if 'V' in expanded:
+        scale = expanded.split('V', 1)[1].count('9')
+
+    display_length = 0
+    i = 0
+    while i < len(expanded):
+        pair = expanded[i:i + 2]
+        if pair in ('CR', 'DB'):
+            display_length += 2
+            i += 2
+            continue
+        if expanded[i] not in ('S', 'V', 'P'):
+            display_length += 1
+        i += 1
+
+    is_numeric = all(c in '9SVP' for c in expanded)
+    return {
+        'display_length': display_length,
+        'digits': digits,
+        'scale': scale,
+        'signed': signed,
+        'numeric': is_numeric,
+        'double_byte': 'N' in expanded or 'G' in expanded,
+    }
+
+
+def storage_length(usage: str, picture_info: Optional[Dict[str, Any]], sign_separate: bool = False) -> int:
+    """Bytes occupied by one elementary item"""
+    if usage in FIXED_USAGE_LENGTHS:
+        return FIXED_USAGE_LENGTHS[usage]
+    if picture_info is None:
+        return 0
+
+    digits = picture_info['digits']
+    if usage in ('COMP', 'COMP-5'):
+        if digits <= 4:
+            return 2
+        if digits <= 9:
+            return 4
+        return 8
+    if usage == 'COMP-3':
+        return digits // 2 + 1
+
+    length = picture_info['display_length']
+    if sign_separate:
+        length += 1
+    if usage in DOUBLE_BYTE_USAGES or picture_info['double_byte']:
+        length *= 2
+    return length
+
+
+def _parse_entry(tokens: List[str]) -> Optional[Dict[str, Any]]:
+    """Parse one data description entry into its clauses"""
+    if not tokens or not tokens[0].isdigit():
+        return None
+
+    entry = {'level': int(tokens[0]), 'name': 'FILLER', 'picture': '', 'usage': '', 'redefines': '',
+             'occurs': 1, 'occurs_min': 1, 'depending_on': '', 'value': '', 'values': [],
+             'sign_separate': False, 'notes': []}
+    i = 1
+    if i < len(tokens) and tokens[i].upper() not in CLAUSE_KEYWORDS:
+        entry['name'] = tokens[i].upper()
+        i += 1
+
+    while i < len(tokens):
+        word = tokens[i].upper()
+        i += 1
+        if word in ('PIC', 'PICTURE'):
+            if i < len(tokens) and tokens[i].upper() == 'IS':
+                i += 1
+            if i < len(tokens):
+                entry['picture'] = tokens[i].upper()
+                i += 1
+        elif word == 'USAGE':
+            if i < len(tokens) and tokens[i].upper() == 'IS':
+                i += 1
+            if i < len(tokens):
+                entry['usage'] = USAGE_ALIASES.get(tokens[i].upper(), tokens[i].upper())
+                i += 1
+        elif word in USAGE_ALIASES:
+            entry['usage'] = USAGE_ALIASES[word]
+        elif word == 'REDEFINES' and i < len(tokens):
+            entry['redefines'] = tokens[i].upper()
+            i += 1
+        elif word == 'OCCURS' and i < len(tokens):
+            low = int(tokens[i]) if tokens[i].isdigit() else 1
+            i += 1
+            high = low
+            if i + 1 < len(tokens) and tokens[i].upper() == 'TO' and tokens[i + 1].isdigit():
+                high = int(tokens[i + 1])
+                i += 2
+            if i < len(tokens) and tokens[i].upper() == 'TIMES':
+                i += 1
+            entry['occurs'], entry['occurs_min'] = high, low
+        elif word == 'DEPENDING':
+            if i < len(tokens) and tokens[i].upper() == 'ON':
+                i += 1
+            if i < len(tokens):
+                entry['depending_on'] = tokens[i].upper()
+                i += 1
+        elif word in ('VALUE', 'VALUES'):
+            if i < len(tokens) and tokens[i].upper() in ('IS', 'ARE'):
+                i += 1
+            values = []
+            while i < len(tokens) and tokens[i].upper() not in CLAUSE_KEYWORDS:
+                values.append(tokens[i])
+                i += 1
+            entry['values'] = values
+            entry['value'] = ' '.join(values)
+        elif word == 'SIGN':
+            rest = [t.upper() for t in tokens[i:i + 4]]
+            if 'SEPARATE' in rest:
+                entry['sign_separate'] = True
+        elif word == 'SEPARATE':
+            entry['sign_separate'] = True
+        elif word in ('SYNC', 'SYNCHRONIZED'):
+            entry['notes'].append('SYNCHRONIZED (slack bytes not modelled)')
+        elif word == 'RENAMES':
+            entry['notes'].append('RENAMES ' + ' '.join(tokens[i:]).upper())
+            break
+
+    return entry
+
+
+def _condition_values(values: List[str]) -> List[str]:
+    """Render 88-level VALUE lists, folding THRU ranges"""
+    rendered = []
+    i = 0
+    while i < len(values):
+        if i + 2 < len(values) and values[i + 1].upper() in ('THRU', 'THROUGH'):
+            rendered.append(f"{values[i]} THRU {values[i + 2]}")
+            i += 3
+        else:
+            rendered.append(values[i])
+            i += 1
+    return rendered
+
+
+def parse_copybook(code_content: str) -> List[LayoutField]:
+    """Parse a copybook into its records with offsets and lengths computed"""
+    records: List[LayoutField] = []
+    stack: List[LayoutField] = []
+    usage_stack: List[str] = []
+
+    for tokens in _statements(_source_text(code_content)):
+        entry = _parse_entry(tokens)
+        if entry is None:
+            continue
+
+        if entry['level'] == 88:
+            if stack:
+                stack[-1].conditions.append(
+                    ConditionName(entry['name'], _condition_values(entry['values']))
+                )
+            continue
+        if entry['level'] == 66:
+            if stack:
+                stack[0].notes.append(f"66 {entry['name']} {' '.join(entry['notes'])}")
+            continue
+
+        level = entry['level']
+        while stack and (stack[-1].level >= level or level in (1, 77)):
+            stack.pop()
+            usage_stack.pop()
+
+        # USAGE on a group applies to every subordinate item
+        usage = entry['usage'] or (usage_stack[-1] if usage_stack else 'DISPLAY')
+        item = LayoutField(
+            level=level,
+            name=entry['name'],
+            picture=entry['picture'],
+            usage=usage,
+            occurs=entry['occurs'],
+            occurs_min=entry['occurs_min'],
+            depending_on=entry['depending_on'],
+            redefines=entry['redefines'],
+            value=entry['value'],
+            sign_separate=entry['sign_separate'],
+            notes=entry['notes'],
+        )
+
+        if stack:
+            stack[-1].children.append(item)
+        else:
+            records.append(item)
+        stack.append(item)
+        usage_stack.append(usage)
+
+    for record in records:
+        _assign_storage(record, 0, {})
+
+    return records
+
+
+def _assign_storage(item: LayoutField, offset: int, offsets_by_name: Dict[str, LayoutField]) -> int:
+    """Compute offsets/lengths for item and its children; returns the item's total length"""
+    if item.redefines and item.redefines in offsets_by_name:
+        offset = offsets_by_name[item.redefines].offset
+    item.offset = offset
+
+    if item.children:
+        position = offset
+        end = offset
+        siblings: Dict[str, LayoutField] = {}
+        for child in item.children:
+            child_length = _assign_storage(child, position, siblings)
+            siblings[child.name] = child
+            end = max(end, child.offset + child_length)
+            if not child.redefines:
+                position = child.offset + child_length
+        item.element_length = end - offset
+    else:
+        info = analyse_picture(item.picture) if item.picture else None
+        if info:
+            item.digits = info['digits']
+            item.scale = info['scale']
+            item.signed = info['signed']
+        item.element_length = storage_length(item.usage, info, item.sign_separate)
+
+    item.length = item.element_length * item.occurs
+    if item.depending_on:
+        item.notes.append(f"length varies: {item.occurs_min}-{item.occurs} occurrences, max shown")
+    offsets_by_name[item.name] = item
+    return item.length
+
+
+def iter_fields(records: List[LayoutField], depth: int = 0):
+    """Depth-first walk yielding (depth, item) for every item"""
+    for record in records:
+        yield depth, record
+        yield from iter_fields(record.children, depth + 1)
+
+
+def render_layout_table(records: List[LayoutField]) -> str:
+    """Markdown field table for direct inclusion in copybook documentation"""
+    lines = [
+        "| Level | Field | PIC | Usage | Offset | Length | Occurs | Redefines | Conditions / Notes |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for depth, item in iter_fields(records):
+        indent = "&nbsp;" * 2 * depth
+        occurs = ""
+        if item.occurs > 1 or item.depending_on:
+            occurs = f"{item.occurs_min} TO {item.occurs}" if item.occurs_min != item.occurs else str(item.occurs)
+            if item.depending_on:
+                occurs += f" DEPENDING ON {item.depending_on}"
+        notes = [f"{c.name}: {', '.join(c.values)}" for c in item.conditions] + item.notes
+        if item.value:
+            notes.insert(0, f"VALUE {item.value}")
+        lines.append(
+            f"| {item.level:02d} | {indent}{item.name} | {item.picture} | "
+            f"{'' if item.is_group else item.usage} | {item.offset + 1} | {item.length} | {occurs} | "
+            f"{item.redefines} | {'; '.join(notes)} |"
+        )
+    return "\n".join(lines)
+
+
+def render_layout_context(records: List[LayoutField]) -> str:
+    """Compact one-line-per-field layout for prompt context (offsets are 1-based)"""
+    lines = []
+    for depth, item in iter_fields(records):
+        parts = [f"{'  ' * depth}{item.level:02d} {item.name}"]
+        if item.picture:
+            parts.append(f"PIC {item.picture} {item.usage}")
+        elif item.children:
+            parts.append("GROUP")
+        parts.append(f"@{item.offset + 1} len {item.length}")
+        if item.occurs > 1 or item.depending_on:
+            parts.append(f"x{item.occurs}" + (f" DEPENDING ON {item.depending_on}" if item.depending_on else ""))
+        if item.redefines:
+            parts.append(f"REDEFINES {item.redefines}")
+        for condition in item.conditions:
+            parts.append(f"[88 {condition.name} = {', '.join(condition.values)}]")
+        lines.append(" ".join(parts))
+    return "\n".join(lines)
+
+
+def create_layout_context(records: List[LayoutField]) -> str:
+    """Prompt context that takes field extraction off the LLM path"""
+    return (
+        "The field layout below was computed from the copybook by a parser. Do not re-derive field "
+        "types, lengths or offsets; the exact field table is appended to the document automatically. "
+        "In the field definitions section describe business meaning, valid values and relationships "
+        "between fields only.\n\n" + render_layout_context(records)
+    )
+
+
+def render_layout_section(records: List[LayoutField]) -> str:
+    """Computed field table appended to generated copybook documentation"""
+    total = max((record.offset + record.length for record in records), default=0)
+    return (
+        f"\n\n## Appendix: Computed Field Layout\n\n"
+        f"Offsets are 1-based; lengths are in bytes (maximum record length {total}).\n\n"
+        + render_layout_table(records) + "\n"
+    )
+
+
+def _field_from_dict(data: Dict[str, Any]) -> LayoutField:
+    data = dict(data)
+    data['conditions'] = [ConditionName(**c) for c in data.get('conditions', [])]
+    data['children'] = [_field_from_dict(c) for c in data.get('children', [])]
+    return LayoutField(**data)
+
+
+class CopybookLayoutCache:
+    """Parsed copybook layouts cached on disk by content hash"""
+
+    def __init__(self, cache_dir: str = Config.COPYBOOK_LAYOUT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_layout(self, code_content: str) -> List[LayoutField]:
+        key = hashlib.sha256(f"v{LAYOUT_VERSION}\n{code_content}".encode('utf-8')).hexdigest()
+        path = os.path.join(self.cache_dir, f"{key}.json")
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return [_field_from_dict(record) for record in json.load(f)]
+            except (OSError, ValueError, TypeError):
+                pass
+
+        records = parse_copybook(code_content)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([asdict(record) for record in records], f)
+        os.replace(tmp_path, path)
+        return records
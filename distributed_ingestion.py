@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import hashlib
+from typing import Dict, List, Optional
+
+from config import Config
+from control_flow import extract_control_flow, ProgramControlFlow
+from member_classifier import classify_member, COBOL_TYPE
+
+
+PENDING = 'pending'
+CLAIMED = 'claimed'
+ANALYZED = 'analyzed'
+STORED = 'stored'
+FAILED = 'failed'
+
+
+class LeaseLost(Exception):
+    """Raised when another worker reclaimed a job after this worker's lease expired"""
+
+
+class ChunkFailed(Exception):
+    """Raised when a chunk could not be analyzed or embedded, so the whole file is retried"""
+
+
+class IngestionQueue:
+    """SQLite job table shared by ingestion workers (any host) and the single vector store writer.
+
+    Workers claim files with a lease, analyze and embed them, and park the finished
+    chunk records here; only the writer process opens ChromaDB. For workers on several
+    hosts the database must live on a filesystem with working POSIX locks.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        file_path TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        status TEXT NOT NULL,
+        worker TEXT,
+        heartbeat REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        flow TEXT,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+
+    CREATE TABLE IF NOT EXISTS results (
+        file_path TEXT NOT NULL,
+        chunk_id TEXT NOT NULL,
+        document TEXT NOT NULL,
+        metadata TEXT NOT NULL,
+        embedding TEXT NOT NULL,
+        PRIMARY KEY (file_path, chunk_id)
+    );
+    """
+
+    def __init__(self, db_path: str = Config.INGESTION_QUEUE_DB_PATH,
+                 lease_seconds: int = Config.INGESTION_LEASE_SECONDS,
+                 max_attempts: int = Config.INGESTION_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # isolation_level=None: transactions are explicit, so claims can take the write lock up front
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, file_paths: List[str]) -> int:
+        """Add files as pending jobs; unchanged files that were already stored are left alone"""
+        queued = 0
+        for file_path in file_paths:
+            file_path = os.path.abspath(file_path)
+            with open(file_path, 'rb') as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
+            self._transaction()
+            try:
+                row = self.conn.execute("SELECT content_hash, status FROM jobs WHERE file_path = ?",
+                                        (file_path,)).fetchone()
+                if row is None or row[0] != content_hash or row[1] == FAILED:
+                    self.conn.execute("DELETE FROM results WHERE file_path = ?", (file_path,))
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO jobs (file_path, content_hash, status, attempts, updated_at) "
+                        "VALUES (?, ?, ?, 0, ?)", (file_path, content_hash, PENDING, time.time())
+                    )
+                    queued += 1
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return queued
+
+    def claim(self, worker: str) -> Optional[str]:
+        """Claim the next pending job, or one whose worker stopped heartbeating"""
+        now = time.time()
+        self._transaction()
+        try:
+            row = self.conn.execute(
+                "SELECT file_path FROM jobs WHERE status = ? OR (status = ? AND heartbeat < ?) "
+                "ORDER BY updated_at LIMIT 1",
+                (PENDING, CLAIMED, now - self.lease_seconds)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            # Partial results of an abandoned attempt are discarded
+            self.conn.execute("DELETE FROM results WHERE file_path = ?", (row[0],))
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, heartbeat = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE file_path = ?", (CLAIMED, worker, now, now, row[0])
+            )
+            self.conn.execute("COMMIT")
+            return row[0]
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def _owned(self, file_path: str, worker: str):
+        updated = self.conn.execute(
+            "UPDATE jobs SET heartbeat = ? WHERE file_path = ? AND worker = ? AND status = ?",
+            (time.time(), file_path, worker, CLAIMED)
+        ).rowcount
+        if not updated:
+            raise LeaseLost(file_path)
+
+    def add_result(self, file_path: str, worker: str, chunk_id: str, document: str, metadata: Dict,
+                   embedding: List[float]):
+        """Park one analyzed chunk for the writer (also renews the worker's lease)"""
+        self._transaction()
+        try:
+            self._owned(file_path, worker)
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                              (file_path, chunk_id, document, json.dumps(metadata), json.dumps(list(embedding))))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def complete(self, file_path: str, worker: str, flow: Optional[Dict] = None):
+        """Hand a fully analyzed file to the writer"""
+        self._transaction()
+        try:
+            self._owned(file_path, worker)
+            self.conn.execute("UPDATE jobs SET status = ?, flow = ?, updated_at = ? WHERE file_path = ?",
+                              (ANALYZED, json.dumps(flow) if flow else None, time.time(), file_path))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def fail(self, file_path: str, worker: str, error: str):
+        """Record a failed attempt; the job goes back to pending until max_attempts is reached"""
+        self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, error = ?, updated_at = ? "
+            "WHERE file_path = ? AND worker = ? AND status = ?",
+            (self.max_attempts, PENDING, FAILED, error, time.time(), file_path, worker, CLAIMED)
+        )
+
+    def analyzed_jobs(self, limit: int) -> List[tuple]:
+        return self.conn.execute("SELECT file_path, flow FROM jobs WHERE status = ? ORDER BY updated_at LIMIT ?",
+                                 (ANALYZED, limit)).fetchall()
+
+    def results(self, file_path: str) -> List[tuple]:
+        return self.conn.execute("SELECT chunk_id, document, metadata, embedding FROM results WHERE file_path = ?",
+                                 (file_path,)).fetchall()
+
+    def mark_stored(self, file_paths: List[str]):
+        self._transaction()
+        try:
+            for file_path in file_paths:
+                self.conn.execute("DELETE FROM results WHERE file_path = ?", (file_path,))
+                self.conn.execute("UPDATE jobs SET status = ?, flow = NULL, updated_at = ? WHERE file_path = ?",
+                                  (STORED, time.time(), file_path))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class IngestionWorker:
+    """Claims files and does the LLM and embedding work; never opens the vector store"""
+
+    def __init__(self, job_queue: IngestionQueue, rag_generator, worker_id: Optional[str] = None):
+        self.queue = job_queue
+        self.rag = rag_generator
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    def process_file(self, file_path: str):
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = f.readlines()
+        file_name = os.path.basename(file_path)
+        flow = extract_control_flow(lines, file_name)
+
+        for chunk in self.rag.chunker.iter_chunks(lines, file_name):
+            embedding = self.rag.analyze_chunk(chunk, flow.flow_context(chunk.start_line, chunk.end_line))
+            if not embedding:
+                # Usually a throttled or failed Bedrock call; completing the file would lose this chunk for good
+                raise ChunkFailed(f"no embedding for lines {chunk.start_line}-{chunk.end_line}")
+            chunk_id, metadata = self.rag.chunk_record(
+                chunk, paragraphs=", ".join(p.name for p in flow.paragraphs_in(chunk.start_line, chunk.end_line))
+            )
+            flow.chunks.append((chunk.start_line, chunk.end_line, chunk_id))
+            self.queue.add_result(file_path, self.worker_id, chunk_id, chunk.content, metadata, embedding)
+
+        self.queue.complete(file_path, self.worker_id, flow.to_dict() if flow.paragraphs else None)
+
+    def run(self, poll_seconds: float = 5.0, exit_when_idle: bool = True) -> int:
+        """Process jobs until the queue is empty (or forever); returns the number of files analyzed"""
+        processed = 0
+        while True:
+            file_path = self.queue.claim(self.worker_id)
+            if file_path is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_seconds)
+                continue
+
+            print(f"[{self.worker_id}] Processing {file_path}")
+            try:
+                self.process_file(file_path)
+                processed += 1
+            except LeaseLost:
+                print(f"[{self.worker_id}] Lease on {file_path} expired and was reclaimed; dropping it")
+            except Exception as e:
+                print(f"[{self.worker_id}] Error processing {file_path}: {e}")
+                self.queue.fail(file_path, self.worker_id, str(e))
+
+        print(f"[{self.worker_id}] Worker finished: {processed} files analyzed")
+        return processed
+
+
+class VectorStoreWriter:
+    """The only process that writes to ChromaDB; commits analyzed files in batches"""
+
+    def __init__(self, job_queue: IngestionQueue, rag_generator,
+                 batch_size: int = Config.INGESTION_WRITER_BATCH_SIZE):
+        self.queue = job_queue
+        self.rag = rag_generator
+        self.batch_size = batch_size
+
+    def write_pending(self) -> int:
+        """Commit analyzed files (up to about batch_size chunks per ChromaDB call); returns files stored"""
+        jobs = self.queue.analyzed_jobs(self.batch_size)
+        if not jobs:
+            return 0
+
+        ids, documents, metadatas, embeddings, done = [], [], [], [], []
+        for file_path, flow in jobs:
+            if ids and len(ids) >= self.batch_size:
+                break
+            # A re-ingested file replaces everything stored for it before
+            self.rag.collection.delete(where={"file_name": os.path.basename(file_path)})
+            for chunk_id, document, metadata, embedding in self.queue.results(file_path):
+                ids.append(chunk_id)
+                documents.append(document)
+                metadatas.append(json.loads(metadata))
+                embeddings.append(json.loads(embedding))
+            if flow:
+                self.rag.control_flow.save(ProgramControlFlow.from_dict(json.loads(flow)))
+            done.append(file_path)
+
+        if ids:
+            self.rag.collection.add(embeddings=embeddings, documents=documents, metadatas=metadatas, ids=ids)
+        self.queue.mark_stored(done)
+        print(f"Stored {len(ids)} chunks from {len(done)} files")
+        return len(done)
+
+    def run(self, poll_seconds: float = 2.0, exit_when_idle: bool = False) -> int:
+        stored = 0
+        while True:
+            written = self.write_pending()
+            stored += written
+            if written:
+                continue
+            counts = self.queue.counts()
+            if exit_when_idle and not counts.get(PENDING) and not counts.get(CLAIMED):
+                break
+            time.sleep(poll_seconds)
+        print(f"Writer finished: {stored} files stored")
+        return stored
+
+
+def find_cobol_files(source_dir: str) -> List[str]:
+    cobol_files = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            try:
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
+            except OSError:
+                continue
+            result = classify_member(content, file_path)
+            if result.prog_type == COBOL_TYPE and result.confidence >= Config.CLASSIFIER_MIN_CONFIDENCE:
+                cobol_files.append(file_path)
+    return cobol_files
+
+
+def main():
+    """Command line entry point: enqueue files, run workers, run the single writer"""
+    from pseudocode import RAGPseudoCodeGenerator
+
+    parser = argparse.ArgumentParser(description="Multi-process COBOL ingestion with a single vector store writer")
+    parser.add_argument("mode", choices=["enqueue", "worker", "writer", "status"])
+    parser.add_argument("source_dir", nargs="?", help="Directory of COBOL members (enqueue mode)")
+    parser.add_argument("--queue-db", default=Config.INGESTION_QUEUE_DB_PATH)
+    parser.add_argument("--chroma-db", default=Config.CHROMA_DB_PATH)
+    parser.add_argument("--model-routing", action="store_true", help="Route chunks to template/small/large models")
+    parser.add_argument("--follow", action="store_true",
+                        help="Keep polling for new jobs instead of exiting when the queue is drained")
+    args = parser.parse_args()
+
+    job_queue = IngestionQueue(args.queue_db)
+    if args.mode == "enqueue":
+        if not args.source_dir:
+            parser.error("enqueue needs a source_dir")
+        files = find_cobol_files(args.source_dir)
+        print(f"Queued {job_queue.enqueue(files)} of {len(files)} COBOL files")
+    elif args.mode == "worker":
+        rag = RAGPseudoCodeGenerator(region_name=Config.AWS_REGION, model_routing=args.model_routing,
+                                     open_store=False)
+        IngestionWorker(job_queue, rag).run(exit_when_idle=not args.follow)
+    elif args.mode == "writer":
+        rag = RAGPseudoCodeGenerator(chroma_db_path=args.chroma_db, region_name=Config.AWS_REGION)
+        VectorStoreWriter(job_queue, rag).run(exit_when_idle=not args.follow)
+    else:
+        print(job_queue.counts())
+
+
+if __name__ == "__main__":
+    main()
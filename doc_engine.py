@@ -0,0 +1,443 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from functools import partial
+from datetime import datetime
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional
+
+from config import Config
+from pseudocode import ClaudeClient
+from technical_document_prompt import create_technical_documentation_prompt
+from functional_doc import create_functional_documentation_prompt
+from workflow import create_workflow_documentation_prompt
+from fact_extraction import FactExtractor
+from sectional_docs import TokenBudgetPlanner, SectionalDocumenter
+from member_classifier import classify_member, UNKNOWN_TYPE, COPYBOOK_TYPE
+from sub_file import create_member_documentation_prompt
+from copybook_layout import CopybookLayoutCache, create_layout_context, render_layout_section, iter_fields
+from xref_graph import CrossReferenceGraph
+from jcl_lineage import DatasetLineageIndex
+
+
+DOC_PROMPT_BUILDERS = {
+    "technical": create_technical_documentation_prompt,
+    "functional": create_functional_documentation_prompt,
+    "workflow": create_workflow_documentation_prompt,
+}
+
+# Member-type specific documentation (sub_file.py templates), routed by the classifier
+MEMBER_DOC_TYPE = "member"
+DOC_TYPES = list(DOC_PROMPT_BUILDERS) + [MEMBER_DOC_TYPE]
+
+
+def generate_comprehensive_documentation(code_content, filename, doc_type="all"):
+    """
+    Generate comprehensive documentation prompts for the given code content
+
+    Parameters:
+    - code_content: The source code to document
+    - filename: Name of the source file
+    - doc_type: Type of documentation to generate ("technical", "functional", "workflow", or "all")
+
+    Returns:
+    - A dictionary containing the requested documentation types
+    """
+    documentation = {}
+
+    for name, builder in DOC_PROMPT_BUILDERS.items():
+        if doc_type in [name, "all"]:
+            documentation[name] = builder(code_content, filename)
+
+    return documentation
+
+
+def _prompt_with_context(builder, context, code_content, filename):
+    """Prepend precomputed analysis to the source given to a (code, filename) template"""
+    return builder(f"{context}\n\n{code_content}", filename)
+
+
+@dataclass
+class DocJob:
+    """A single (source file, documentation type) unit of work"""
+    source_path: str
+    rel_path: str
+    doc_type: str
+    output_path: str
+    source_hash: str
+    source_mode: str = "source"  # "facts" when documented from the cached fact-extraction pass
+
+    @property
+    def key(self) -> str:
+        return f"{self.rel_path}::{self.doc_type}"
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting requests per minute"""
+
+    def __init__(self, requests_per_minute: int):
+        self.capacity = max(1, requests_per_minute)
+        self.tokens = float(self.capacity)
+        self.fill_rate = self.capacity / 60.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request slot is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.fill_rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.fill_rate
+
+            time.sleep(wait)
+
+
+class DocManifest:
+    """Resumable record of generated documentation.
+
+    Every finished job is appended to ``manifest.jsonl`` as soon as it completes,
+    so an interrupted run loses nothing; ``manifest.json`` is the consolidated
+    view written at the end of each run.
+    """
+
+    def __init__(self, output_dir: str):
+        self.journal_path = os.path.join(output_dir, "manifest.jsonl")
+        self.manifest_path = os.path.join(output_dir, "manifest.json")
+        self.entries: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self.entries.update(json.load(f).get("entries", {}))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written line from an interrupted run
+                    self.entries[entry["key"]] = entry
+
+    def is_done(self, job: DocJob) -> bool:
+        entry = self.entries.get(job.key)
+        return bool(
+            entry
+            and entry.get("status") == "done"
+            and entry.get("source_hash") == job.source_hash
+            and entry.get("source_mode", "source") == job.source_mode
+            and os.path.exists(job.output_path)
+        )
+
+    def record(self, job: DocJob, status: str, **details):
+        entry = {
+            "key": job.key,
+            "source": job.rel_path,
+            "doc_type": job.doc_type,
+            "output_file": job.output_path,
+            "source_hash": job.source_hash,
+            "source_mode": job.source_mode,
+            "status": status,
+            "updated_at": datetime.now().isoformat(),
+        }
+        entry.update(details)
+
+        with self.lock:
+            self.entries[job.key] = entry
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def save(self):
+        """Write the consolidated manifest and truncate the journal"""
+        with self.lock:
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": 1,
+                    "generated_at": datetime.now().isoformat(),
+                    "entries": self.entries,
+                }, f, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+
+
+class DocumentationEngine:
+    """Concurrent, rate-limited, resumable documentation generation over a source tree"""
+
+    def __init__(
+        self,
+        output_dir: str = Config.DOC_OUTPUT_DIR,
+        max_workers: int = Config.DOC_MAX_WORKERS,
+        requests_per_minute: int = Config.DOC_REQUESTS_PER_MINUTE,
+        max_retries: int = Config.DOC_MAX_RETRIES,
+        max_tokens: int = Config.DOC_MAX_TOKENS,
+        region_name: str = Config.AWS_REGION,
+        claude: Optional[ClaudeClient] = None,
+        use_facts: bool = False,
+        xref_db_path: Optional[str] = None,
+        lineage_db_path: Optional[str] = None
+    ):
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.max_tokens = max_tokens
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.claude = claude or ClaudeClient(region_name)
+        self.fact_extractor = FactExtractor(self.claude, rate_limiter=self.rate_limiter) if use_facts else None
+        self.planner = TokenBudgetPlanner(output_tokens=max_tokens)
+        self.layout_cache = CopybookLayoutCache()
+        # Whole-tree cross-reference graph supplies upstream/downstream dependencies
+        self.xref = CrossReferenceGraph(xref_db_path) if xref_db_path else None
+        # Which jobs create and read each DSN/GDG, for the JCL data-flow sections
+        self.lineage = DatasetLineageIndex(lineage_db_path) if lineage_db_path else None
+        self.sectional = SectionalDocumenter(
+            self.claude, self.planner, max_workers=max_workers, max_tokens=max_tokens,
+            rate_limiter=self.rate_limiter, max_retries=max_retries
+        )
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = DocManifest(self.output_dir)
+
+    def find_source_files(self, source_dir: str, extensions: Optional[List[str]] = None) -> List[str]:
+        """Find source members under source_dir (PDS unloads often have no extension)"""
+        wanted = {ext.lower() for ext in extensions} if extensions else None
+        output_root = os.path.abspath(self.output_dir)
+        source_files = []
+
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = sorted(
+                d for d in dirs
+                if not d.startswith('.') and os.path.abspath(os.path.join(root, d)) != output_root
+            )
+            for name in sorted(files):
+                if name.startswith('.'):
+                    continue
+                if wanted is not None and os.path.splitext(name)[1].lower() not in wanted:
+                    continue
+                source_files.append(os.path.join(root, name))
+
+        return source_files
+
+    def plan_jobs(self, source_dir: str, doc_types: List[str], extensions: Optional[List[str]] = None) -> List[DocJob]:
+        """Build the job list for every source file and requested documentation type"""
+        unknown = [d for d in doc_types if d not in DOC_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown documentation types: {', '.join(unknown)}")
+
+        jobs = []
+        for source_path in self.find_source_files(source_dir, extensions):
+            with open(source_path, 'rb') as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()
+
+            rel_path = os.path.relpath(source_path, source_dir)
+            for doc_type in doc_types:
+                jobs.append(DocJob(
+                    source_path=source_path,
+                    rel_path=rel_path,
+                    doc_type=doc_type,
+                    output_path=os.path.join(self.output_dir, f"{rel_path}.{doc_type}.md"),
+                    source_hash=source_hash,
+                    source_mode="facts" if self.fact_extractor is not None else "source"
+                ))
+
+        return jobs
+
+    def get_prompt_builder(self, job: DocJob, code_content: str):
+        """Return the prompt builder for a job and any routing details for the manifest"""
+        contexts = self.member_contexts(job)
+
+        if job.doc_type != MEMBER_DOC_TYPE:
+            builder = DOC_PROMPT_BUILDERS[job.doc_type]
+            if contexts:
+                builder = partial(_prompt_with_context, builder, "\n\n".join(contexts))
+            return builder, {}
+
+        result = classify_member(code_content, job.source_path)
+        if result.prog_type == UNKNOWN_TYPE or result.confidence < Config.CLASSIFIER_MIN_CONFIDENCE:
+            # Don't spend an LLM call on a template that is probably wrong
+            raise ValueError(f"Could not classify member (best guess {result.prog_type}, "
+                             f"confidence {result.confidence})")
+
+        details = {"prog_type": result.prog_type, "confidence": result.confidence}
+
+        if result.prog_type == COPYBOOK_TYPE:
+            # Field types, offsets and lengths are computed locally rather than by the model
+            records = self.layout_cache.get_layout(code_content)
+            if records:
+                contexts.append(create_layout_context(records))
+                details["layout_fields"] = sum(1 for _ in iter_fields(records))
+
+        builder = partial(create_member_documentation_prompt, prog_type=result.prog_type,
+                          context="\n\n".join(contexts) or None)
+        return builder, details
+
+    def member_contexts(self, job: DocJob) -> List[str]:
+        """Precomputed whole-tree context for a member (dependencies, dataset lineage)"""
+        contexts = []
+        if self.xref is not None:
+            contexts.append(self.xref.render_context(job.source_path))
+        if self.lineage is not None:
+            contexts.append(self.lineage.render_context(job.source_path))
+        return [context for context in contexts if context]
+
+    def build_prompt(self, job: DocJob, code_content: str, builder=None) -> str:
+        """Build the documentation prompt for a job.
+
+        In facts mode every doc type for a member is rendered from one cached
+        extraction pass instead of inlining the raw source three times.
+        """
+        filename = os.path.basename(job.source_path)
+        builder = builder or self.get_prompt_builder(job, code_content)[0]
+        return builder(self.prompt_source(code_content, filename), filename)
+
+    def prompt_source(self, code_content: str, filename: str) -> str:
+        """What the templates receive as the code: the facts rendering in facts mode, else the raw source"""
+        if self.fact_extractor is not None:
+            facts_context = self.fact_extractor.facts_context(code_content, filename)
+            if facts_context is not None:
+                return facts_context
+        return code_content
+
+    def _call_claude(self, prompt: str) -> str:
+        """Call Claude under the rate limit, retrying empty responses with backoff"""
+        for attempt in range(1, self.max_retries + 1):
+            self.rate_limiter.acquire()
+            response = self.claude.generate_response(prompt, max_tokens=self.max_tokens)
+            if response:
+                return response
+            if attempt < self.max_retries:
+                time.sleep(2 ** attempt)
+        return ""
+
+    def run_job(self, job: DocJob) -> Dict:
+        """Generate and write the documentation for a single job"""
+        started = time.monotonic()
+
+        with open(job.source_path, 'r', encoding='utf-8', errors='ignore') as f:
+            code_content = f.read()
+
+        filename = os.path.basename(job.source_path)
+        builder, details = self.get_prompt_builder(job, code_content)
+        # Plan on the prompt that is actually sent: a facts rendering often fits where the source would not
+        prompt_source = self.prompt_source(code_content, filename)
+        prompt = builder(prompt_source, filename)
+        plan = self.planner.plan(prompt, code_content, filename, details.get("prog_type"))
+        details["facts_used"] = prompt_source is not code_content
+
+        if plan.mode == "single":
+            document = self._call_claude(prompt)
+        else:
+            # Too large for one request: document section by section and reduce
+            document = self.sectional.document(code_content, filename, job.doc_type, builder, plan)
+
+        if not document:
+            raise RuntimeError("Claude returned an empty response")
+
+        if details.get("layout_fields"):
+            document += render_layout_section(self.layout_cache.get_layout(code_content))
+
+        os.makedirs(os.path.dirname(job.output_path), exist_ok=True)
+        tmp_path = job.output_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(document)
+        os.replace(tmp_path, job.output_path)
+
+        details.update({
+            "mode": plan.mode,
+            "sections": len(plan.sections),
+            "prompt_tokens": plan.prompt_tokens,
+            "output_chars": len(document),
+            "duration_seconds": round(time.monotonic() - started, 2),
+        })
+        return details
+
+    def run(self, source_dir: str, doc_types: List[str] = None, extensions: Optional[List[str]] = None) -> Dict[str, int]:
+        """Document every file under source_dir, skipping jobs already completed"""
+        doc_types = doc_types or list(DOC_PROMPT_BUILDERS)
+        if self.xref is not None:
+            # Incremental: only members whose content changed are re-extracted
+            self.xref.scan_directory(source_dir, extensions)
+        if self.lineage is not None:
+            self.lineage.build(source_dir, extensions)
+        jobs = self.plan_jobs(source_dir, doc_types, extensions)
+        pending = [job for job in jobs if not self.manifest.is_done(job)]
+
+        print(f"Planned {len(jobs)} documentation jobs, {len(jobs) - len(pending)} already complete")
+
+        stats = {"total": len(jobs), "skipped": len(jobs) - len(pending), "done": 0, "failed": 0}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self.run_job, job): job for job in pending}
+
+                for i, future in enumerate(as_completed(futures), 1):
+                    job = futures[future]
+                    try:
+                        details = future.result()
+                        self.manifest.record(job, "done", **details)
+                        stats["done"] += 1
+                        print(f"[{i}/{len(pending)}] {job.rel_path} ({job.doc_type}) done")
+                    except Exception as e:
+                        self.manifest.record(job, "failed", error=str(e))
+                        stats["failed"] += 1
+                        print(f"[{i}/{len(pending)}] {job.rel_path} ({job.doc_type}) failed: {e}")
+        finally:
+            self.manifest.save()
+
+        print(f"Documentation run finished: {stats['done']} generated, "
+              f"{stats['skipped']} skipped, {stats['failed']} failed")
+        return stats
+
+
+def main():
+    """Command line entry point for documenting a source tree"""
+    parser = argparse.ArgumentParser(description="Generate documentation for every member of a source tree")
+    parser.add_argument("source_dir", help="Directory containing the source members")
+    parser.add_argument("--doc-types", nargs="+", default=list(DOC_PROMPT_BUILDERS),
+                        choices=DOC_TYPES, help="Documentation types to generate "
+                        "('member' uses the JCL/PROC/CLIST/COBOL/Assembler/copybook templates)")
+    parser.add_argument("--extensions", nargs="*", help="Only include files with these extensions (e.g. .cbl .jcl)")
+    parser.add_argument("--output-dir", default=Config.DOC_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=Config.DOC_MAX_WORKERS)
+    parser.add_argument("--rpm", type=int, default=Config.DOC_REQUESTS_PER_MINUTE, help="Claude requests per minute")
+    parser.add_argument("--use-facts", action="store_true",
+                        help="Render all doc types from one cached fact-extraction pass per member")
+    parser.add_argument("--xref", action="store_true",
+                        help="Index the tree into the cross-reference graph and give each prompt its dependencies")
+    parser.add_argument("--xref-db", default=Config.XREF_DB_PATH)
+    parser.add_argument("--lineage", action="store_true",
+                        help="Build the JCL dataset-lineage index and give JCL/PROC prompts their dataset producers/consumers")
+    parser.add_argument("--lineage-db", default=Config.LINEAGE_DB_PATH)
+    args = parser.parse_args()
+
+    engine = DocumentationEngine(
+        output_dir=args.output_dir,
+        max_workers=args.workers,
+        requests_per_minute=args.rpm,
+        use_facts=args.use_facts,
+        xref_db_path=args.xref_db if args.xref else None,
+        lineage_db_path=args.lineage_db if args.lineage else None
+    )
+    engine.run(args.source_dir, args.doc_types, args.extensions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+import os
+import json
+import time
+import socket
+import signal
+import asyncio
+import logging
+import argparse
+import threading
+import http.client
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Any, Optional
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+import boto3
+from botocore.config import Config as BotoConfig
+
+from backend_parser import ExcelEstimationParser, CapabilityInfo, TitanEmbedder, SentenceTransformerEmbedder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_ID = "anthropic.claude-3-5-sonnet-20240620-v1:0"  # Claude 3.5 Sonnet model ID
+
+
+class BedrockClientPool:
+    """One Bedrock runtime client shared by every request; its connection pool bounds concurrent calls.
+
+    boto3 clients are thread-safe, so the pool is a single client with max_pool_connections
+    sized to the number of Bedrock slots, created on first use.
+    """
+
+    def __init__(self, size: int = 16, region_name: str = 'us-east-1'):
+        self.size = size
+        self.region_name = region_name
+        self.client = None
+        self.client_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def _client(self):
+        with self.client_lock:
+            if self.client is None:
+                session = boto3.Session(
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    aws_session_token=os.getenv("AWS_SESSION_TOKEN")
+                )
+                self.client = session.client(
+                    service_name='bedrock-runtime', region_name=self.region_name, verify=False,
+                    config=BotoConfig(max_pool_connections=self.size, retries={'max_attempts': 3, 'mode': 'adaptive'})
+                )
+            return self.client
+
+    def invoke(self, prompt: str, system: Optional[str] = None, max_tokens: int = 2000,
+               temperature: float = 0.1, model_id: str = MODEL_ID) -> str:
+        """Invoke Claude through Bedrock, waiting for a free slot"""
+        request_payload = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": [{"role": "user", "content": [{"text": prompt}]}]
+        }
+        if system:
+            request_payload["system"] = system
+
+        with self.slots:
+            response = self._client().invoke_model(
+                modelId=model_id,
+                contentType="application/json",
+                accept="application/json",
+                body=json.dumps(request_payload).encode("utf-8")
+            )
+        response_body = json.loads(response["body"].read().decode("utf-8"))
+        return response_body["content"][0]["text"]
+
+
+class SearchBatcher:
+    """Coalesces /search requests arriving within a short window into one search_many call"""
+
+    def __init__(self, parser: ExcelEstimationParser, executor: ThreadPoolExecutor,
+                 window_seconds: float = 0.005, max_batch: int = 64):
+        self.parser = parser
+        self.executor = executor
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.pending: Dict[int, List[Tuple[str, asyncio.Future]]] = {}
+
+    async def search(self, query: str, top_k: int) -> List[Tuple[CapabilityInfo, float]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.setdefault(top_k, [])
+        batch.append((query, future))
+        if len(batch) == 1:
+            loop.call_later(self.window_seconds, lambda: loop.create_task(self._flush(top_k, batch)))
+        elif len(batch) >= self.max_batch:
+            loop.create_task(self._flush(top_k, batch))
+        return await future
+
+    async def _flush(self, top_k: int, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # The window timer may fire after a full batch was already flushed
+        if self.pending.get(top_k) is not batch:
+            return
+        del self.pending[top_k]
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.parser.search_many, [query for query, _ in batch], top_k
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class EstimationService:
+    """Async HTTP service over one shared, warm ExcelEstimationParser.
+
+    Searches read the parser's immutable snapshot in a thread pool, so they never wait on
+    a refresh; the folder watcher, POST /refresh and SIGHUP swap in new snapshots. Every
+    response carries the snapshot version in X-Data-Version so clients can drop derived caches.
+    """
+
+    def __init__(self, parser: ExcelEstimationParser, bedrock: BedrockClientPool,
+                 search_workers: int = 4, batch_window_seconds: float = 0.005,
+                 max_body_bytes: int = 1024 * 1024):
+        self.parser = parser
+        self.bedrock = bedrock
+        self.max_body_bytes = max_body_bytes
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="estimation-search")
+        # Bedrock calls take seconds; a separate pool keeps them from starving searches
+        self.bedrock_executor = ThreadPoolExecutor(max_workers=bedrock.size, thread_name_prefix="estimation-bedrock")
+        # Refreshes re-parse workbooks for seconds; one dedicated thread keeps them off the search pool
+        self.refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="estimation-refresh")
+        self.refresh_inflight: Optional[asyncio.Future] = None
+        self.refresh_inflight_force = False
+        self.batcher = SearchBatcher(parser, self.search_executor, batch_window_seconds)
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/stats'): self.stats,
+            ('POST', '/search'): self.search,
+            ('POST', '/search_many'): self.search_many,
+            ('GET', '/top_cost'): self.top_cost,
+            ('GET', '/cost_range'): self.cost_range,
+            ('GET', '/by_size'): self.by_size,
+            ('POST', '/refresh'): self.refresh,
+            ('POST', '/answer'): self.answer,
+        }
+
+    @staticmethod
+    def _results(results: List[Tuple[CapabilityInfo, float]]) -> List[Dict[str, Any]]:
+        return [{'capability': asdict(cap), 'similarity': similarity} for cap, similarity in results]
+
+    async def _run(self, executor: ThreadPoolExecutor, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+    async def health(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {'status': 'ok'}
+
+    async def stats(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self.parser.get_stats()
+
+    async def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        results = await self.batcher.search(str(params['query']), int(params.get('top_k', 3)))
+        return {'results': self._results(results)}
+
+    async def search_many(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        queries = [str(query) for query in params['queries']]
+        results = await self._run(self.search_executor, self.parser.search_many, queries, int(params.get('top_k', 3)))
+        return {'results': [self._results(result) for result in results]}
+
+    async def top_cost(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        capabilities = self.parser.top_cost_capabilities(int(params.get('n', 10)))
+        return {'capabilities': [asdict(cap) for cap in capabilities]}
+
+    async def cost_range(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        min_cost = float(params['min_cost']) if params.get('min_cost') is not None else None
+        max_cost = float(params['max_cost']) if params.get('max_cost') is not None else None
+        capabilities = self.parser.capabilities_in_cost_range(min_cost, max_cost)
+        return {'capabilities': [asdict(cap) for cap in capabilities]}
+
+    async def by_size(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        capabilities = self.parser.capabilities_by_size(params.get('min_size', 'XXS'), params.get('max_size', 'XXXL'))
+        return {'capabilities': [asdict(cap) for cap in capabilities]}
+
+    async def refresh(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        force = str(params.get('force_refresh', False)).lower() in ('1', 'true')
+        return {'changed': await self._refresh(force)}
+
+    async def _refresh(self, force_refresh: bool = False) -> int:
+        """Run one refresh at a time; a request arriving while one is in flight joins it"""
+        while self.refresh_inflight is not None and not self.refresh_inflight.done():
+            inflight = self.refresh_inflight
+            if not force_refresh or self.refresh_inflight_force:
+                # Shielded: a client disconnecting must not cancel the refresh others are waiting on
+                return await asyncio.shield(inflight)
+            # A forced refresh re-parses everything, so it starts after the running one
+            await asyncio.wait([inflight])
+        self.refresh_inflight = asyncio.get_running_loop().run_in_executor(
+            self.refresh_executor, self.parser.parse_excel_files, force_refresh
+        )
+        self.refresh_inflight_force = force_refresh
+        return await asyncio.shield(self.refresh_inflight)
+
+    async def _refresh_on_signal(self) -> None:
+        try:
+            changed = await self._refresh()
+            logger.info(f"SIGHUP refresh: {changed} workbook(s) added, changed or removed")
+        except Exception as e:
+            logger.error(f"SIGHUP refresh failed: {e}")
+
+    async def answer(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        text = await self._run(
+            self.bedrock_executor, self.bedrock.invoke,
+            str(params['prompt']), params.get('system'),
+            int(params.get('max_tokens', 2000)), float(params.get('temperature', 0.1)),
+            params.get('model_id', MODEL_ID)
+        )
+        return {'text': text}
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        url = urlparse(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            return 404, {'error': f"No route for {method} {url.path}"}
+        try:
+            params = dict(parse_qsl(url.query))
+            if body:
+                params.update(json.loads(body))
+            return 200, await handler(params)
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {'error': f"Bad request: {e}"}
+        except Exception as e:
+            logger.error(f"{method} {url.path} failed: {e}")
+            return 500, {'error': str(e)}
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                       keep_alive: bool) -> None:
+        data = json.dumps(payload, default=str).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {http.client.responses.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"X-Data-Version: {self.parser.data_version}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+        )
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').rstrip("\r\n").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    error = 400, {'error': f"Bad request: invalid Content-Length {length!r}"}
+                elif int(length) > self.max_body_bytes:
+                    error = 413, {'error': f"Request body of {int(length)} bytes exceeds the "
+                                           f"{self.max_body_bytes} byte limit"}
+                else:
+                    error = None
+                if error is not None:
+                    # The body is left unread, so the connection cannot carry another request
+                    await self._respond(writer, *error, keep_alive=False)
+                    break
+                body = await reader.readexactly(int(length))
+
+                started = time.time()
+                status, payload = await self._dispatch(method, target, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                logger.debug(f"{method} {target} {status} in {(time.time() - started) * 1000:.1f}ms")
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, socket_path: Optional[str] = None) -> None:
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+            logger.info(f"Estimation service listening on unix://{socket_path}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            logger.info(f"Estimation service listening on http://{host}:{port}")
+
+        # SIGHUP re-checks the folder right away
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(
+                signal.SIGHUP, lambda: loop.create_task(self._refresh_on_signal())
+            )
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+
+        async with server:
+            await server.serve_forever()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class EstimationServiceClient:
+    """Talks to an EstimationService with the same methods the frontend uses on ExcelEstimationParser.
+
+    url is http://host:port or unix:///path/to/socket. Each thread keeps its own
+    keep-alive connection.
+    """
+
+    get_capability_summary = staticmethod(ExcelEstimationParser.get_capability_summary)
+
+    def __init__(self, url: str, timeout: float = 120.0):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self.local = threading.local()
+        self.data_version = 0  # snapshot version from the latest response
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            if self.url.scheme == 'unix':
+                connection = UnixHTTPConnection(self.url.path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+            self.local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        for attempt in range(2):
+            connection = self._connection()
+            reused = connection.sock is not None
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                self.local.connection = None
+                # Only a kept-alive connection the server already closed is worth one retry
+                if attempt or not reused:
+                    raise
+
+        version = response.getheader('X-Data-Version')
+        if version is not None:
+            self.data_version = int(version)
+        result = json.loads(data)
+        if response.status != 200:
+            raise RuntimeError(f"Estimation service error {response.status}: {result.get('error')}")
+        return result
+
+    @staticmethod
+    def _results(results: List[Dict[str, Any]]) -> List[Tuple[CapabilityInfo, float]]:
+        return [(CapabilityInfo(**result['capability']), result['similarity']) for result in results]
+
+    def parse_excel_files(self, force_refresh: bool = False) -> int:
+        return self._request('POST', '/refresh', {'force_refresh': force_refresh})['changed']
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self._request('GET', '/stats')
+
+    def search_capabilities(self, query: str, top_k: int = 3) -> List[Tuple[CapabilityInfo, float]]:
+        return self._results(self._request('POST', '/search', {'query': query, 'top_k': top_k})['results'])
+
+    def search_many(self, queries: List[str], top_k: int = 3) -> List[List[Tuple[CapabilityInfo, float]]]:
+        response = self._request('POST', '/search_many', {'queries': queries, 'top_k': top_k})
+        return [self._results(results) for results in response['results']]
+
+    def top_cost_capabilities(self, n: int = 10) -> List[CapabilityInfo]:
+        return [CapabilityInfo(**cap) for cap in self._request('GET', f"/top_cost?{urlencode({'n': n})}")['capabilities']]
+
+    def capabilities_in_cost_range(self, min_cost: Optional[float] = None,
+                                   max_cost: Optional[float] = None) -> List[CapabilityInfo]:
+        params = {'min_cost': min_cost, 'max_cost': max_cost}
+        query = urlencode({name: value for name, value in params.items() if value is not None})
+        response = self._request('GET', f"/cost_range?{query}")
+        return [CapabilityInfo(**cap) for cap in response['capabilities']]
+
+    def capabilities_by_size(self, min_size: str = 'XXS', max_size: str = 'XXXL') -> List[CapabilityInfo]:
+        response = self._request('GET', f"/by_size?{urlencode({'min_size': min_size, 'max_size': max_size})}")
+        return [CapabilityInfo(**cap) for cap in response['capabilities']]
+
+    def answer(self, prompt: str, system: Optional[str] = None, max_tokens: int = 2000,
+               temperature: float = 0.1, model_id: str = MODEL_ID) -> str:
+        """Claude answer through the service's shared Bedrock client"""
+        return self._request('POST', '/answer', {
+            'prompt': prompt, 'system': system, 'max_tokens': max_tokens,
+            'temperature': temperature, 'model_id': model_id
+        })['text']
+
+
+def main():
+    """Command line entry point: serve one folder's estimation index to every frontend worker"""
+    parser = argparse.ArgumentParser(description="Shared capability estimation index as a local service")
+    parser.add_argument("folder", nargs="?", default=os.getenv("ESTIMATION_FOLDER", "./excel_files"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("ESTIMATION_SERVICE_PORT", "8765")))
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--cache-dir", default="capability_cache")
+    parser.add_argument("--embeddings", choices=["", "titan", "local"], default=os.getenv("ESTIMATION_EMBEDDINGS", "").lower(),
+                        help="Hybrid search with Titan or sentence-transformers embeddings (default: TF-IDF only)")
+    parser.add_argument("--dense-weight", type=float, default=float(os.getenv("ESTIMATION_DENSE_WEIGHT", "0.5")))
+    parser.add_argument("--watch-interval", type=float,
+                        default=float(os.getenv("ESTIMATION_WATCH_INTERVAL_SECONDS", "30")))
+    parser.add_argument("--search-workers", type=int, default=4)
+    parser.add_argument("--batch-window-ms", type=float, default=5.0)
+    parser.add_argument("--bedrock-pool-size", type=int, default=16)
+    parser.add_argument("--max-body-bytes", type=int,
+                        default=int(os.getenv("ESTIMATION_MAX_BODY_BYTES", str(1024 * 1024))),
+                        help="Requests with a larger body are rejected with 413")
+    args = parser.parse_args()
+
+    embedder = None
+    if args.embeddings == "titan":
+        from pseudocode import TitanEmbeddings
+        embedder = TitanEmbedder(TitanEmbeddings())
+    elif args.embeddings == "local":
+        embedder = SentenceTransformerEmbedder()
+
+    estimation_parser = ExcelEstimationParser(args.folder, cache_dir=args.cache_dir,
+                                              embedder=embedder, dense_weight=args.dense_weight)
+    estimation_parser.parse_excel_files()
+    estimation_parser.start_watcher(args.watch_interval)
+    service = EstimationService(
+        estimation_parser, BedrockClientPool(args.bedrock_pool_size),
+        search_workers=args.search_workers, batch_window_seconds=args.batch_window_ms / 1000,
+        max_body_bytes=args.max_body_bytes
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        estimation_parser.stop_watcher()
+
+
+if __name__ == "__main__":
+    main()
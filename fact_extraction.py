@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+from config import Config
+from pseudocode import ClaudeClient
+
+
+# Bump when the extraction prompt or schema changes so stale cache entries are ignored
+FACTS_SCHEMA_VERSION = 1
+
+FACT_SECTIONS = ["entities", "files", "paragraphs", "calls", "rules", "error_paths"]
+
+
+def create_fact_extraction_prompt(code_content, filename):
+    """Create a prompt for the single structured extraction pass over a source member"""
+    return f"""Extract structured facts from the following mainframe source member. These facts will be used INSTEAD of the source code to write technical, functional and workflow documentation, so capture every detail a documentation writer would need, but keep each entry short.
+
+Return ONLY a JSON object with exactly these keys:
+
+{{
+  "program": "program, job or member name",
+  "purpose": "2-3 sentence summary of what the member does",
+  "entities": [{{"name": "business entity or record", "fields": ["key fields"], "description": "business meaning"}}],
+  "files": [{{"name": "file, DD name, dataset or table", "mode": "INPUT|OUTPUT|I-O|EXTEND|SQL|VSAM", "record": "record layout or copybook", "description": "purpose"}}],
+  "paragraphs": [{{"name": "paragraph, section, step or routine", "purpose": "what it does", "performs": ["paragraphs it PERFORMs or branches to"]}}],
+  "calls": [{{"target": "called program, PROC, transaction or utility", "type": "CALL|LINK|XCTL|EXEC PGM|PROC|SQL", "purpose": "why it is called"}}],
+  "rules": [{{"rule": "business rule, validation or calculation", "location": "paragraph or step", "detail": "conditions, formulas and values"}}],
+  "error_paths": [{{"condition": "error condition detected", "handling": "action taken, return code or abend", "location": "paragraph or step"}}]
+}}
+
+Source member: {filename}
+
+{code_content}
+"""
+
+
+def render_facts(facts: Dict[str, Any]) -> str:
+    """Render extracted facts as compact text for the documentation templates"""
+    lines = [f"Program: {facts.get('program', '')}", f"Purpose: {facts.get('purpose', '')}"]
+
+    for section in FACT_SECTIONS:
+        items = facts.get(section) or []
+        if not items:
+            continue
+
+        lines.append("")
+        lines.append(f"{section.replace('_', ' ').title()}:")
+        for item in items:
+            if isinstance(item, dict):
+                parts = []
+                for key, value in item.items():
+                    if isinstance(value, list):
+                        value = ", ".join(str(v) for v in value)
+                    if value:
+                        parts.append(f"{key}={value}")
+                lines.append(f"- {'; '.join(parts)}")
+            else:
+                lines.append(f"- {item}")
+
+    return "\n".join(lines)
+
+
+def parse_facts_response(response: str) -> Optional[Dict[str, Any]]:
+    """Parse the JSON object out of a Claude response, tolerating code fences"""
+    match = re.search(r'\{.*\}', response, re.DOTALL)
+    if not match:
+        return None
+
+    try:
+        facts = json.loads(match.group(0))
+    except ValueError:
+        return None
+
+    if not isinstance(facts, dict):
+        return None
+
+    for section in FACT_SECTIONS:
+        facts.setdefault(section, [])
+    return facts
+
+
+class FactExtractor:
+    """Runs one structured extraction pass per source member and caches the result on disk"""
+
+    def __init__(self, claude: Optional[ClaudeClient] = None, cache_dir: str = Config.FACT_CACHE_DIR,
+                 max_tokens: int = Config.FACT_MAX_TOKENS, rate_limiter=None):
+        self.claude = claude or ClaudeClient(Config.AWS_REGION)
+        self.cache_dir = cache_dir
+        self.max_tokens = max_tokens
+        self.rate_limiter = rate_limiter
+        self.locks: Dict[str, threading.Lock] = {}
+        self.locks_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cache_key(self, code_content: str) -> str:
+        return hashlib.sha256(f"v{FACTS_SCHEMA_VERSION}\n{code_content}".encode('utf-8')).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load_cached(self, code_content: str) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(self.cache_key(code_content))
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def extract(self, code_content: str, filename: str) -> Optional[Dict[str, Any]]:
+        """Return facts for a member, calling Claude only on a cache miss"""
+        key = self.cache_key(code_content)
+
+        # Technical, functional and workflow jobs for the same member may run concurrently;
+        # serialise them per member so the extraction pass happens once.
+        with self.locks_guard:
+            lock = self.locks.setdefault(key, threading.Lock())
+
+        with lock:
+            cached = self.load_cached(code_content)
+            if cached is not None:
+                return cached
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            response = self.claude.generate_response(
+                create_fact_extraction_prompt(code_content, filename),
+                max_tokens=self.max_tokens
+            )
+            facts = parse_facts_response(response)
+
+            if facts is None:
+                print(f"Fact extraction failed for {filename}; falling back to raw source")
+                return None
+
+            tmp_path = self._cache_path(key) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(facts, f, indent=2)
+            os.replace(tmp_path, self._cache_path(key))
+
+            return facts
+
+    def facts_context(self, code_content: str, filename: str) -> Optional[str]:
+        """Compact text that replaces code_content in the documentation templates"""
+        facts = self.extract(code_content, filename)
+        if facts is None:
+            return None
+
+        return (
+            f"The source of {filename} is not included. Base the documentation on these facts "
+            f"extracted from it:\n\n{render_facts(facts)}"
+        )
@@ -0,0 +1,285 @@
+import os
+import time
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import Config
+from control_flow import extract_control_flow, ProgramControlFlow
+from copybook_dedup import COPYBOOK_SECTION
+
+
+# Marks the end of a stage's input; each worker forwards one when the last of its stage finishes
+_DONE = object()
+
+
+@dataclass
+class FileState:
+    """Per-file bookkeeping: the control flow to save once every chunk of the file has been written"""
+    file_path: str
+    flow: Optional[ProgramControlFlow] = None
+    pending: int = 0
+    chunked: bool = False
+    stored: int = 0
+    failed: int = 0
+    error: str = ""  # set when chunking stopped part way through the file
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add_chunk(self):
+        with self.lock:
+            self.pending += 1
+
+    def finish_chunking(self) -> bool:
+        """Mark chunking done; True when nothing is still in flight (the file is complete)"""
+        with self.lock:
+            self.chunked = True
+            return self.pending == 0
+
+    def finish_chunk(self, stored: bool) -> bool:
+        """Account for one written (or dropped) chunk; True when it was the file's last one"""
+        with self.lock:
+            self.pending -= 1
+            if stored:
+                self.stored += 1
+            else:
+                self.failed += 1
+            return self.chunked and self.pending == 0
+
+
+@dataclass
+class PipelineItem:
+    """A chunk moving through the analyze, embed and write stages"""
+    file: FileState
+    chunk: Any
+    flow_context: str = ""
+    embedding: Optional[List[float]] = None
+    extra_metadata: Dict[str, Any] = field(default_factory=dict)
+    signature: Any = None
+    error: str = ""
+
+
+class Stage:
+    """A pool of worker threads reading a bounded inbox and writing to the next stage's inbox"""
+
+    def __init__(self, name: str, func: Callable[[Any], Iterable[Any]], workers: int,
+                 inbox: queue.Queue, outbox: Optional[queue.Queue] = None, downstream_workers: int = 0):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.downstream_workers = downstream_workers
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self.failed = 0
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def _work(self):
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is _DONE:
+                    break
+                start = time.time()
+                failed = False
+                try:
+                    for output in self.func(item):
+                        if self.outbox is not None:
+                            self.outbox.put(output)  # blocks while the next stage is behind: backpressure
+                except Exception as e:
+                    # One bad member must not kill the worker; its remaining output is dropped
+                    print(f"{self.name} stage failed on {_describe(item)}: {e}")
+                    failed = True
+                with self._lock:
+                    self.busy_seconds += time.time() - start
+                    self.processed += 1
+                    self.failed += failed
+        finally:
+            with self._lock:
+                self._remaining -= 1
+                last = self._remaining == 0
+            if last and self.outbox is not None:
+                for _ in range(self.downstream_workers):
+                    self.outbox.put(_DONE)
+
+
+def _describe(item: Any) -> str:
+    """File name of a stage input, for error messages"""
+    if isinstance(item, PipelineItem):
+        return f"{item.chunk.file_name} lines {item.chunk.start_line}-{item.chunk.end_line}"
+    if isinstance(item, tuple) and item and isinstance(item[0], FileState):
+        return item[0].file_path
+    return str(item)
+
+
+class IngestionPipeline:
+    """Streams files through read -> chunk -> analyze -> embed -> write stages connected by bounded queues.
+
+    Chunking is fast and LLM/embedding calls are slow, so each stage has its own worker
+    pool and queue bound: the chunker blocks instead of materializing whole directories,
+    and analysis, embedding and ChromaDB writes overlap. There is exactly one writer so the
+    vector store, control-flow files and near-duplicate index see one thread.
+    """
+
+    def __init__(self, rag_generator, queue_size: int = Config.PIPELINE_QUEUE_SIZE,
+                 read_workers: int = Config.PIPELINE_READ_WORKERS,
+                 chunk_workers: int = Config.PIPELINE_CHUNK_WORKERS,
+                 analyze_workers: int = Config.PIPELINE_ANALYZE_WORKERS,
+                 embed_workers: int = Config.PIPELINE_EMBED_WORKERS):
+        self.rag = rag_generator
+        self.queue_size = queue_size
+        self.workers = {"read": read_workers, "chunk": chunk_workers, "analyze": analyze_workers,
+                        "embed": embed_workers, "write": 1}
+        self.stats = {"files": 0, "chunks": 0, "stored": 0, "failed": 0}
+        self.stats_lock = threading.Lock()
+        # Files with chunks that were not stored, so they can be re-run
+        self.failed_files: List[str] = []
+
+    # ----- stages -----
+
+    def read(self, file_path: str) -> Iterable[Any]:
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                lines = f.readlines()
+        except OSError as e:
+            print(f"Error reading {file_path}: {e}")
+            return []
+        with self.stats_lock:
+            self.stats["files"] += 1
+        return [(FileState(file_path), lines)]
+
+    def chunk(self, item) -> Iterable[PipelineItem]:
+        state, lines = item
+        file_name = os.path.basename(state.file_path)
+        # Deterministic paragraph control flow, so chunks know what PERFORMs them
+        state.flow = extract_control_flow(lines, file_name)
+        if self.rag.copybooks is not None:
+            self.rag.copybooks.clear_links(file_name)
+        if self.rag.near_duplicates is not None:
+            self.rag.near_duplicates.remove_file(file_name)
+
+        try:
+            for chunk in self.rag.chunker.iter_chunks(lines, file_name):
+                pieces = self.rag.copybooks.split_chunk(chunk) if self.rag.copybooks is not None else [chunk]
+                for piece in pieces:
+                    state.add_chunk()
+                    with self.stats_lock:
+                        self.stats["chunks"] += 1
+                    yield PipelineItem(state, piece, state.flow.flow_context(piece.start_line, piece.end_line))
+        except Exception as e:
+            state.error = f"chunking failed: {e}"
+            raise
+        finally:
+            # Chunks already sent still finish the file, even when chunking stopped early
+            if state.finish_chunking():
+                self.finish_file(state)
+
+    def analyze(self, item: PipelineItem) -> Iterable[PipelineItem]:
+        if item.chunk.section_type == COPYBOOK_SECTION:
+            return [item]  # shared copybooks are analyzed (once) by the writer
+        try:
+            item.embedding, item.extra_metadata, item.signature = self.rag.find_reusable_analysis(
+                item.chunk, item.flow_context
+            )
+            if not item.embedding:
+                self.rag.describe_chunk(item.chunk, item.flow_context)
+        except Exception as e:
+            item.error = f"analysis failed: {e}"
+        return [item]
+
+    def embed(self, item: PipelineItem) -> Iterable[PipelineItem]:
+        if item.embedding or item.error or item.chunk.section_type == COPYBOOK_SECTION:
+            return [item]
+        try:
+            item.embedding = self.rag.embed_chunk(item.chunk)
+        except Exception as e:
+            item.error = f"embedding failed: {e}"
+        return [item]
+
+    def write(self, item: PipelineItem) -> Iterable[Any]:
+        chunk, state = item.chunk, item.file
+        stored = False
+        try:
+            if item.error:
+                print(f"{chunk.file_name} lines {chunk.start_line}-{chunk.end_line}: {item.error}")
+            elif chunk.section_type == COPYBOOK_SECTION:
+                chunk_id = self.rag.store_copybook_chunk(chunk)
+                if chunk_id:
+                    state.flow.chunks.append((chunk.start_line, chunk.end_line, chunk_id))
+                    stored = True
+            elif item.embedding:
+                self.rag.store_analyzed_chunk(chunk, item.embedding, state.flow, item.extra_metadata, item.signature)
+                stored = True
+        except Exception as e:
+            print(f"Error storing {chunk.file_name} lines {chunk.start_line}-{chunk.end_line}: {e}")
+
+        with self.stats_lock:
+            self.stats["stored" if stored else "failed"] += 1
+        if state.finish_chunk(stored):
+            self.finish_file(state)
+        return []
+
+    def finish_file(self, state: FileState):
+        if state.flow is not None and state.flow.paragraphs:
+            state.flow.chunks.sort()
+            self.rag.control_flow.save(state.flow)
+        print(f"Finished {state.file_path}: {state.stored} chunks stored, {state.failed} failed"
+              + (f" ({state.error})" if state.error else ""))
+        if state.failed or state.error:
+            with self.stats_lock:
+                self.failed_files.append(state.file_path)
+
+    # ----- running -----
+
+    def run(self, file_paths: Iterable[str]) -> Dict[str, Any]:
+        """Ingest every file; returns counts plus busy seconds per stage"""
+        names = ["read", "chunk", "analyze", "embed", "write"]
+        funcs = [self.read, self.chunk, self.analyze, self.embed, self.write]
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in names]
+
+        stages = []
+        for index, (name, func) in enumerate(zip(names, funcs)):
+            last = index == len(names) - 1
+            stages.append(Stage(
+                name, func, self.workers[name], queues[index],
+                outbox=None if last else queues[index + 1],
+                downstream_workers=0 if last else self.workers[names[index + 1]]
+            ))
+
+        start = time.time()
+        for stage in stages:
+            stage.start()
+        for file_path in file_paths:
+            queues[0].put(file_path)
+        for _ in range(self.workers["read"]):
+            queues[0].put(_DONE)
+        for stage in stages:
+            stage.join()
+
+        stats = dict(self.stats)
+        stats["stage_errors"] = {stage.name: stage.failed for stage in stages if stage.failed}
+        stats["failed_files"] = sorted(self.failed_files)
+        stats["seconds"] = round(time.time() - start, 1)
+        stats["stage_busy_seconds"] = {stage.name: round(stage.busy_seconds, 1) for stage in stages}
+        print(f"Ingestion finished: {stats['files']} files, {stats['chunks']} chunks, {stats['stored']} stored, "
+              f"{stats['failed']} failed in {stats['seconds']}s (busy seconds per stage: "
+              + ", ".join(f"{name} {seconds}" for name, seconds in stats["stage_busy_seconds"].items()) + ")")
+        if stats["stage_errors"]:
+            print("Stage errors: " + ", ".join(f"{name} {count}" for name, count in stats["stage_errors"].items()))
+        if stats["failed_files"]:
+            print(f"{len(stats['failed_files'])} files were not fully ingested; re-run them:\n  "
+                  + "\n  ".join(stats["failed_files"]))
+        if self.rag.router is not None:
+            print(self.rag.router.report())
+        return stats
@@ -0,0 +1,482 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple, Iterator
+
+from config import Config
+from member_classifier import classify_member, JCL_TYPE, PROC_TYPE
+
+
+JOB_KIND = 'JOB'
+PROC_KIND = 'PROC'
+
+PRODUCER = 'PRODUCER'
+CONSUMER = 'CONSUMER'
+
+# EXEC keywords that are not symbolic parameter overrides
+EXEC_KEYWORDS = {'PGM', 'PROC', 'PARM', 'COND', 'REGION', 'TIME', 'ACCT', 'ADDRSPC', 'DPRTY', 'DYNAMNBR',
+                 'PERFORM', 'RD', 'CCSID', 'MEMLIMIT', 'PARMDD', 'TVSMSG', 'TVSAMCOM'}
+
+# Nested PROC expansion limit (z/OS allows 15 levels)
+MAX_PROC_DEPTH = 15
+
+JCL_STATEMENT = re.compile(r"^//([A-Z0-9@#$.]*)\s+([A-Z]+)\s*(.*)$")
+SYMBOL = re.compile(r"(?<!&)&([A-Z@#$][A-Z0-9@#$]{0,7})(\.?)")
+DSN_SUFFIX = re.compile(r"^(.*?)\(([^)]*)\)$")
+
+
+@dataclass
+class DDStatement:
+    """A DD statement; dsn is raw (symbols unresolved) until the job is expanded"""
+    name: str
+    dsn: str = ""
+    disp: str = ""
+    line: int = 0
+    override_step: str = ""     # PROC step named by a //PSTEP.DDNAME override
+    source_file: str = ""       # member the statement is coded in (a PROC's DDs live in the PROC)
+
+
+@dataclass
+class JCLStep:
+    """An EXEC statement with its DD statements"""
+    name: str
+    program: str = ""
+    proc: str = ""
+    line: int = 0
+    symbols: Dict[str, str] = field(default_factory=dict)     # SET values in effect at this step
+    parameters: Dict[str, str] = field(default_factory=dict)  # symbolic overrides on EXEC proc
+    dds: List[DDStatement] = field(default_factory=list)
+
+
+@dataclass
+class JCLMember:
+    """A parsed job or cataloged PROC, with any in-stream PROCs it defines"""
+    kind: str
+    name: str
+    file_path: str = ""
+    symbols: Dict[str, str] = field(default_factory=dict)     # PROC statement defaults
+    steps: List[JCLStep] = field(default_factory=list)
+    procs: Dict[str, 'JCLMember'] = field(default_factory=dict)
+
+
+@dataclass
+class DatasetUse:
+    """One resolved dataset reference in an expanded job step"""
+    dsn: str
+    generation: Optional[int]
+    role: str
+    status: str
+    job: str
+    step: str
+    proc_step: str
+    dd: str
+    program: str
+    proc: str
+    job_file: str
+    source_file: str
+    line: int
+
+
+def _operand_field(text: str) -> str:
+    """JCL operand field: everything up to the first blank outside quotes"""
+    quoted = False
+    for i, char in enumerate(text):
+        if char == "'":
+            quoted = not quoted
+        elif char == ' ' and not quoted:
+            return text[:i]
+    return text
+
+
+def jcl_statements(content: str) -> Iterator[Tuple[int, str, str, str]]:
+    """Yield (line number, name, operation, operands) with continuation lines joined"""
+    current = None
+    for line_no, line in enumerate(content.upper().splitlines(), 1):
+        if not line.startswith('//') or line.startswith('//*'):
+            continue
+        text = line[:72].rstrip()
+
+        if current is not None and current[3].endswith(',') and text[2:3] == ' ':
+            # Continuation: the operands resume anywhere in columns 4-16
+            current[3] += _operand_field(text[2:].strip())
+            continue
+
+        if current is not None:
+            yield tuple(current)
+            current = None
+
+        match = JCL_STATEMENT.match(text)
+        if match:
+            current = [line_no, match.group(1), match.group(2), _operand_field(match.group(3))]
+
+    if current is not None:
+        yield tuple(current)
+
+
+def split_operands(operands: str) -> Tuple[List[str], Dict[str, str]]:
+    """Split an operand field into positional and keyword parameters (commas inside
+    parentheses or quotes do not separate parameters)"""
+    items, current, depth, quoted = [], "", 0, False
+    for char in operands:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            items.append(current)
+            current = ""
+            continue
+        current += char
+    if current:
+        items.append(current)
+
+    positional, keywords = [], {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if sep and re.fullmatch(r"[A-Z0-9@#$.]+", key):
+            keywords[key] = value
+        else:
+            positional.append(item)
+    return positional, keywords
+
+
+def disp_status(disp: str) -> str:
+    """First DISP subparameter (NEW when omitted)"""
+    status = disp.strip('()').split(',')[0] if disp else ""
+    return status or 'NEW'
+
+
+def resolve_symbols(text: str, symbols: Dict[str, str]) -> str:
+    """Substitute &SYM / &SYM. symbolic parameters; unknown symbols are left as-is"""
+    def replace(match):
+        name = match.group(1)
+        if name not in symbols:
+            return match.group(0)
+        return symbols[name].strip("'")
+    return SYMBOL.sub(replace, text)
+
+
+def resolve_dataset(raw_dsn: str, symbols: Dict[str, str]) -> Optional[Tuple[str, Optional[int]]]:
+    """(dataset name, GDG relative generation) for a DSN; None for temporaries and backward references"""
+    if not raw_dsn or raw_dsn.startswith('&&') or raw_dsn.startswith('*.') or raw_dsn == 'NULLFILE':
+        return None
+    dsn = resolve_symbols(raw_dsn, symbols).strip("'")
+    generation = None
+    match = DSN_SUFFIX.match(dsn)
+    if match:
+        dsn = match.group(1)
+        if re.fullmatch(r"[+-]?\d+", match.group(2)):
+            generation = int(match.group(2))
+    return dsn, generation
+
+
+def parse_jcl(content: str, file_path: str = "") -> JCLMember:
+    """Parse JOB/PROC/PEND/SET/EXEC/DD statements of a job or cataloged PROC"""
+    default_name = os.path.splitext(os.path.basename(file_path))[0].upper() if file_path else ""
+    member = JCLMember(PROC_KIND, default_name, file_path)
+    owner = member
+    running_symbols: Dict[str, str] = {}
+    seen_statement = False
+
+    for line_no, label, operation, operands in jcl_statements(content):
+        positional, keywords = split_operands(operands)
+
+        if operation == 'JOB':
+            member.kind = JOB_KIND
+            member.name = label or member.name
+        elif operation == 'PROC':
+            if member.kind == JOB_KIND or seen_statement:
+                # In-stream PROC: defined here, expanded where a step EXECs it
+                owner = JCLMember(PROC_KIND, label, file_path, dict(keywords))
+                member.procs[label] = owner
+            else:
+                member.name = label or member.name
+                member.symbols.update(keywords)
+        elif operation == 'PEND':
+            owner = member
+        elif operation == 'SET':
+            running_symbols.update(keywords)
+        elif operation == 'EXEC':
+            step = JCLStep(label, line=line_no, symbols=dict(running_symbols))
+            if 'PGM' in keywords:
+                step.program = keywords['PGM']
+            elif 'PROC' in keywords:
+                step.proc = keywords['PROC']
+            elif positional:
+                step.proc = positional[0]
+            if step.proc:
+                step.parameters = {k: v for k, v in keywords.items() if k not in EXEC_KEYWORDS and '.' not in k}
+            owner.steps.append(step)
+        elif operation == 'DD' and owner.steps:
+            step = owner.steps[-1]
+            override_step, _, name = label.rpartition('.')
+            if not name and step.dds:
+                name = step.dds[-1].name  # Unnamed DD continues a concatenation
+            step.dds.append(DDStatement(
+                name=name,
+                dsn=keywords.get('DSN', keywords.get('DSNAME', '')),
+                disp=keywords.get('DISP', ''),
+                line=line_no,
+                override_step=override_step,
+                source_file=file_path
+            ))
+
+        seen_statement = True
+
+    return member
+
+
+def expand_steps(steps: List[JCLStep], procs: Dict[str, JCLMember], symbols: Dict[str, str],
+                 depth: int = 0) -> Iterator[Tuple[JCLStep, str, str, DDStatement, Dict[str, str]]]:
+    """Yield (job step, PROC step name, program, DD, symbols) with PROCs expanded and DD overrides applied"""
+    for step in steps:
+        step_symbols = dict(symbols)
+        step_symbols.update(step.symbols)
+
+        if step.program or not step.proc:
+            for dd in step.dds:
+                yield step, "", step.program, dd, step_symbols
+            continue
+
+        proc = procs.get(step.proc)
+        if proc is None or depth >= MAX_PROC_DEPTH:
+            # PROC not in the tree: only the overrides and additions coded on the job are known
+            for dd in step.dds:
+                yield step, dd.override_step, "", dd, step_symbols
+            continue
+
+        # Precedence: PROC statement defaults, then SET values, then EXEC overrides
+        proc_symbols = dict(proc.symbols)
+        proc_symbols.update(step.symbols)
+        proc_symbols.update(step.parameters)
+
+        overrides: Dict[Tuple[str, str], DDStatement] = {}
+        additions: Dict[str, List[DDStatement]] = {}
+        first_proc_step = proc.steps[0].name if proc.steps else ""
+        for dd in step.dds:
+            target = dd.override_step or first_proc_step
+            if any(d.name == dd.name for s in proc.steps if s.name == target for d in s.dds):
+                overrides[(target, dd.name)] = dd
+            else:
+                additions.setdefault(target, []).append(dd)
+
+        for proc_step in proc.steps:
+            merged = []
+            for dd in proc_step.dds:
+                override = overrides.get((proc_step.name, dd.name))
+                if override is None:
+                    merged.append(dd)
+                else:
+                    # Override keeps the PROC's parameters it does not respecify
+                    merged.append(DDStatement(dd.name, override.dsn or dd.dsn, override.disp or dd.disp,
+                                              override.line, proc_step.name, override.source_file))
+            merged.extend(additions.get(proc_step.name, []))
+            expanded = JCLStep(proc_step.name, proc_step.program, proc_step.proc, proc_step.line,
+                               dict(proc_step.symbols), dict(proc_step.parameters), merged)
+
+            for _, inner_step, program, dd, dd_symbols in expand_steps([expanded], procs, proc_symbols, depth + 1):
+                yield step, inner_step or proc_step.name, program, dd, dd_symbols
+
+
+def dataset_uses(member: JCLMember, procs: Dict[str, JCLMember]) -> List[DatasetUse]:
+    """Resolved dataset references of a job, PROCs expanded"""
+    library = dict(procs)
+    library.update(member.procs)
+    uses = []
+    for step, proc_step, program, dd, symbols in expand_steps(member.steps, library, {}):
+        resolved = resolve_dataset(dd.dsn, symbols)
+        if resolved is None:
+            continue
+        dsn, generation = resolved
+        status = disp_status(dd.disp)
+        role = PRODUCER if status in ('NEW', 'MOD') else CONSUMER
+        uses.append(DatasetUse(dsn, generation, role, status, member.name, step.name, proc_step, dd.name,
+                               program, step.proc, member.file_path, dd.source_file, dd.line))
+    return uses
+
+
+class DatasetLineageIndex:
+    """Producer/consumer index of datasets and GDGs across every job in a source tree"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jcl_members (
+        file_path TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        content_hash TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jcl_members_name ON jcl_members(name);
+
+    CREATE TABLE IF NOT EXISTS dataset_usage (
+        dsn TEXT NOT NULL,
+        generation INTEGER,
+        role TEXT NOT NULL,
+        status TEXT,
+        job TEXT NOT NULL,
+        step TEXT,
+        proc_step TEXT,
+        dd TEXT,
+        program TEXT,
+        proc TEXT,
+        job_file TEXT NOT NULL,
+        source_file TEXT,
+        line INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_usage_dsn ON dataset_usage(dsn, role);
+    CREATE INDEX IF NOT EXISTS idx_usage_job ON dataset_usage(job);
+    CREATE INDEX IF NOT EXISTS idx_usage_file ON dataset_usage(job_file);
+    CREATE INDEX IF NOT EXISTS idx_usage_proc ON dataset_usage(proc);
+
+    CREATE TABLE IF NOT EXISTS lineage_meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, db_path: str = Config.LINEAGE_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def build(self, source_dir: str, extensions: Optional[List[str]] = None) -> Dict[str, int]:
+        """(Re)build the index for every JOB and PROC under source_dir.
+
+        A changed PROC affects every job that runs it, so the whole tree is re-expanded
+        when any JCL member changed; parsing is regex-only and cheap compared to the
+        per-member LLM calls it saves.
+        """
+        wanted = {ext.lower() for ext in extensions} if extensions else None
+        members: List[Tuple[str, str]] = []
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.') or (wanted is not None and os.path.splitext(name)[1].lower() not in wanted):
+                    continue
+                file_path = os.path.abspath(os.path.join(root, name))
+                try:
+                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                        content = f.read()
+                except OSError as e:
+                    print(f"Error reading {file_path}: {e}")
+                    continue
+                if classify_member(content, file_path).prog_type in (JCL_TYPE, PROC_TYPE):
+                    members.append((file_path, content))
+
+        tree_hash = hashlib.sha256()
+        for file_path, content in members:
+            tree_hash.update(f"{file_path}\0{content}\0".encode('utf-8', errors='ignore'))
+        tree_key = f"tree:{os.path.abspath(source_dir)}"
+
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM lineage_meta WHERE key = ?", (tree_key,)).fetchone()
+        if row and row[0] == tree_hash.hexdigest():
+            print(f"Dataset lineage index is up to date ({len(members)} JCL members)")
+            return {"members": len(members), "uses": 0, "rebuilt": 0}
+
+        parsed = [parse_jcl(content, file_path) for file_path, content in members]
+        procs = {member.name: member for member in parsed if member.kind == PROC_KIND}
+
+        uses: List[DatasetUse] = []
+        for member in parsed:
+            if member.kind == JOB_KIND:
+                uses.extend(dataset_uses(member, procs))
+
+        root_prefix = os.path.join(os.path.abspath(source_dir), '')
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM dataset_usage WHERE job_file LIKE ? || '%'", (root_prefix,))
+            self.conn.execute("DELETE FROM jcl_members WHERE file_path LIKE ? || '%'", (root_prefix,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO jcl_members VALUES (?, ?, ?, ?)",
+                [(m.file_path, m.kind, m.name, hashlib.sha256(c.encode('utf-8', errors='ignore')).hexdigest())
+                 for m, (_, c) in zip(parsed, members)]
+            )
+            self.conn.executemany(
+                "INSERT INTO dataset_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(u.dsn, u.generation, u.role, u.status, u.job, u.step, u.proc_step, u.dd, u.program, u.proc,
+                  u.job_file, u.source_file, u.line) for u in uses]
+            )
+            self.conn.execute("INSERT OR REPLACE INTO lineage_meta VALUES (?, ?)", (tree_key, tree_hash.hexdigest()))
+
+        print(f"Dataset lineage index: {len(parsed)} JCL members, {len(procs)} PROCs, {len(uses)} dataset references")
+        return {"members": len(parsed), "uses": len(uses), "rebuilt": 1}
+
+    def _query(self, sql: str, params: tuple) -> List[DatasetUse]:
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [DatasetUse(*row) for row in rows]
+
+    def producers(self, dsn: str) -> List[DatasetUse]:
+        return self._query("SELECT * FROM dataset_usage WHERE dsn = ? AND role = ?", (dsn.upper(), PRODUCER))
+
+    def consumers(self, dsn: str) -> List[DatasetUse]:
+        return self._query("SELECT * FROM dataset_usage WHERE dsn = ? AND role = ?", (dsn.upper(), CONSUMER))
+
+    def job_usage(self, job: str) -> List[DatasetUse]:
+        return self._query("SELECT * FROM dataset_usage WHERE job = ? ORDER BY rowid", (job.upper(),))
+
+    def upstream_jobs(self, job: str) -> List[str]:
+        """Jobs that create datasets this job reads"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT p.job FROM dataset_usage c JOIN dataset_usage p ON p.dsn = c.dsn AND p.role = ? "
+                "WHERE c.job = ? AND c.role = ? AND p.job != c.job ORDER BY p.job",
+                (PRODUCER, job.upper(), CONSUMER)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def downstream_jobs(self, job: str) -> List[str]:
+        """Jobs that read datasets this job creates"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT c.job FROM dataset_usage p JOIN dataset_usage c ON c.dsn = p.dsn AND c.role = ? "
+                "WHERE p.job = ? AND p.role = ? AND c.job != p.job ORDER BY c.job",
+                (CONSUMER, job.upper(), PRODUCER)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def render_context(self, file_path: str, max_items: int = 60) -> Optional[str]:
+        """Dataset usage of a JOB or PROC member with the other jobs on each dataset"""
+        with self.lock:
+            row = self.conn.execute("SELECT kind, name FROM jcl_members WHERE file_path = ?",
+                                    (os.path.abspath(file_path),)).fetchone()
+        if row is None:
+            return None
+        kind, name = row
+
+        if kind == JOB_KIND:
+            uses = self.job_usage(name)
+            header = f"Dataset lineage for job {name}"
+        else:
+            uses = self._query("SELECT * FROM dataset_usage WHERE proc = ? ORDER BY job, rowid", (name,))
+            header = f"Dataset lineage for PROC {name} (as expanded in the jobs that run it)"
+        if not uses:
+            return None
+
+        lines = [f"{header}, computed across all JCL in the source tree:"]
+        for use in uses[:max_items]:
+            dataset = use.dsn + (f"({use.generation:+d})" if use.generation else "(0)" if use.generation == 0 else "")
+            where = f"{use.job}.{use.step}" + (f".{use.proc_step}" if use.proc_step else "")
+            action = "creates" if use.role == PRODUCER else "reads"
+            others = self.consumers(use.dsn) if use.role == PRODUCER else self.producers(use.dsn)
+            others = list(dict.fromkeys(
+                f"{o.job}.{o.step}" + (f"({o.generation:+d})" if o.generation else "")
+                for o in others if o.job != use.job
+            ))
+            relation = "read by" if use.role == PRODUCER else "created by"
+            line = f"- {where} {use.dd} ({use.program or 'PGM unknown'}) {action} {dataset} DISP={use.status}"
+            line += f"; {relation}: {', '.join(others[:8])}" if others else f"; {relation}: no other job in the tree"
+            lines.append(line)
+
+        if kind == JOB_KIND:
+            upstream, downstream = self.upstream_jobs(name), self.downstream_jobs(name)
+            lines.append(f"Upstream jobs (create datasets this job reads): {', '.join(upstream) or 'none found'}")
+            lines.append(f"Downstream jobs (read datasets this job creates): {', '.join(downstream) or 'none found'}")
+
+        return "\n".join(lines)
@@ -0,0 +1,314 @@
+import os
+import re
+from typing import List, Tuple, Optional
+
+from config import Config
+from pseudocode import CodeChunk, COBOLChunker
+from member_classifier import (
+    JCL_TYPE, PROC_TYPE, CLIST_TYPE, COBOL_TYPE, ASSEMBLER_TYPE, COPYBOOK_TYPE, classify_member
+)
+
+
+# (start line index, end line index exclusive, section type)
+Unit = Tuple[int, int, str]
+
+
+class StructuredChunker:
+    """Base chunker: subclasses find structural units, this class packs them into CodeChunks.
+
+    Adjacent small units are merged up to the token budget so chunks are well sized;
+    a unit larger than the budget is split at its sub-boundaries (DD statements,
+    data items, ...) and only falls back to plain line splits when it has none.
+    """
+
+    def __init__(self, max_tokens: int = Config.CHUNK_TOKEN_BUDGET):
+        self.max_chars = max_tokens * Config.CHARS_PER_TOKEN
+
+    def split_units(self, lines: List[str]) -> List[Unit]:
+        raise NotImplementedError
+
+    def sub_boundaries(self, lines: List[str], start: int, end: int) -> List[int]:
+        """Line indexes inside a unit where it may be split if oversized"""
+        return []
+
+    def chunk_file(self, file_path: str) -> List[CodeChunk]:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = f.readlines()
+        return self.chunk_lines(lines, os.path.basename(file_path))
+
+    def chunk_text(self, code_content: str, file_name: str) -> List[CodeChunk]:
+        return self.chunk_lines(code_content.splitlines(keepends=True), file_name)
+
+    def chunk_lines(self, lines: List[str], file_name: str) -> List[CodeChunk]:
+        if not lines:
+            return []
+
+        units = []
+        for start, end, section_type in self._cover(self.split_units(lines), len(lines)):
+            units.extend(self._split_oversized(lines, start, end, section_type))
+
+        return [self._make_chunk(lines, group, file_name) for group in self._pack(lines, units)]
+
+    @staticmethod
+    def _cover(units: List[Unit], line_count: int) -> List[Unit]:
+        """Make sure every line belongs to a unit (leading comments, gaps)"""
+        covered = []
+        position = 0
+        for start, end, section_type in sorted(units):
+            if start > position:
+                covered.append((position, start, 'CODE BLOCK'))
+            if end > start:
+                covered.append((max(start, position), end, section_type))
+            position = max(position, end)
+        if position < line_count:
+            covered.append((position, line_count, 'CODE BLOCK'))
+        return covered
+
+    def _size(self, lines: List[str], start: int, end: int) -> int:
+        return sum(len(line) for line in lines[start:end])
+
+    def _split_oversized(self, lines: List[str], start: int, end: int, section_type: str) -> List[Unit]:
+        if self._size(lines, start, end) <= self.max_chars:
+            return [(start, end, section_type)]
+
+        cuts = [b for b in self.sub_boundaries(lines, start, end) if start < b < end]
+        edges = [start] + cuts + [end]
+        pieces = []
+        for piece_start, piece_end in zip(edges, edges[1:]):
+            if self._size(lines, piece_start, piece_end) <= self.max_chars:
+                pieces.append((piece_start, piece_end, section_type))
+                continue
+            # No structure left to respect: split on line boundaries
+            line_start, chars = piece_start, 0
+            for i in range(piece_start, piece_end):
+                if chars and chars + len(lines[i]) > self.max_chars:
+                    pieces.append((line_start, i, section_type))
+                    line_start, chars = i, 0
+                chars += len(lines[i])
+            pieces.append((line_start, piece_end, section_type))
+
+        # Re-merge adjacent sub-pieces of this unit back up to the budget
+        return [(group[0][0], group[-1][1], section_type) for group in self._pack(lines, pieces)]
+
+    def _pack(self, lines: List[str], units: List[Unit]) -> List[List[Unit]]:
+        groups, current, current_chars = [], [], 0
+        for unit in units:
+            unit_chars = self._size(lines, unit[0], unit[1])
+            if current and current_chars + unit_chars > self.max_chars:
+                groups.append(current)
+                current, current_chars = [], 0
+            current.append(unit)
+            current_chars += unit_chars
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _make_chunk(lines: List[str], group: List[Unit], file_name: str) -> CodeChunk:
+        start, end = group[0][0], group[-1][1]
+        section_types = list(dict.fromkeys(unit[2] for unit in group))
+        return CodeChunk(
+            content=''.join(lines[start:end]),
+            start_line=start + 1,
+            end_line=end,
+            section_type=' / '.join(section_types),
+            summary="",
+            pseudo_code="",
+            file_name=file_name
+        )
+
+
+class JCLChunker(StructuredChunker):
+    """JCL and cataloged procedures: JOB/PROC header, then one unit per step, split by DD group"""
+
+    STATEMENT = re.compile(r'^//([A-Z0-9@#$.]*)\s+(JOB|EXEC|DD|PROC|PEND|SET|INCLUDE|JCLLIB|IF|ENDIF|OUTPUT)\b', re.IGNORECASE)
+
+    header_type = 'JOB HEADER'
+    step_type = 'JOB STEP'
+
+    def split_units(self, lines: List[str]) -> List[Unit]:
+        units = []
+        start, section_type = 0, self.header_type
+        awaiting_exec = False
+
+        for i, line in enumerate(lines):
+            match = self.STATEMENT.match(line)
+            if not match:
+                continue
+            operation = match.group(2).upper()
+
+            if operation == 'IF':
+                new_type = 'CONDITIONAL STEP'
+            elif operation == 'EXEC':
+                if awaiting_exec:
+                    # The step guarded by the IF that opened this unit stays with it
+                    awaiting_exec = False
+                    continue
+                new_type = self.step_type
+            elif operation == 'PROC' and i > 0:
+                new_type = 'IN-STREAM PROC'
+            else:
+                continue
+
+            awaiting_exec = operation == 'IF'
+            if i > start:
+                units.append((start, i, section_type))
+                start = i
+            section_type = new_type
+
+        units.append((start, len(lines), section_type))
+        return units
+
+    def sub_boundaries(self, lines: List[str], start: int, end: int) -> List[int]:
+        """Split oversized steps at DD statements (continuations and in-stream data stay together)"""
+        boundaries = []
+        for i in range(start, end):
+            match = self.STATEMENT.match(lines[i])
+            if match and match.group(2).upper() == 'DD' and match.group(1):
+                boundaries.append(i)
+        return boundaries
+
+
+class ProcChunker(JCLChunker):
+    """Cataloged/in-stream PROCs: PROC statement and symbolic defaults, then one unit per step"""
+
+    header_type = 'PROC HEADER'
+    step_type = 'PROC STEP'
+
+
+class CLISTChunker(StructuredChunker):
+    """CLISTs: PROC/CONTROL prologue, then one unit per labelled routine"""
+
+    LABEL = re.compile(r'^\s*([A-Z@#$][A-Z0-9@#$]*)\s*:', re.IGNORECASE)
+
+    def split_units(self, lines: List[str]) -> List[Unit]:
+        units = []
+        start, section_type = 0, 'CLIST PROLOGUE'
+        for i, line in enumerate(lines):
+            if i > start and self.LABEL.match(line):
+                units.append((start, i, section_type))
+                start, section_type = i, 'CLIST ROUTINE'
+        units.append((start, len(lines), section_type))
+        return units
+
+    def sub_boundaries(self, lines: List[str], start: int, end: int) -> List[int]:
+        # Prefer splitting where a statement begins rather than inside a + continuation
+        return [i for i in range(start + 1, end) if not lines[i - 1].rstrip().endswith(('+', '-'))]
+
+
+class AssemblerChunker(StructuredChunker):
+    """Assembler: CSECT/DSECT and macro definitions, then labelled routines within them"""
+
+    STATEMENT = re.compile(r'^([A-Z@#$][A-Z0-9@#$_]*)?\s+([A-Z][A-Z0-9]*)\b\s*(\S*)', re.IGNORECASE)
+    DATA_OPERATIONS = {'DS', 'DC', 'EQU', 'ORG', 'DSECT', 'CSECT', 'RSECT', 'START', 'LTORG', 'USING', 'DROP', 'COPY'}
+
+    def split_units(self, lines: List[str]) -> List[Unit]:
+        units = []
+        start, section_type = 0, 'PROLOGUE'
+        in_macro = False
+
+        for i, line in enumerate(lines):
+            if line.startswith('*') or line.startswith('.*'):
+                continue
+            match = self.STATEMENT.match(line)
+            if not match:
+                continue
+            label, operation, operand = match.group(1), match.group(2).upper(), match.group(3).upper()
+
+            new_type = None
+            if operation == 'MACRO':
+                in_macro = True
+                new_type = 'MACRO DEFINITION'
+            elif in_macro:
+                if operation == 'MEND':
+                    in_macro = False
+                continue
+            elif operation in ('CSECT', 'RSECT', 'START'):
+                new_type = 'CSECT'
+            elif operation == 'DSECT':
+                new_type = 'DSECT'
+            elif label and section_type != 'DSECT' and (
+                    operation not in self.DATA_OPERATIONS or (operation == 'DS' and operand == '0H')):
+                # "LABEL DS 0H" is the usual way to mark a routine entry point
+                new_type = 'ROUTINE'
+
+            if new_type and i > start:
+                units.append((start, i, section_type))
+                start = i
+            if new_type:
+                section_type = new_type
+
+        units.append((start, len(lines), section_type))
+        return units
+
+    def sub_boundaries(self, lines: List[str], start: int, end: int) -> List[int]:
+        # Any statement that does not continue the previous one (continuation column 72)
+        return [i for i in range(start + 1, end)
+                if len(lines[i - 1]) < 72 or lines[i - 1][71:72] == ' ']
+
+
+class CopybookChunker(StructuredChunker):
+    """Copybooks: one unit per 01/77-level record, split at data items when oversized"""
+
+    LEVEL = re.compile(r'^(?:[0-9 ]{6})?\s*(\d{1,2})\s+[A-Z0-9-]+', re.IGNORECASE)
+
+    def _level(self, line: str) -> Optional[int]:
+        if line[6:7] in ('*', '/'):
+            return None
+        match = self.LEVEL.match(line)
+        return int(match.group(1)) if match else None
+
+    def split_units(self, lines: List[str]) -> List[Unit]:
+        units = []
+        start, section_type = 0, 'COPYBOOK HEADER'
+        for i, line in enumerate(lines):
+            if self._level(line) not in (1, 77):
+                continue
+            if i > start:
+                units.append((start, i, section_type))
+                start = i
+            section_type = 'RECORD LAYOUT'
+        units.append((start, len(lines), section_type))
+        return units
+
+    def sub_boundaries(self, lines: List[str], start: int, end: int) -> List[int]:
+        # Keep 88-level condition names attached to their field
+        levels = {i: self._level(lines[i]) for i in range(start, end)}
+        return [i for i, level in levels.items() if level is not None and level != 88]
+
+
+class COBOLStructuredChunker(StructuredChunker):
+    """COBOL programs: COBOLChunker's division/section/paragraph boundaries with budget packing"""
+
+    def __init__(self, max_tokens: int = Config.CHUNK_TOKEN_BUDGET):
+        super().__init__(max_tokens)
+        self.cobol_chunker = COBOLChunker()
+
+    def split_units(self, lines: List[str]) -> List[Unit]:
+        return [
+            (chunk.start_line - 1, chunk.end_line, chunk.section_type)
+            for chunk in self.cobol_chunker.chunk_cobol_lines(lines, "")
+        ]
+
+
+CHUNKERS = {
+    JCL_TYPE: JCLChunker,
+    PROC_TYPE: ProcChunker,
+    CLIST_TYPE: CLISTChunker,
+    ASSEMBLER_TYPE: AssemblerChunker,
+    COPYBOOK_TYPE: CopybookChunker,
+    COBOL_TYPE: COBOLStructuredChunker,
+}
+
+
+def get_chunker(prog_type: str, max_tokens: int = Config.CHUNK_TOKEN_BUDGET) -> StructuredChunker:
+    """Chunker for a member type (COBOL rules for anything unrecognised)"""
+    return CHUNKERS.get(prog_type, COBOLStructuredChunker)(max_tokens)
+
+
+def chunk_member(code_content: str, file_name: str, prog_type: Optional[str] = None,
+                 max_tokens: int = Config.CHUNK_TOKEN_BUDGET) -> List[CodeChunk]:
+    """Chunk any member type, classifying it first when the type is not known"""
+    if prog_type is None:
+        prog_type = classify_member(code_content, file_name).prog_type
+    return get_chunker(prog_type, max_tokens).chunk_text(code_content, file_name)
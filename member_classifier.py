@@ -0,0 +1,168 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
+
+
+# Member types used to route sub_file.py documentation prompts
+JCL_TYPE = 'JCL'
+PROC_TYPE = 'PROC'
+CLIST_TYPE = 'CLIST'
+COBOL_TYPE = 'COBOL'
+ASSEMBLER_TYPE = 'ASSEMBLER'
+COPYBOOK_TYPE = 'COPYBOOK'
+UNKNOWN_TYPE = 'UNKNOWN'
+
+MEMBER_TYPES = [JCL_TYPE, PROC_TYPE, CLIST_TYPE, COBOL_TYPE, ASSEMBLER_TYPE, COPYBOOK_TYPE]
+
+# Only the head of a member is inspected; type markers appear in the first few KB
+CLASSIFY_BYTES = 4096
+
+EXTENSION_HINTS = {
+    '.jcl': JCL_TYPE, '.job': JCL_TYPE,
+    '.proc': PROC_TYPE, '.prc': PROC_TYPE,
+    '.clist': CLIST_TYPE, '.clst': CLIST_TYPE,
+    '.cbl': COBOL_TYPE, '.cob': COBOL_TYPE, '.cobol': COBOL_TYPE,
+    '.asm': ASSEMBLER_TYPE, '.mlc': ASSEMBLER_TYPE, '.mac': ASSEMBLER_TYPE,
+    '.cpy': COPYBOOK_TYPE, '.copy': COPYBOOK_TYPE,
+}
+
+# JCL statements: //name operation  (//* comments are skipped before matching)
+JCL_STATEMENT = re.compile(r'^//([A-Z0-9@#$.]*)\s+(JOB|EXEC|DD|PROC|PEND|SET|INCLUDE|JCLLIB|IF|ENDIF|OUTPUT)\b')
+
+# One anchored alternation per line for everything that is not JCL; every marker is
+# the first token (or the operation after a label), and the named group that
+# matched tells us which marker was seen.
+MARKERS = re.compile(
+    r'\s*(?:'
+    r'(?P<cobol_division>(?:IDENTIFICATION|ID|ENVIRONMENT|DATA|PROCEDURE)\s+DIVISION\b)'
+    r'|(?P<cobol_program_id>PROGRAM-ID\b)'
+    r'|(?P<cobol_section>(?:WORKING-STORAGE|LINKAGE|FILE|LOCAL-STORAGE)\s+SECTION\b)'
+    r'|(?P<level>(?:0?[1-9]|[1-4][0-9]|66|77|88)\s+[A-Z0-9][A-Z0-9-]*(?:\s|\.|$))'
+    r'|(?P<clist_proc>PROC\s+\d+\b)'
+    r'|(?P<clist_statement>(?:CONTROL|WRITE|WRITENR|ALLOC|ALLOCATE|FREE|EXIT\s+CODE|ISPEXEC|ERROR|ATTN)\b|SET\s+&)'
+    r')'
+    r'|(?P<asm_section>[A-Z@#$][A-Z0-9@#$_]*\s+(?:CSECT|DSECT|RSECT|START)\b)'
+    r'|(?P<asm_directive>\S*\s+(?:USING|DROP|LTORG|AMODE|RMODE|MACRO|MEND|EQU|ENTRY|EXTRN)\b)'
+    r'|(?P<asm_instruction>\S*\s+(?:STM|LM|BALR|BASR|BAL|BAS|BR|LR|LA|ST|MVC|CLC|CLI|DC|DS|SAVE|RETURN|GETMAIN|FREEMAIN)\s)'
+)
+
+MARKER_WEIGHTS = {
+    'cobol_division': {COBOL_TYPE: 6},
+    'cobol_program_id': {COBOL_TYPE: 6},
+    'cobol_section': {COBOL_TYPE: 3},
+    'level': {COPYBOOK_TYPE: 1},
+    'asm_section': {ASSEMBLER_TYPE: 6},
+    'asm_directive': {ASSEMBLER_TYPE: 2},
+    'asm_instruction': {ASSEMBLER_TYPE: 1},
+    'clist_proc': {CLIST_TYPE: 6},
+    'clist_statement': {CLIST_TYPE: 2},
+}
+
+# JCL statement weights; whether the evidence means JCL or PROC is decided by the
+# presence of a JOB card
+JCL_WEIGHTS = {'JOB': 8, 'PROC': 8, 'PEND': 2, 'EXEC': 3, 'DD': 1}
+
+# Score at which the evidence is decisive and the scan can stop early
+DECISIVE_SCORE = 12
+
+
+@dataclass
+class ClassificationResult:
+    """Detected member type with a 0-1 confidence score"""
+    prog_type: str
+    confidence: float
+    scores: Dict[str, int] = field(default_factory=dict)
+
+
+def _strip_sequence_area(line: str) -> str:
+    """Drop the COBOL/assembler sequence area (cols 1-6) when it holds line numbers"""
+    if len(line) > 7 and line[:6].strip().isdigit():
+        return ' ' * 6 + line[6:72]
+    return line[:72]
+
+
+def classify_member(content: str, filename: Optional[str] = None) -> ClassificationResult:
+    """Classify a mainframe member from the first few KB of its source"""
+    scores = {member_type: 0 for member_type in MEMBER_TYPES}
+    saw_division = False
+    saw_job = False
+    jcl_score = 0
+
+    for raw_line in content[:CLASSIFY_BYTES].upper().splitlines():
+        if raw_line.startswith('//'):
+            if raw_line.startswith('//*'):
+                continue
+            match = JCL_STATEMENT.match(raw_line)
+            if match:
+                saw_job = saw_job or match.group(2) == 'JOB'
+                jcl_score += JCL_WEIGHTS.get(match.group(2), 1)
+            if jcl_score >= DECISIVE_SCORE:
+                break
+            continue
+
+        line = _strip_sequence_area(raw_line)
+        stripped = line.lstrip()
+        # Skip comments: COBOL indicator '*' or '/' in col 7, assembler '*' in col 1, CLIST /* */
+        if not stripped or line[:1] == '*' or line[6:7] in ('*', '/') or stripped.startswith('/*'):
+            continue
+
+        match = MARKERS.match(line)
+        if not match:
+            continue
+
+        marker = match.lastgroup
+        if marker == 'cobol_division':
+            saw_division = True
+        for member_type, weight in MARKER_WEIGHTS[marker].items():
+            scores[member_type] += weight
+
+        if max(scores[COBOL_TYPE], scores[ASSEMBLER_TYPE], scores[CLIST_TYPE]) >= DECISIVE_SCORE:
+            break
+        # Program source declares its divisions before any data items, so a run of
+        # level numbers with no program markers is a copybook
+        if not saw_division and scores[COPYBOOK_TYPE] >= DECISIVE_SCORE and scores[COBOL_TYPE] == 0:
+            break
+
+    # Level-number lines only mean "copybook" when there is no program around them
+    if saw_division or scores[COBOL_TYPE] >= 6:
+        scores[COPYBOOK_TYPE] = 0
+    else:
+        scores[COPYBOOK_TYPE] *= 2
+
+    # JCL without a JOB card is a cataloged procedure (which may even omit the PROC statement)
+    scores[JCL_TYPE if saw_job else PROC_TYPE] += jcl_score
+
+    if filename:
+        hinted = EXTENSION_HINTS.get(os.path.splitext(filename)[1].lower())
+        if hinted:
+            scores[hinted] += 2
+
+    best_type = max(scores, key=scores.get)
+    best = scores[best_type]
+    if best <= 2:
+        return ClassificationResult(UNKNOWN_TYPE, 0.0, scores)
+
+    # Confidence rises with the margin over the runner-up and with the amount of evidence
+    runner_up = sorted(scores.values())[-2]
+    confidence = (best - runner_up) / best * min(1.0, best / DECISIVE_SCORE)
+    return ClassificationResult(best_type, round(confidence, 3), scores)
+
+
+def classify_file(file_path: str) -> ClassificationResult:
+    """Classify a member on disk, reading only its head"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        head = f.read(CLASSIFY_BYTES)
+    return classify_member(head, os.path.basename(file_path))
+
+
+def classify_files(file_paths: List[str]) -> Dict[str, ClassificationResult]:
+    """Classify many members; returns {path: result}"""
+    results = {}
+    for file_path in file_paths:
+        try:
+            results[file_path] = classify_file(file_path)
+        except OSError as e:
+            print(f"Error classifying {file_path}: {e}")
+            results[file_path] = ClassificationResult(UNKNOWN_TYPE, 0.0)
+    return results
@@ -0,0 +1,178 @@
+import re
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from copybook_dedup import normalize_line, COPYBOOK_SECTION
+
+
+TEMPLATE_TIER = 'template'
+SMALL_TIER = 'small'
+LARGE_TIER = 'large'
+TIERS = [TEMPLATE_TIER, SMALL_TIER, LARGE_TIER]
+
+# Sections documented from their declarations alone, without an LLM call
+TEMPLATE_SECTIONS = {'IDENTIFICATION DIVISION', 'ENVIRONMENT DIVISION'}
+
+# Data declarations are summarised well by the small model however long they are
+DATA_SECTIONS = {'DATA DIVISION', 'WORKING-STORAGE SECTION', 'FILE SECTION', 'LINKAGE SECTION',
+                 'LOCAL-STORAGE SECTION', COPYBOOK_SECTION}
+
+# Verb weights: branching and external interaction make a chunk harder than data movement
+VERB_WEIGHTS = {
+    'IF': 3, 'EVALUATE': 3, 'SEARCH': 3, 'GO': 3, 'EXEC': 3,
+    'PERFORM': 2, 'CALL': 2, 'READ': 2, 'WRITE': 2, 'REWRITE': 2, 'DELETE': 2, 'START': 2,
+    'OPEN': 1, 'CLOSE': 1, 'MOVE': 1, 'COMPUTE': 2, 'ADD': 1, 'SUBTRACT': 1, 'MULTIPLY': 1, 'DIVIDE': 1,
+    'STRING': 2, 'UNSTRING': 2, 'INSPECT': 2, 'INITIALIZE': 1, 'SET': 1, 'ACCEPT': 1, 'DISPLAY': 1,
+    'SORT': 3, 'MERGE': 3, 'RETURN': 1, 'RELEASE': 1, 'GOBACK': 1, 'STOP': 1, 'CONTINUE': 0, 'EXIT': 0,
+}
+NESTING_WEIGHT = 3
+
+VERB = re.compile(r"(?<![\w-])(" + "|".join(VERB_WEIGHTS) + r")(?![\w-])")
+LITERAL = re.compile(r"'[^']*'|\"[^\"]*\"")
+NEST_OPEN = re.compile(r"(?<![\w-])(?:IF|EVALUATE|SEARCH|PERFORM\s+(?:UNTIL|VARYING|WITH\s+TEST|\d+\s+TIMES))(?![\w-])")
+NEST_CLOSE = re.compile(r"(?<![\w-])END-(?:IF|EVALUATE|SEARCH|PERFORM)(?![\w-])")
+
+IDENTIFICATION_PARAGRAPH = re.compile(
+    r"^(PROGRAM-ID|AUTHOR|INSTALLATION|DATE-WRITTEN|DATE-COMPILED|SECURITY)\s*\.?\s*(.*?)\s*\.?$"
+)
+SELECT_CLAUSE = re.compile(
+    r"\bSELECT\s+(?:OPTIONAL\s+)?([A-Z0-9-]+)\s+ASSIGN\s+(?:TO\s+)?('[^']*'|\"[^\"]*\"|[A-Z0-9@#$-]+(?:\.[A-Z0-9@#$-]+)*)"
+)
+FILE_ORGANIZATION = re.compile(r"\bORGANIZATION\s+(?:IS\s+)?([A-Z]+)")
+
+
+@dataclass
+class ChunkComplexity:
+    """Complexity score of a chunk and the tier it is routed to"""
+    tier: str
+    score: int
+    statements: int
+    max_nesting: int
+    verbs: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class TierMetrics:
+    chunks: int = 0
+    calls: int = 0
+    prompt_chars: int = 0
+    response_chars: int = 0
+    seconds: float = 0.0
+
+
+def _code_lines(content: str, mask_literals: bool = True) -> List[str]:
+    lines = []
+    for line in content.splitlines():
+        text = normalize_line(line)
+        if text:
+            lines.append(LITERAL.sub("''", text) if mask_literals else text)
+    return lines
+
+
+def score_chunk(content: str) -> Tuple[int, int, int, Dict[str, int]]:
+    """(score, statement count, maximum nesting, verb counts) of a chunk's code"""
+    verbs: Dict[str, int] = {}
+    depth = max_nesting = 0
+    for line in _code_lines(content):
+        for verb in VERB.findall(line):
+            verbs[verb] = verbs.get(verb, 0) + 1
+        depth += len(NEST_OPEN.findall(line))
+        max_nesting = max(max_nesting, depth)
+        depth = max(0, depth - len(NEST_CLOSE.findall(line)))
+        if line.endswith('.'):
+            depth = 0  # a period ends every open scope
+
+    score = sum(VERB_WEIGHTS[verb] * count for verb, count in verbs.items())
+    score += NESTING_WEIGHT * max(0, max_nesting - 1)
+    return score, sum(verbs.values()), max_nesting, verbs
+
+
+def render_template(section_type: str, content: str, file_name: str = "") -> Tuple[str, str]:
+    """Deterministic (summary, pseudo code) for IDENTIFICATION/ENVIRONMENT DIVISION chunks"""
+    lines = _code_lines(content, mask_literals=False)
+    text = " ".join(lines)
+
+    if section_type == 'IDENTIFICATION DIVISION':
+        details = {}
+        for line in lines:
+            match = IDENTIFICATION_PARAGRAPH.match(line)
+            if match and match.group(2):
+                details[match.group(1)] = match.group(2).strip("'\"")
+        program = details.get('PROGRAM-ID', file_name)
+        summary = f"Identification division of program {program}."
+        extras = [f"{key.replace('-', ' ').lower()} {value}" for key, value in details.items() if key != 'PROGRAM-ID']
+        if extras:
+            summary += " Records " + ", ".join(extras) + "."
+        pseudo_code = f"PROGRAM {program}\n" + "\n".join(f"// {key}: {value}" for key, value in details.items()
+                                                        if key != 'PROGRAM-ID')
+        return summary, pseudo_code.rstrip()
+
+    files = []
+    for entry in f" {text}".split(" SELECT ")[1:]:
+        match = SELECT_CLAUSE.match(f"SELECT {entry}")
+        if match:
+            organization = FILE_ORGANIZATION.search(entry)
+            files.append((match.group(1), match.group(2).strip("'\""), organization.group(1) if organization else ""))
+
+    if files:
+        summary = (f"Environment division declaring {len(files)} file(s): "
+                   + ", ".join(f"{name} (assigned to {target})" for name, target, _ in files) + ".")
+    else:
+        summary = "Environment division with configuration entries only; no files are declared."
+    pseudo_code = "\n".join(
+        f"DECLARE FILE {name} ASSIGNED TO {target}" + (f" ({organization})" if organization else "")
+        for name, target, organization in files
+    ) or "// No file declarations"
+    return summary, pseudo_code
+
+
+class ModelRouter:
+    """Routes chunk analysis to a template, the small model or the large model by complexity"""
+
+    def __init__(self, claude, model_tiers: Optional[Dict[str, str]] = None,
+                 small_max_score: int = Config.ROUTER_SMALL_MAX_SCORE):
+        self.claude = claude
+        self.model_tiers = model_tiers or Config.MODEL_TIERS
+        self.small_max_score = small_max_score
+        self.metrics: Dict[str, TierMetrics] = {tier: TierMetrics() for tier in TIERS}
+        self.lock = threading.Lock()
+
+    def route(self, section_type: str, content: str) -> ChunkComplexity:
+        score, statements, max_nesting, verbs = score_chunk(content)
+        if section_type in TEMPLATE_SECTIONS or not _code_lines(content):
+            tier = TEMPLATE_TIER
+        elif section_type in DATA_SECTIONS or score <= self.small_max_score:
+            tier = SMALL_TIER
+        else:
+            tier = LARGE_TIER
+
+        with self.lock:
+            self.metrics[tier].chunks += 1
+        return ChunkComplexity(tier, score, statements, max_nesting, verbs)
+
+    def generate(self, tier: str, prompt: str, max_tokens: int) -> str:
+        """Call Claude with the model configured for tier"""
+        start = time.time()
+        response = self.claude.generate_response(prompt, max_tokens=max_tokens, model_id=self.model_tiers[tier])
+        with self.lock:
+            metrics = self.metrics[tier]
+            metrics.calls += 1
+            metrics.prompt_chars += len(prompt)
+            metrics.response_chars += len(response or "")
+            metrics.seconds += time.time() - start
+        return response
+
+    def report(self) -> str:
+        """Per-tier chunk counts, calls, characters and time"""
+        lines = ["Model routing:"]
+        with self.lock:
+            for tier in TIERS:
+                m = self.metrics[tier]
+                model = self.model_tiers.get(tier, "deterministic template")
+                lines.append(f"  {tier:<8} {m.chunks:>5} chunks {m.calls:>5} calls "
+                             f"{m.prompt_chars:>9} prompt chars {m.response_chars:>8} response chars "
+                             f"{m.seconds:>7.1f}s  ({model})")
+        return "\n".join(lines)
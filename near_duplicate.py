@@ -0,0 +1,150 @@
+import re
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from config import Config
+from copybook_dedup import normalized_lines, normalized_hash
+
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32              # 32 bands x 4 rows: pairs above ~0.5 Jaccard almost always share a bucket
+SHINGLE_SIZE = 3            # tokens per shingle
+MINHASH_PRIME = 4294967311  # smallest prime above 2**32, so (a * x + b) stays inside uint64
+
+TOKEN = re.compile(r"'[^']*'|\"[^\"]*\"|[A-Z0-9][A-Z0-9-]*(?:\.\d+)?|\S")
+
+_generator = np.random.RandomState(20240101)
+_PERMUTATION_A = _generator.randint(1, 2 ** 31 - 1, size=NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+_PERMUTATION_B = _generator.randint(0, 2 ** 31 - 1, size=NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+
+
+def shingles(content: str) -> List[str]:
+    """Token shingles of the normalized code, so renumbering, comments and spacing don't matter"""
+    tokens = TOKEN.findall(" ".join(normalized_lines(content)))
+    if len(tokens) <= SHINGLE_SIZE:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+
+def minhash_signature(content: str) -> np.ndarray:
+    """MinHash signature of a chunk (NUM_PERMUTATIONS uint64 values)"""
+    values = np.array(
+        [int.from_bytes(hashlib.md5(s.encode('utf-8')).digest()[:4], 'little') for s in set(shingles(content))],
+        dtype=np.uint64
+    )
+    if values.size == 0:
+        return np.full(NUM_PERMUTATIONS, MINHASH_PRIME, dtype=np.uint64)
+    hashed = (np.outer(values, _PERMUTATION_A) + _PERMUTATION_B) % np.uint64(MINHASH_PRIME)
+    return hashed.min(axis=0)
+
+
+def band_buckets(signature: np.ndarray) -> List[str]:
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [
+        f"{band}:{hashlib.md5(signature[band * rows:(band + 1) * rows].tobytes()).hexdigest()[:16]}"
+        for band in range(LSH_BANDS)
+    ]
+
+
+def estimated_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two chunks' shingle sets"""
+    return float(np.mean(first == second))
+
+
+@dataclass
+class NearDuplicate:
+    """An already-analyzed chunk that a new chunk nearly duplicates"""
+    chunk_id: str
+    file_name: str
+    start_line: int
+    end_line: int
+    similarity: float
+    identical: bool
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over analyzed chunks, used to reuse analyses of cloned code"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS signatures (
+        chunk_id TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        start_line INTEGER,
+        end_line INTEGER,
+        content_hash TEXT NOT NULL,
+        signature BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_signatures_file ON signatures(file_name);
+
+    CREATE TABLE IF NOT EXISTS lsh_buckets (
+        bucket TEXT NOT NULL,
+        chunk_id TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh_buckets(bucket);
+    CREATE INDEX IF NOT EXISTS idx_lsh_chunk ON lsh_buckets(chunk_id);
+    """
+
+    def __init__(self, db_path: str = Config.NEAR_DUPLICATE_DB_PATH,
+                 threshold: float = Config.NEAR_DUPLICATE_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, chunk_id: str, file_name: str, start_line: int, end_line: int, content: str,
+            signature: Optional[np.ndarray] = None):
+        """Index an analyzed chunk so later chunks can reuse its analysis"""
+        if signature is None:
+            signature = minhash_signature(content)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM lsh_buckets WHERE chunk_id = ?", (chunk_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO signatures VALUES (?, ?, ?, ?, ?, ?)",
+                (chunk_id, file_name, start_line, end_line, normalized_hash(content), signature.tobytes())
+            )
+            self.conn.executemany("INSERT INTO lsh_buckets VALUES (?, ?)",
+                                  [(bucket, chunk_id) for bucket in band_buckets(signature)])
+
+    def remove_file(self, file_name: str):
+        """Forget a program's chunks before it is re-processed, so it is never matched against its old self"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM lsh_buckets WHERE chunk_id IN (SELECT chunk_id FROM signatures WHERE file_name = ?)",
+                (file_name,)
+            )
+            self.conn.execute("DELETE FROM signatures WHERE file_name = ?", (file_name,))
+
+    def best_match(self, content: str, signature: Optional[np.ndarray] = None) -> Optional[NearDuplicate]:
+        """The most similar indexed chunk at or above the threshold, if any"""
+        if signature is None:
+            signature = minhash_signature(content)
+        buckets = band_buckets(signature)
+        content_hash = normalized_hash(content)
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT chunk_id, file_name, start_line, end_line, content_hash, signature FROM signatures "
+                f"WHERE chunk_id IN (SELECT DISTINCT chunk_id FROM lsh_buckets "
+                f"WHERE bucket IN ({', '.join('?' * len(buckets))}))",
+                buckets
+            ).fetchall()
+
+        best = None
+        for chunk_id, file_name, start_line, end_line, candidate_hash, blob in rows:
+            identical = candidate_hash == content_hash
+            similarity = 1.0 if identical else estimated_similarity(signature, np.frombuffer(blob, dtype=np.uint64))
+            if similarity < self.threshold:
+                continue
+            if best is None or (identical, similarity) > (best.identical, best.similarity):
+                best = NearDuplicate(chunk_id, file_name, start_line, end_line, similarity, identical)
+        return best
@@ -2,7 +2,8 @@ import os
 import re
 import json
 import hashlib
-from typing import List, Dict, Any, Tuple
+import difflib
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
 from dataclasses import dataclass
 import chromadb
 from chromadb.config import Settings
@@ -10,6 +11,13 @@ import boto3
 from botocore.exceptions import ClientError
 import numpy as np
 
+from xref_graph import CrossReferenceGraph
+from control_flow import ControlFlowStore, extract_control_flow_file
+from copybook_dedup import CopybookLibrary, SharedAnalysis, COPYBOOK_SECTION, normalized_hash
+from near_duplicate import NearDuplicateIndex, NearDuplicate, minhash_signature
+from model_router import ModelRouter, TEMPLATE_TIER, render_template
+from batch_analysis import BatchAnalyzer, BatchItem
+
 
 @dataclass
 class CodeChunk:
@@ -59,8 +67,8 @@ class ClaudeClient:
         self.bedrock = boto3.client('bedrock-runtime', region_name=region_name)
         self.model_id = 'anthropic.claude-3-5-sonnet-20241022-v2:0'
     
-    def generate_response(self, prompt: str, max_tokens: int = 4000) -> str:
-        """Generate response using Claude 3.5 Sonnet"""
+    def generate_response(self, prompt: str, max_tokens: int = 4000, model_id: Optional[str] = None) -> str:
+        """Generate response using Claude 3.5 Sonnet (or model_id, e.g. a smaller tier)"""
         try:
             body = json.dumps({
                 "anthropic_version": "bedrock-2023-05-31",
@@ -75,7 +83,7 @@ class ClaudeClient:
             
             response = self.bedrock.invoke_model(
                 body=body,
-                modelId=self.model_id,
+                modelId=model_id or self.model_id,
                 accept='application/json',
                 contentType='application/json'
             )
@@ -126,20 +134,30 @@ class COBOLChunker:
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
             lines = f.readlines()
         
-        chunks = []
+        return self.chunk_cobol_lines(lines, os.path.basename(file_path))
+    
+    def chunk_cobol_text(self, code_content: str, file_name: str) -> List[CodeChunk]:
+        """Chunk COBOL source that is already in memory"""
+        return self.chunk_cobol_lines(code_content.splitlines(keepends=True), file_name)
+    
+    def chunk_cobol_lines(self, lines: List[str], file_name: str) -> List[CodeChunk]:
+        """Chunk COBOL source lines based on structure"""
+        return list(self.iter_chunks(lines, file_name))
+    
+    def iter_chunks(self, lines: Iterable[str], file_name: str) -> Iterator[CodeChunk]:
+        """Yield chunks as soon as each one is complete, so callers can stream a file"""
         current_chunk = []
         current_start = 0
-        file_name = os.path.basename(file_path)
         
         i = 0
-        while i < len(lines):
-            line = lines[i].strip().upper()
+        for source_line in lines:
+            line = source_line.strip().upper()
             
             # Check for COBOL division/section boundaries
             is_boundary = any(section in line for section in self.cobol_sections)
             
             # Check for paragraph boundaries (ending with .)
-            is_paragraph = re.match(self.cobol_paragraphs, lines[i].strip(), re.IGNORECASE)
+            is_paragraph = re.match(self.cobol_paragraphs, source_line.strip(), re.IGNORECASE)
             
             if (is_boundary or is_paragraph or len(current_chunk) >= self.max_chunk_size) and current_chunk:
                 # Create chunk from accumulated lines
@@ -155,13 +173,13 @@ class COBOLChunker:
                     pseudo_code="",  # Will be filled by LLM
                     file_name=file_name
                 )
-                chunks.append(chunk)
+                yield chunk
                 
                 # Start new chunk
                 current_chunk = []
                 current_start = i
             
-            current_chunk.append(lines[i])
+            current_chunk.append(source_line)
             i += 1
         
         # Add final chunk if exists
@@ -172,38 +190,59 @@ class COBOLChunker:
             chunk = CodeChunk(
                 content=chunk_content,
                 start_line=current_start + 1,
-                end_line=len(lines),
+                end_line=i,
                 section_type=section_type,
                 summary="",
                 pseudo_code="",
                 file_name=file_name
             )
-            chunks.append(chunk)
-        
-        return chunks
+            yield chunk
 
 
 class RAGPseudoCodeGenerator:
     """Main class for RAG-based pseudo code generation"""
     
-    def __init__(self, chroma_db_path: str = "./chroma_db", region_name: str = 'us-east-1'):
-        self.chroma_client = chromadb.PersistentClient(path=chroma_db_path)
+    def __init__(self, chroma_db_path: str = "./chroma_db", region_name: str = 'us-east-1',
+                 xref_db_path: Optional[str] = None, control_flow_dir: str = "./control_flow",
+                 copybook_db_path: Optional[str] = None, near_duplicate_db_path: Optional[str] = None,
+                 model_routing: bool = False, batch_analysis: bool = False, open_store: bool = True):
         self.collection_name = "cobol_chunks"
-        
-        # Initialize collection
-        try:
-            self.collection = self.chroma_client.get_collection(name=self.collection_name)
-        except:
-            self.collection = self.chroma_client.create_collection(
-                name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
-            )
+        self.chroma_client = None
+        self.collection = None
+        
+        # Initialize collection (distributed ingestion workers never open the store; one writer does)
+        if open_store:
+            self.chroma_client = chromadb.PersistentClient(path=chroma_db_path)
+            try:
+                self.collection = self.chroma_client.get_collection(name=self.collection_name)
+            except:
+                self.collection = self.chroma_client.create_collection(
+                    name=self.collection_name,
+                    metadata={"hnsw:space": "cosine"}
+                )
         
         self.embeddings = TitanEmbeddings(region_name)
         self.claude = ClaudeClient(region_name)
         self.chunker = COBOLChunker()
+        # Optional cross-reference graph used to pull in related members at retrieval time
+        self.xref = CrossReferenceGraph(xref_db_path) if xref_db_path else None
+        # Paragraph-level PERFORM/GO TO graphs, one per stored program
+        self.control_flow = ControlFlowStore(control_flow_dir)
+        # Shared copybooks are analyzed and embedded once, then linked from every program that inlines them
+        self.copybooks = CopybookLibrary(copybook_db_path) if copybook_db_path else None
+        # Cloned programs reuse (or diff-patch) the analysis of the chunk they were copied from
+        self.near_duplicates = NearDuplicateIndex(near_duplicate_db_path) if near_duplicate_db_path else None
+        # Boilerplate gets a template, simple chunks the small model, complex logic the large one
+        self.router = ModelRouter(self.claude) if model_routing else None
+        # Small chunks are analyzed several to a request instead of two requests each
+        self.batcher = BatchAnalyzer(self._complete) if batch_analysis else None
     
-    def generate_chunk_summary(self, chunk: CodeChunk) -> str:
+    def _complete(self, prompt: str, max_tokens: int, tier: Optional[str] = None) -> str:
+        if tier is not None and self.router is not None:
+            return self.router.generate(tier, prompt, max_tokens)
+        return self.claude.generate_response(prompt, max_tokens=max_tokens)
+    
+    def generate_chunk_summary(self, chunk: CodeChunk, tier: Optional[str] = None) -> str:
         """Generate summary for a code chunk using Claude"""
         prompt = f"""
         Analyze this COBOL code chunk and provide a concise summary (2-3 sentences) of what it does:
@@ -223,16 +262,19 @@ class RAGPseudoCodeGenerator:
         Summary:
         """
         
-        return self.claude.generate_response(prompt, max_tokens=500)
+        return self._complete(prompt, 500, tier)
     
-    def generate_chunk_pseudocode(self, chunk: CodeChunk) -> str:
+    def generate_chunk_pseudocode(self, chunk: CodeChunk, flow_context: str = "", tier: Optional[str] = None) -> str:
         """Generate pseudo code for a chunk using Claude"""
+        if flow_context:
+            flow_context = f"Control flow of these paragraphs (computed from the whole program):\n{flow_context}\n"
+        
         prompt = f"""
         Convert this COBOL code chunk to detailed pseudo code. Use clear, structured pseudo code with proper indentation and logic flow:
         
         Section Type: {chunk.section_type}
         File: {chunk.file_name}
-        
+        {flow_context}
         COBOL Code:
         {chunk.content}
         
@@ -247,7 +289,201 @@ class RAGPseudoCodeGenerator:
         ```
         """
         
-        return self.claude.generate_response(prompt, max_tokens=2000)
+        return self._complete(prompt, 2000, tier)
+    
+    def generate_chunk_patch(self, chunk: CodeChunk, reference: Dict[str, Any], flow_context: str = "") -> bool:
+        """Update a near-duplicate chunk's analysis from the diff against the chunk it was cloned from.
+
+        One Claude call replaces the summary and pseudo code calls; returns False when the
+        response can't be split into the two parts.
+        """
+        metadata = reference["metadata"]
+        diff = "\n".join(difflib.unified_diff(
+            reference["content"].splitlines(), chunk.content.splitlines(),
+            fromfile=f"{metadata['file_name']} {metadata['start_line']}-{metadata['end_line']}",
+            tofile=f"{chunk.file_name} {chunk.start_line}-{chunk.end_line}", lineterm=""
+        ))
+        if flow_context:
+            flow_context = f"Control flow of these paragraphs (computed from the whole program):\n{flow_context}\n"
+        
+        prompt = f"""
+        This COBOL code chunk is a near copy of a chunk that has already been analyzed.
+        Update the existing summary and pseudo code so they describe the new chunk exactly.
+        Keep everything the differences do not affect unchanged.
+        
+        Section Type: {chunk.section_type}
+        File: {chunk.file_name}
+        {flow_context}
+        Existing summary:
+        {metadata.get('summary', '')}
+        
+        Existing pseudo code:
+        {metadata.get('pseudo_code', '')}
+        
+        Differences (unified diff, original -> new):
+        {diff}
+        
+        Respond in exactly this format:
+        SUMMARY:
+        <updated 2-3 sentence summary>
+        PSEUDO CODE:
+        <updated pseudo code>
+        """
+        
+        response = self.claude.generate_response(prompt, max_tokens=2500)
+        match = re.search(r"SUMMARY:\s*(.*?)\s*PSEUDO CODE:\s*(.*)", response, re.DOTALL)
+        if not match:
+            return False
+        chunk.summary, chunk.pseudo_code = match.group(1).strip(), match.group(2).strip()
+        return True
+    
+    def reuse_near_duplicate(self, chunk: CodeChunk, match: NearDuplicate,
+                             flow_context: str = "") -> Optional[List[float]]:
+        """Analysis of a near-duplicate chunk from its reference; None when the reference can't be used"""
+        results = self.collection.get(ids=[match.chunk_id], include=["documents", "metadatas", "embeddings"])
+        if not results['ids']:
+            return None
+        reference = {"content": results['documents'][0], "metadata": results['metadatas'][0]}
+        
+        if match.identical:
+            # Same code after normalization: the stored analysis and embedding apply as-is
+            chunk.summary = reference["metadata"].get("summary", "")
+            chunk.pseudo_code = reference["metadata"].get("pseudo_code", "")
+            return list(results['embeddings'][0])
+        
+        if not self.generate_chunk_patch(chunk, reference, flow_context):
+            return None
+        return self.embeddings.get_embedding(f"{chunk.summary}\n\n{chunk.content[:1000]}")
+    
+    def analyze_chunk(self, chunk: CodeChunk, flow_context: str = "", tier: Optional[str] = None) -> Optional[List[float]]:
+        """Fill in a chunk's summary and pseudo code and return its embedding"""
+        self.describe_chunk(chunk, flow_context, tier)
+        return self.embed_chunk(chunk)
+    
+    def describe_chunk(self, chunk: CodeChunk, flow_context: str = "", tier: Optional[str] = None):
+        """Fill in a chunk's summary and pseudo code (template, small or large model when routing)"""
+        if tier is None and self.router is not None:
+            tier = self.router.route(chunk.section_type, chunk.content).tier
+        if tier == TEMPLATE_TIER:
+            chunk.summary, chunk.pseudo_code = render_template(chunk.section_type, chunk.content, chunk.file_name)
+        else:
+            chunk.summary = self.generate_chunk_summary(chunk, tier)
+            chunk.pseudo_code = self.generate_chunk_pseudocode(chunk, flow_context, tier)
+    
+    def embed_chunk(self, chunk: CodeChunk) -> Optional[List[float]]:
+        # Create embedding text (combination of content and summary)
+        embedding_text = f"{chunk.summary}\n\n{chunk.content[:1000]}"  # Truncate content for embedding
+        return self.embeddings.get_embedding(embedding_text)
+    
+    def analyze_batched(self, items: List[BatchItem]) -> List[Tuple[BatchItem, Optional[List[float]]]]:
+        """Analyze small chunks several to a request; chunks missing from a response are retried individually"""
+        requests = self.batcher.stats["requests"]
+        results, missing = self.batcher.analyze(items)
+        analyzed = []
+        for item in items:
+            if item.key in results:
+                item.chunk.summary, item.chunk.pseudo_code = results[item.key]
+                analyzed.append((item, self.embed_chunk(item.chunk)))
+        for item in missing:
+            print(f"Chunk {item.chunk.start_line}-{item.chunk.end_line} missing from batch response, retrying alone")
+            analyzed.append((item, self.analyze_chunk(item.chunk, item.flow_context, item.tier)))
+        print(f"Batched {len(items)} chunks into {self.batcher.stats['requests'] - requests} requests, "
+              f"{len(missing)} retried individually")
+        return analyzed
+    
+    def find_reusable_analysis(self, chunk: CodeChunk, flow_context: str = ""):
+        """(embedding, metadata, MinHash signature) reused from a near-duplicate chunk; embedding is None without one"""
+        if self.near_duplicates is None:
+            return None, {}, None
+        
+        signature = minhash_signature(chunk.content)
+        match = self.near_duplicates.best_match(chunk.content, signature)
+        embedding = self.reuse_near_duplicate(chunk, match, flow_context) if match is not None else None
+        if not embedding:
+            return None, {}, signature
+        
+        print(f"Reused analysis of {match.file_name} lines {match.start_line}-{match.end_line} "
+              f"(similarity {match.similarity:.2f})")
+        return embedding, {"near_duplicate_of": match.chunk_id,
+                           "near_duplicate_similarity": round(match.similarity, 3),
+                           "near_duplicate_reuse": "identical" if match.identical else "patched"}, signature
+    
+    def store_analyzed_chunk(self, chunk: CodeChunk, embedding: List[float], flow,
+                             extra_metadata: Optional[Dict] = None, signature=None) -> str:
+        """Store an analyzed program chunk and register it with the control flow and near-duplicate index"""
+        chunk_id = self.store_chunk(
+            chunk, embedding,
+            paragraphs=", ".join(p.name for p in flow.paragraphs_in(chunk.start_line, chunk.end_line)),
+            extra_metadata=extra_metadata
+        )
+        flow.chunks.append((chunk.start_line, chunk.end_line, chunk_id))
+        if self.near_duplicates is not None:
+            self.near_duplicates.add(chunk_id, chunk.file_name, chunk.start_line, chunk.end_line,
+                                     chunk.content, signature)
+        print(f"Stored chunk {chunk_id}")
+        return chunk_id
+    
+    def store_chunk(self, chunk: CodeChunk, embedding: List[float], paragraphs: str = "",
+                    chunk_id: Optional[str] = None, extra_metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Store an analyzed chunk in ChromaDB and return its id"""
+        chunk_id, metadata = self.chunk_record(chunk, paragraphs, chunk_id, extra_metadata)
+        self.collection.add(
+            embeddings=[embedding],
+            documents=[chunk.content],
+            metadatas=[metadata],
+            ids=[chunk_id]
+        )
+        return chunk_id
+    
+    @staticmethod
+    def chunk_record(chunk: CodeChunk, paragraphs: str = "", chunk_id: Optional[str] = None,
+                     extra_metadata: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Vector store id and metadata of an analyzed chunk"""
+        chunk_id = chunk_id or hashlib.md5(f"{chunk.file_name}_{chunk.start_line}_{chunk.end_line}".encode()).hexdigest()
+        return chunk_id, {
+            "file_name": chunk.file_name,
+            "start_line": chunk.start_line,
+            "end_line": chunk.end_line,
+            "section_type": chunk.section_type,
+            "summary": chunk.summary,
+            "pseudo_code": chunk.pseudo_code,
+            "paragraphs": paragraphs,
+            **(extra_metadata or {})
+        }
+    
+    def store_copybook_chunk(self, chunk: CodeChunk) -> Optional[str]:
+        """Link an inlined copybook expansion to its shared analysis, analyzing it the first time it is seen"""
+        content_hash = normalized_hash(chunk.content)
+        entry = self.copybooks.match(chunk.content)
+        shared = self.copybooks.get_analysis(content_hash)
+        
+        if shared is None:
+            # Analyzed as the copybook member itself, so no program's line numbers leak into the shared record
+            copybook_chunk = CodeChunk(
+                content=chunk.content,
+                start_line=1,
+                end_line=chunk.end_line - chunk.start_line + 1,
+                section_type=COPYBOOK_SECTION,
+                summary="",
+                pseudo_code="",
+                file_name=entry.name
+            )
+            embedding = self.analyze_chunk(copybook_chunk)
+            if not embedding:
+                return None
+            chunk_id = self.store_chunk(
+                copybook_chunk, embedding, chunk_id=hashlib.md5(f"copybook_{content_hash}".encode()).hexdigest()
+            )
+            shared = SharedAnalysis(content_hash, entry.name, copybook_chunk.summary, copybook_chunk.pseudo_code,
+                                    embedding, chunk_id)
+            self.copybooks.save_analysis(shared)
+            print(f"Analyzed shared copybook {entry.name}")
+        else:
+            print(f"Reused shared analysis of copybook {shared.name}")
+        
+        chunk.summary, chunk.pseudo_code = shared.summary, shared.pseudo_code
+        self.copybooks.link(chunk.file_name, chunk.start_line, chunk.end_line, content_hash)
+        return shared.chunk_id
     
     def process_and_store_chunks(self, cobol_file_path: str):
         """Process COBOL file, generate summaries/pseudocode, and store in vector DB"""
@@ -255,45 +491,64 @@ class RAGPseudoCodeGenerator:
         
         # Chunk the file
         chunks = self.chunker.chunk_cobol_file(cobol_file_path)
+        if self.copybooks is not None:
+            # Inlined copybook expansions become their own chunks so they can be shared
+            chunks = self.copybooks.split_chunks(chunks)
+            self.copybooks.clear_links(os.path.basename(cobol_file_path))
+        if self.near_duplicates is not None:
+            self.near_duplicates.remove_file(os.path.basename(cobol_file_path))
         print(f"Created {len(chunks)} chunks")
         
+        # Deterministic paragraph control flow, so chunks know what PERFORMs them
+        flow = extract_control_flow_file(cobol_file_path)
+        
+        # Small chunks waiting for batched analysis
+        deferred: List[BatchItem] = []
+        signatures = {}
+        
         # Process each chunk
         for i, chunk in enumerate(chunks):
             print(f"Processing chunk {i+1}/{len(chunks)}")
             
-            # Generate summary and pseudo code
-            chunk.summary = self.generate_chunk_summary(chunk)
-            chunk.pseudo_code = self.generate_chunk_pseudocode(chunk)
+            if chunk.section_type == COPYBOOK_SECTION:
+                chunk_id = self.store_copybook_chunk(chunk)
+                if chunk_id:
+                    flow.chunks.append((chunk.start_line, chunk.end_line, chunk_id))
+                continue
             
-            # Create embedding text (combination of content and summary)
-            embedding_text = f"{chunk.summary}\n\n{chunk.content[:1000]}"  # Truncate content for embedding
+            flow_context = flow.flow_context(chunk.start_line, chunk.end_line)
+            embedding, extra_metadata, signature = self.find_reusable_analysis(chunk, flow_context)
             
-            # Get embedding
-            embedding = self.embeddings.get_embedding(embedding_text)
+            if not embedding:
+                tier = self.router.route(chunk.section_type, chunk.content).tier if self.router is not None else None
+                if self.batcher is not None and tier != TEMPLATE_TIER and self.batcher.accepts(chunk):
+                    deferred.append(BatchItem(f"C{i + 1}", chunk, flow_context, tier))
+                    signatures[f"C{i + 1}"] = signature
+                    continue
+                
+                # Generate summary, pseudo code and embedding
+                embedding = self.analyze_chunk(chunk, flow_context, tier)
             
             if embedding:
-                # Create unique ID
-                chunk_id = hashlib.md5(f"{chunk.file_name}_{chunk.start_line}_{chunk.end_line}".encode()).hexdigest()
-                
                 # Store in ChromaDB
-                self.collection.add(
-                    embeddings=[embedding],
-                    documents=[chunk.content],
-                    metadatas=[{
-                        "file_name": chunk.file_name,
-                        "start_line": chunk.start_line,
-                        "end_line": chunk.end_line,
-                        "section_type": chunk.section_type,
-                        "summary": chunk.summary,
-                        "pseudo_code": chunk.pseudo_code
-                    }],
-                    ids=[chunk_id]
-                )
-                
-                print(f"Stored chunk {chunk_id}")
+                self.store_analyzed_chunk(chunk, embedding, flow, extra_metadata, signature)
+        
+        if deferred:
+            for item, embedding in self.analyze_batched(deferred):
+                if embedding:
+                    self.store_analyzed_chunk(item.chunk, embedding, flow, signature=signatures[item.key])
+        
+        if flow.paragraphs:
+            flow.chunks.sort()
+            self.control_flow.save(flow)
+        if self.router is not None:
+            print(self.router.report())
     
-    def retrieve_relevant_chunks(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Retrieve relevant chunks based on query"""
+    def retrieve_relevant_chunks(self, query: str, n_results: int = 5, graph_neighbors: int = 0,
+                                 flow_neighbors: int = 0) -> List[Dict]:
+        """Retrieve relevant chunks based on query, plus up to graph_neighbors chunks
+        from members connected to the hits in the cross-reference graph and up to
+        flow_neighbors chunks holding paragraphs that PERFORM or are PERFORMed by the hits"""
         query_embedding = self.embeddings.get_embedding(query)
         
         if not query_embedding:
@@ -313,37 +568,128 @@ class RAGPseudoCodeGenerator:
                 'distance': results['distances'][0][i] if 'distances' in results else 0
             })
         
+        if flow_neighbors:
+            relevant_chunks.extend(self.retrieve_flow_neighbors(relevant_chunks, flow_neighbors))
+        
+        if graph_neighbors and self.xref is not None:
+            relevant_chunks.extend(self.retrieve_graph_neighbors(relevant_chunks, graph_neighbors))
+        
         return relevant_chunks
     
-    def generate_comprehensive_pseudocode(self, query: str, output_file: str = "pseudocode_output.md"):
+    def retrieve_flow_neighbors(self, chunks: List[Dict], limit: int) -> List[Dict]:
+        """Stored chunks one PERFORM/GO TO step away from the given chunks (no embedding call)"""
+        seen_ids = {chunk['id'] for chunk in chunks}
+        related: Dict[str, str] = {}
+        
+        for chunk in chunks:
+            flow = self.control_flow.load(chunk['metadata']['file_name'])
+            if flow is None:
+                continue
+            for paragraph in flow.paragraphs_in(chunk['metadata']['start_line'], chunk['metadata']['end_line']):
+                edges = [(e, e.dst) for e in flow.successors(paragraph.name)] + \
+                        [(e, e.src) for e in flow.predecessors(paragraph.name)]
+                for edge, other in edges:
+                    if edge.kind == "FALLS THROUGH":
+                        continue
+                    target = flow.paragraph(other)
+                    chunk_id = flow.chunk_for_line(target.start_line) if target else None
+                    if chunk_id and chunk_id not in seen_ids and chunk_id not in related:
+                        related[chunk_id] = f"{edge.src} {edge.kind} {edge.dst}"
+        
+        related_ids = list(related)[:limit]
+        if not related_ids:
+            return []
+        
+        results = self.collection.get(ids=related_ids, include=["documents", "metadatas"])
+        return [
+            {
+                'id': chunk_id,
+                'content': document,
+                'metadata': metadata,
+                'distance': 1.0,
+                'flow_relation': related[chunk_id]
+            }
+            for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        ]
+    
+    def retrieve_graph_neighbors(self, chunks: List[Dict], limit: int) -> List[Dict]:
+        """Stored chunks of callers, callees, copybooks and jobs related to the given chunks.
+        
+        Uses the cross-reference graph and a metadata lookup, so no embedding call is made.
+        """
+        file_names = list(dict.fromkeys(chunk['metadata']['file_name'] for chunk in chunks))
+        related = dict(self.xref.neighbor_files(file_names, limit=limit))
+        if not related:
+            return []
+        
+        seen_ids = {chunk['id'] for chunk in chunks}
+        results = self.collection.get(
+            where={"file_name": {"$in": list(related)}},
+            limit=limit + len(seen_ids),
+            include=["documents", "metadatas"]
+        )
+        
+        neighbor_chunks = []
+        for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas']):
+            if chunk_id in seen_ids:
+                continue
+            neighbor_chunks.append({
+                'id': chunk_id,
+                'content': document,
+                'metadata': metadata,
+                'distance': 1.0,
+                'graph_relation': related.get(metadata['file_name'], "")
+            })
+            if len(neighbor_chunks) >= limit:
+                break
+        
+        return neighbor_chunks
+    
+    def generate_comprehensive_pseudocode(self, query: str, output_file: str = "pseudocode_output.md",
+                                          graph_neighbors: int = 0, n_results: int = 10, flow_neighbors: int = 0):
         """Generate comprehensive pseudo code based on query"""
         print(f"Generating pseudo code for query: {query}")
         
         # Retrieve relevant chunks
-        relevant_chunks = self.retrieve_relevant_chunks(query, n_results=10)
+        relevant_chunks = self.retrieve_relevant_chunks(
+            query, n_results=n_results, graph_neighbors=graph_neighbors, flow_neighbors=flow_neighbors
+        )
         
         if not relevant_chunks:
             print("No relevant chunks found")
             return
         
-        # Prepare context from relevant chunks
+        # Ordered paragraph outlines replace raw code for programs with a stored control-flow graph
+        outlines = {}
+        for file_name in dict.fromkeys(chunk['metadata']['file_name'] for chunk in relevant_chunks):
+            flow = self.control_flow.load(file_name)
+            if flow is not None:
+                outlines[file_name] = flow.outline()
+        
+        # Prepare context from relevant chunks, in source order
         context_parts = []
-        for chunk in relevant_chunks:
+        for chunk in sorted(relevant_chunks, key=lambda c: (c['metadata']['file_name'], c['metadata']['start_line'])):
+            relation = chunk.get('graph_relation') or chunk.get('flow_relation')
+            related = f"\n**Related via:** {relation}" if relation else ""
+            snippet = "" if chunk['metadata']['file_name'] in outlines else f"""**Original Code Snippet:**
+```cobol
+{chunk['content'][:500]}...
+```
+"""
             context_parts.append(f"""
 ### Chunk from {chunk['metadata']['file_name']} (Lines {chunk['metadata']['start_line']}-{chunk['metadata']['end_line']})
-**Section Type:** {chunk['metadata']['section_type']}
+**Section Type:** {chunk['metadata']['section_type']}{related}
 **Summary:** {chunk['metadata']['summary']}
 **Pseudo Code:**
 ```
 {chunk['metadata']['pseudo_code']}
 ```
-**Original Code Snippet:**
-```cobol
-{chunk['content'][:500]}...
-```
-""")
+{snippet}""")
         
         context = "\n".join(context_parts)
+        if outlines:
+            context = "Program Control Flow (paragraph order computed from PERFORM/GO TO):\n" + \
+                "\n\n".join(outlines.values()) + "\n\n" + context
         
         # Generate comprehensive pseudo code
         prompt = f"""
@@ -388,7 +734,10 @@ class RAGPseudoCodeGenerator:
             for i, chunk in enumerate(relevant_chunks, 1):
                 f.write(f"### {i}. {chunk['metadata']['file_name']} (Lines {chunk['metadata']['start_line']}-{chunk['metadata']['end_line']})\n")
                 f.write(f"**Section:** {chunk['metadata']['section_type']}\n")
-                f.write(f"**Relevance Score:** {1 - chunk['distance']:.3f}\n")
+                if chunk.get('graph_relation') or chunk.get('flow_relation'):
+                    f.write(f"**Related via:** {chunk.get('graph_relation') or chunk.get('flow_relation')}\n")
+                else:
+                    f.write(f"**Relevance Score:** {1 - chunk['distance']:.3f}\n")
                 f.write(f"**Summary:** {chunk['metadata']['summary']}\n\n")
         
         print(f"Comprehensive pseudo code saved to: {output_file}")
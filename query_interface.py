@@ -0,0 +1,82 @@
+import os
+
+from config import Config
+from pseudocode import RAGPseudoCodeGenerator
+
+class QueryInterface:
+    """Interactive query interface for pseudo code generation"""
+    
+    def __init__(self):
+        self.rag_generator = RAGPseudoCodeGenerator(
+            chroma_db_path=Config.CHROMA_DB_PATH,
+            region_name=Config.AWS_REGION
+        )
+        Config.ensure_output_dir()
+    
+    def interactive_query(self):
+        """Interactive query interface"""
+        print("COBOL Pseudo Code Generator")
+        print("=" * 40)
+        
+        while True:
+            print("\nOptions:")
+            print("1. Generate pseudo code for a specific query")
+            print("2. List common query templates")
+            print("3. Exit")
+            
+            choice = input("\nEnter your choice (1-3): ").strip()
+            
+            if choice == '1':
+                query = input("Enter your query: ").strip()
+                if query:
+                    output_file = os.path.join(
+                        Config.OUTPUT_DIR,
+                        f"pseudocode_{query.replace(' ', '_')[:50]}.md"
+                    )
+                    self.rag_generator.generate_comprehensive_pseudocode(query, output_file)
+                    print(f"Pseudo code generated: {output_file}")
+            
+            elif choice == '2':
+                self.show_query_templates()
+            
+            elif choice == '3':
+                print("Goodbye!")
+                break
+            
+            else:
+                print("Invalid choice. Please try again.")
+    
+    def show_query_templates(self):
+        """Show common query templates"""
+        templates = [
+            "data validation and input processing",
+            "file handling and record processing", 
+            "calculation and business logic",
+            "error handling and exception management",
+            "database operations and SQL calls",
+            "report generation logic",
+            "batch processing workflow",
+            "data transformation and formatting",
+            "conditional logic and decision making",
+            "loop processing and iteration logic"
+        ]
+        
+        print("\nCommon Query Templates:")
+        print("-" * 30)
+        for i, template in enumerate(templates, 1):
+            print(f"{i:2d}. {template}")
+        
+        choice = input("\nSelect a template (1-10) or press Enter to return: ").strip()
+        
+        if choice.isdigit() and 1 <= int(choice) <= len(templates):
+            selected_query = templates[int(choice) - 1]
+            output_file = os.path.join(
+                Config.OUTPUT_DIR,
+                f"pseudocode_{selected_query.replace(' ', '_')}.md"
+            )
+            print(f"Generating pseudo code for: {selected_query}")
+            self.rag_generator.generate_comprehensive_pseudocode(selected_query, output_file)
+            print(f"Pseudo code generated: {output_file}")
+
+if __name__ == "__main__":
+    QueryInterface().interactive_query()
@@ -0,0 +1,221 @@
+import re
+import time
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Callable, Optional
+
+from config import Config
+from pseudocode import ClaudeClient, CodeChunk
+from mainframe_chunkers import chunk_member
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting"""
+    return len(text) // Config.CHARS_PER_TOKEN + 1
+
+
+def extract_template_sections(prompt_builder: Callable[[str, str], str], filename: str) -> List[str]:
+    """List the ## / ### headings a documentation template asks for"""
+    template = prompt_builder("", filename)
+    return [line.strip() for line in template.splitlines() if re.match(r'^\s*#{2,3}\s', line)]
+
+
+@dataclass
+class SourceSection:
+    """A contiguous run of chunks documented by one map call"""
+    chunks: List[CodeChunk]
+
+    @property
+    def start_line(self) -> int:
+        return self.chunks[0].start_line
+
+    @property
+    def end_line(self) -> int:
+        return self.chunks[-1].end_line
+
+    @property
+    def content(self) -> str:
+        return ''.join(chunk.content for chunk in self.chunks)
+
+    @property
+    def section_types(self) -> List[str]:
+        return list(dict.fromkeys(chunk.section_type for chunk in self.chunks))
+
+
+@dataclass
+class DocPlan:
+    """Single-pass or map-reduce plan for documenting one member"""
+    mode: str
+    prompt_tokens: int
+    sections: List[SourceSection] = field(default_factory=list)
+
+
+class TokenBudgetPlanner:
+    """Chooses single-pass or map-reduce documentation from a token budget"""
+
+    def __init__(
+        self,
+        context_tokens: int = Config.MODEL_CONTEXT_TOKENS,
+        output_tokens: int = Config.DOC_MAX_TOKENS,
+        section_tokens: int = Config.SECTION_TOKEN_BUDGET
+    ):
+        # Keep 10% headroom because estimate_tokens is approximate
+        self.input_budget = int((context_tokens - output_tokens) * 0.9)
+        self.section_tokens = min(section_tokens, self.input_budget)
+
+    def fits(self, prompt: str) -> bool:
+        return estimate_tokens(prompt) <= self.input_budget
+
+    def plan(self, prompt: str, code_content: str, filename: str, prog_type: Optional[str] = None) -> DocPlan:
+        """Plan documentation of code_content given the fully built single-pass prompt"""
+        prompt_tokens = estimate_tokens(prompt)
+        if prompt_tokens <= self.input_budget:
+            return DocPlan(mode="single", prompt_tokens=prompt_tokens)
+
+        # The type-specific chunker already packs structural units up to the section budget
+        chunks = chunk_member(code_content, filename, prog_type, max_tokens=self.section_tokens)
+        return DocPlan(mode="map_reduce", prompt_tokens=prompt_tokens, sections=self.pack_sections(chunks))
+
+    def pack_sections(self, chunks: List[CodeChunk]) -> List[SourceSection]:
+        """Greedily pack consecutive chunks into sections that fit the section budget"""
+        sections = []
+        current: List[CodeChunk] = []
+        current_tokens = 0
+
+        for chunk in chunks:
+            chunk_tokens = estimate_tokens(chunk.content)
+            if current and current_tokens + chunk_tokens > self.section_tokens:
+                sections.append(SourceSection(current))
+                current, current_tokens = [], 0
+            current.append(chunk)
+            current_tokens += chunk_tokens
+
+        if current:
+            sections.append(SourceSection(current))
+
+        return sections
+
+
+class SectionalDocumenter:
+    """Map-reduce documentation for members that exceed the model context"""
+
+    def __init__(
+        self,
+        claude: Optional[ClaudeClient] = None,
+        planner: Optional[TokenBudgetPlanner] = None,
+        max_workers: int = Config.DOC_MAX_WORKERS,
+        max_tokens: int = Config.DOC_MAX_TOKENS,
+        rate_limiter=None,
+        max_retries: int = Config.DOC_MAX_RETRIES
+    ):
+        self.claude = claude or ClaudeClient(Config.AWS_REGION)
+        self.planner = planner or TokenBudgetPlanner()
+        self.max_workers = max_workers
+        self.max_tokens = max_tokens
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        # One pool shared by every member being documented, so concurrent jobs
+        # add at most max_workers section calls rather than max_workers each
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="doc-section")
+
+    def _generate(self, prompt: str, max_tokens: int) -> str:
+        """Call Claude under the rate limit, retrying empty responses with backoff"""
+        for attempt in range(1, self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response = self.claude.generate_response(prompt, max_tokens=max_tokens)
+            if response:
+                return response
+            if attempt < self.max_retries:
+                time.sleep(2 ** attempt)
+        return ""
+
+    def create_section_prompt(self, section: SourceSection, index: int, total: int,
+                              filename: str, doc_type: str, headings: List[str]) -> str:
+        """Prompt for the partial documentation of one section (map step)"""
+        heading_list = "\n".join(headings)
+        return f"""You are documenting a large mainframe member in sections. This is section {index} of {total} of {filename} (lines {section.start_line}-{section.end_line}; {', '.join(section.section_types)}).
+
+Write partial {doc_type} documentation notes for THIS SECTION ONLY. Organise the notes under whichever of the following final document headings they belong to, omitting headings this section says nothing about. Record names of paragraphs, files, fields, called programs, rules and error handling precisely, since the notes from all sections will be merged into the final document without access to the source.
+
+Final document headings:
+{heading_list}
+
+Source section:
+{section.content}
+"""
+
+    def create_merge_prompt(self, partials: List[str], filename: str, doc_type: str) -> str:
+        """Prompt that condenses a group of partial notes (intermediate reduce step)"""
+        joined = "\n\n---\n\n".join(partials)
+        return f"""Merge the following partial {doc_type} documentation notes for consecutive sections of {filename} into one set of notes. Keep the same headings, keep every specific name, rule and error path, and remove repetition.
+
+{joined}
+"""
+
+    def document(self, code_content: str, filename: str, doc_type: str,
+                 prompt_builder: Callable[[str, str], str], plan: Optional[DocPlan] = None) -> str:
+        """Generate a full document for an oversized member via map-reduce"""
+        if plan is None:
+            plan = self.planner.plan(prompt_builder(code_content, filename), code_content, filename)
+
+        if plan.mode == "single":
+            return self._generate(prompt_builder(code_content, filename), self.max_tokens)
+
+        headings = extract_template_sections(prompt_builder, filename)
+        total = len(plan.sections)
+        print(f"Documenting {filename} ({doc_type}) in {total} sections")
+
+        # Map: per-section partial docs in parallel
+        partials = list(self.executor.map(
+            lambda item: self._generate(
+                self.create_section_prompt(item[1], item[0], total, filename, doc_type, headings),
+                self.max_tokens
+            ),
+            enumerate(plan.sections, 1)
+        ))
+
+        # A missing section would silently drop part of the member from the document
+        missing = [f"{s.start_line}-{s.end_line}" for s, partial in zip(plan.sections, partials) if not partial]
+        if missing:
+            raise RuntimeError(f"Claude returned empty notes for {filename} lines {', '.join(missing)}")
+
+        partials = [
+            f"### Notes for lines {section.start_line}-{section.end_line}\n{partial}"
+            for section, partial in zip(plan.sections, partials)
+        ]
+
+        # Reduce: condense groups of notes until they fit alongside the template
+        template_tokens = estimate_tokens(prompt_builder("", filename))
+        notes_budget = self.planner.input_budget - template_tokens
+        while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > notes_budget:
+            groups = self._group_partials(partials, self.planner.section_tokens)
+            if len(groups) == len(partials):
+                break  # Each note alone fills a group; merging cannot shrink further
+            partials = list(self.executor.map(
+                lambda group: self._generate(self.create_merge_prompt(group, filename, doc_type), self.max_tokens),
+                groups
+            ))
+            if not all(partials):
+                raise RuntimeError(f"Claude returned empty merged notes for {filename}")
+
+        notes = (
+            f"{filename} is too large to include in full. Below are partial documentation notes for "
+            f"each section of it, in source order. Combine them into the complete document.\n\n"
+            + "\n\n".join(partials)
+        )
+        return self._generate(prompt_builder(notes, filename), self.max_tokens)
+
+    @staticmethod
+    def _group_partials(partials: List[str], group_tokens: int) -> List[List[str]]:
+        groups, current, current_tokens = [], [], 0
+        for partial in partials:
+            tokens = estimate_tokens(partial)
+            if current and current_tokens + tokens > group_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(partial)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
@@ -1,8 +1,34 @@
 # Enhanced Mainframe Documentation Prompts
+from member_classifier import (
+    JCL_TYPE, PROC_TYPE, CLIST_TYPE, COBOL_TYPE, ASSEMBLER_TYPE, COPYBOOK_TYPE
+)
 
-## JCL (Job Control Language)
-if prog_type == JCL_TYPE:
-    base_prompt += """
+
+MEMBER_TYPE_LABELS = {
+    JCL_TYPE: "JCL (Job Control Language)",
+    PROC_TYPE: "JCL procedure",
+    CLIST_TYPE: "CLIST",
+    COBOL_TYPE: "COBOL program",
+    ASSEMBLER_TYPE: "Assembler program",
+    COPYBOOK_TYPE: "copybook",
+}
+
+
+def create_member_documentation_prompt(code_content, filename, prog_type, context=None):
+    """Create a documentation prompt tailored to the mainframe member type
+
+    context is optional precomputed analysis (e.g. a parsed copybook layout) that is
+    placed before the source so the model does not have to derive it.
+    """
+    if prog_type not in MEMBER_TYPE_LABELS:
+        raise ValueError(f"Unsupported member type: {prog_type}")
+
+    base_prompt = f"""Generate comprehensive documentation for the following mainframe {MEMBER_TYPE_LABELS[prog_type]}. Use the structure below.
+"""
+
+    # JCL (Job Control Language)
+    if prog_type == JCL_TYPE:
+        base_prompt += """
     # JCL Documentation: {filename}
     
     ## 1. Job Execution Overview
@@ -58,13 +84,10 @@ if prog_type == JCL_TYPE:
     
     Format your response with appropriate headings and subheadings, providing thorough analysis while maintaining clarity.
     """
-```
 
-## PROC/CLIST
-
-```python
-elif prog_type == PROC_TYPE or prog_type == CLIST_TYPE:
-    base_prompt += """
+    # PROC/CLIST
+    elif prog_type == PROC_TYPE or prog_type == CLIST_TYPE:
+        base_prompt += """
     # Procedure/CLIST Documentation: {filename}
     
     ## 1. Purpose & Function Overview
@@ -120,13 +143,10 @@ elif prog_type == PROC_TYPE or prog_type == CLIST_TYPE:
     
     Format your response with appropriate headings and subheadings, providing thorough analysis while maintaining clarity.
     """
-```
-
-## COBOL Programs
 
-```python
-elif prog_type == COBOL_TYPE:
-    base_prompt += """
+    # COBOL Programs
+    elif prog_type == COBOL_TYPE:
+        base_prompt += """
     # COBOL Program Documentation: {filename}
     
     ## 1. Business Purpose Overview
@@ -182,13 +202,10 @@ elif prog_type == COBOL_TYPE:
     
     Format your response with appropriate headings and subheadings, providing thorough analysis while maintaining clarity.
     """
-```
-
-## Assembler Programs
 
-```python
-elif prog_type == ASSEMBLER_TYPE:
-    base_prompt += """
+    # Assembler Programs
+    elif prog_type == ASSEMBLER_TYPE:
+        base_prompt += """
     # Assembler Program Documentation: {filename}
     
     ## 1. Program Purpose & Context
@@ -252,13 +269,10 @@ elif prog_type == ASSEMBLER_TYPE:
     
     Format your response with appropriate headings and subheadings, providing thorough analysis while maintaining clarity.
     """
-```
 
-## Copybooks
-
-```python
-elif prog_type == COPYBOOK_TYPE:
-    base_prompt += """
+    # Copybooks
+    elif prog_type == COPYBOOK_TYPE:
+        base_prompt += """
     # Copybook Documentation: {filename}
     
     ## 1. Data Structure Overview
@@ -314,4 +328,15 @@ elif prog_type == COPYBOOK_TYPE:
     
     Format your response with appropriate headings and subheadings, providing thorough analysis while maintaining clarity.
     """
-```
+
+    prompt = base_prompt.format(filename=filename)
+    if context:
+        prompt += f"""
+Precomputed analysis:
+{context}
+"""
+    return prompt + f"""
+Source member: {filename}
+
+{code_content}
+"""
@@ -0,0 +1,114 @@
+import pytest
+
+from control_flow import (
+    extract_control_flow, ControlFlowStore, FlowEdge, PERFORM, PERFORM_THRU, GO_TO, FALLS_THROUGH,
+    PROCEDURE_ENTRY
+)
+
+
+PAYFLOW = """\
+       IDENTIFICATION DIVISION.
+       PROGRAM-ID. PAYFLOW.
+       PROCEDURE DIVISION.
+       0000-MAIN.
+           PERFORM 1000-INIT
+           PERFORM 2000-READ THRU 2000-EXIT
+               UNTIL WS-EOF = 'Y'
+           PERFORM 3000-TOTALS
+           STOP RUN.
+       1000-INIT.
+           MOVE 'N' TO WS-EOF.
+       2000-READ.
+           READ PAY-FILE
+               AT END MOVE 'Y' TO WS-EOF
+           END-READ
+           IF WS-EOF = 'Y'
+               GO TO 2000-EXIT
+           END-IF
+           DISPLAY 'PERFORM 9000-ABEND'.
+       2000-EXIT.
+           EXIT.
+       3000-TOTALS SECTION.
+       3100-SUM.
+           PERFORM VARYING WS-I FROM 1 BY 1 UNTIL WS-I > 10
+               ADD WS-AMT(WS-I) TO WS-TOTAL
+           END-PERFORM.
+       3900-EXIT.
+           EXIT.
+       9000-ABEND SECTION.
+      *    PERFORM 1000-INIT
+           GOBACK.
+"""
+
+
+@pytest.fixture
+def flow():
+    return extract_control_flow(PAYFLOW.splitlines(keepends=True), "PAYFLOW.cbl")
+
+
+def edges_of(flow, kind=None):
+    return [(e.src, e.dst, e.kind) for e in flow.edges if kind is None or e.kind == kind]
+
+
+def test_paragraphs_and_sections(flow):
+    assert flow.program == 'PAYFLOW'
+    assert [(p.name, p.start_line, p.end_line) for p in flow.paragraphs] == [
+        ('0000-MAIN', 4, 9), ('1000-INIT', 10, 11), ('2000-READ', 12, 19), ('2000-EXIT', 20, 21),
+        ('3000-TOTALS', 22, 22), ('3100-SUM', 23, 26), ('3900-EXIT', 27, 28), ('9000-ABEND', 29, 31),
+    ]
+    assert flow.paragraph('3100-SUM').section == '3000-TOTALS'
+    assert flow.paragraph('3000-TOTALS').is_section
+    assert flow.entry == '0000-MAIN'
+
+
+def test_perform_edges_ignore_inline_performs_literals_and_comments(flow):
+    assert edges_of(flow, PERFORM) == [('0000-MAIN', '1000-INIT', PERFORM), ('0000-MAIN', '3000-TOTALS', PERFORM)]
+    thru = [e for e in flow.edges if e.kind == PERFORM_THRU]
+    assert [(e.dst, e.thru, e.loop, e.line) for e in thru] == [('2000-READ', '2000-EXIT', True, 6)]
+
+
+def test_go_to_and_fall_through(flow):
+    assert edges_of(flow, GO_TO) == [('2000-READ', '2000-EXIT', GO_TO)]
+    falls = edges_of(flow, FALLS_THROUGH)
+    # A conditional GO TO still falls through; STOP RUN and GOBACK end the paragraph
+    assert ('2000-READ', '2000-EXIT', FALLS_THROUGH) in falls
+    assert not any(src in ('0000-MAIN', '9000-ABEND') for src, _, _ in falls)
+    assert flow.paragraph('0000-MAIN').terminal == 'STOP RUN'
+    assert flow.paragraph('9000-ABEND').terminal == 'GOBACK'
+
+
+def test_performed_range_covers_thru_and_sections(flow):
+    thru = next(e for e in flow.edges if e.kind == PERFORM_THRU)
+    assert [p.name for p in flow.performed_range(thru)] == ['2000-READ', '2000-EXIT']
+    section = FlowEdge('0000-MAIN', '3000-TOTALS', PERFORM)
+    assert [p.name for p in flow.performed_range(section)] == ['3000-TOTALS', '3100-SUM', '3900-EXIT']
+
+
+def test_flow_context_for_a_chunk(flow):
+    assert flow.flow_context(12, 19) == "2000-READ - entered from 0000-MAIN - GO TO 2000-EXIT; FALLS THROUGH 2000-EXIT"
+
+
+def test_outline_follows_performs_and_lists_unreached(flow):
+    outline = flow.outline().splitlines()
+    assert outline[0] == "Control flow of PAYFLOW (entry 0000-MAIN):"
+    assert "  PERFORM 2000-READ THRU 2000-EXIT (loop) [lines 12-19]" in outline
+    assert "    then 3100-SUM [lines 23-26]" in outline
+    assert outline[-1] == "Not reached from the entry paragraph: 9000-ABEND"
+
+
+def test_statements_before_the_first_paragraph():
+    source = ["       PROCEDURE DIVISION.\n", "           PERFORM 1000-WORK\n", "           GOBACK.\n",
+              "       1000-WORK.\n", "           EXIT.\n"]
+    flow = extract_control_flow(source, "NOPARA.cbl")
+    assert flow.program == 'NOPARA'
+    assert flow.entry == PROCEDURE_ENTRY
+    assert edges_of(flow) == [(PROCEDURE_ENTRY, '1000-WORK', PERFORM)]
+
+
+def test_store_round_trip(flow, tmp_path):
+    flow.chunks.append((4, 9, 'chunk-1'))
+    ControlFlowStore(str(tmp_path)).save(flow)
+    loaded = ControlFlowStore(str(tmp_path)).load("PAYFLOW.cbl")
+    assert loaded == flow
+    assert loaded.chunk_for_line(6) == 'chunk-1'
+    assert loaded.chunk_for_line(12) is None
@@ -0,0 +1,138 @@
+from copybook_layout import parse_copybook, iter_fields
+
+
+def layout_of(source):
+    return {item.name: item for _, item in iter_fields(parse_copybook(source))}
+
+
+def offsets(source):
+    return {name: (item.offset, item.length) for name, item in layout_of(source).items()}
+
+
+def test_display_and_binary_widths():
+    layout = offsets("""
+       01  ORDER-REC.
+           05  ORD-ID           PIC 9(6).
+           05  ORD-AMT          PIC S9(5)V99 SIGN LEADING SEPARATE.
+           05  ORD-HALF         PIC S9(4) COMP.
+           05  ORD-FULL         PIC S9(9) BINARY.
+           05  ORD-DOUBLE       PIC S9(18) COMP-5.
+           05  ORD-FLOAT        COMP-1.
+           05  ORD-DFLOAT       COMP-2.
+           05  ORD-PACKED       PIC S9(4) COMP-3.
+    """)
+    assert layout == {
+        'ORDER-REC': (0, 43),
+        'ORD-ID': (0, 6),
+        'ORD-AMT': (6, 8),
+        'ORD-HALF': (14, 2),
+        'ORD-FULL': (16, 4),
+        'ORD-DOUBLE': (20, 8),
+        'ORD-FLOAT': (28, 4),
+        'ORD-DFLOAT': (32, 8),
+        'ORD-PACKED': (40, 3),
+    }
+
+
+def test_picture_digits_scale_and_sign():
+    layout = layout_of("""
+       01  AMOUNTS.
+           05  NET              PIC S9(7)V99 COMP-3.
+           05  RATE             PIC 9V9(4).
+    """)
+    assert (layout['NET'].digits, layout['NET'].scale, layout['NET'].signed) == (9, 2, True)
+    assert (layout['RATE'].digits, layout['RATE'].scale, layout['RATE'].signed) == (5, 4, False)
+
+
+def test_double_byte_fields():
+    layout = offsets("""
+       01  CUSTOMER-REC.
+           05  CUST-ID          PIC X(8).
+           05  CUST-NAME-N      PIC N(10).
+           05  CUST-NAME-G      PIC G(4).
+           05  CUST-BALANCE     PIC S9(7)V99 COMP-3.
+    """)
+    assert layout['CUST-ID'] == (0, 8)
+    assert layout['CUST-NAME-N'] == (8, 20)
+    assert layout['CUST-NAME-G'] == (28, 8)
+    assert layout['CUST-BALANCE'] == (36, 5)
+    assert layout['CUSTOMER-REC'] == (0, 41)
+
+
+def test_occurs_multiplies_group_length():
+    layout = layout_of("""
+       01  ORDER-REC.
+           05  ORD-LINE OCCURS 3 TIMES.
+               10  LINE-SKU     PIC X(5).
+               10  LINE-QTY     PIC S9(3) COMP-3.
+           05  ORD-STATUS       PIC X.
+    """)
+    line = layout['ORD-LINE']
+    assert (line.offset, line.element_length, line.occurs, line.length) == (0, 7, 3, 21)
+    assert (layout['LINE-QTY'].offset, layout['LINE-QTY'].length) == (5, 2)
+    assert layout['ORD-STATUS'].offset == 21
+    assert layout['ORDER-REC'].length == 22
+
+
+def test_occurs_depending_on_uses_maximum():
+    layout = layout_of("""
+       01  ORDER-REC.
+           05  ORD-COUNT        PIC 9(2).
+           05  ORD-EXTRA        PIC X(4)
+                   OCCURS 1 TO 5 TIMES DEPENDING ON ORD-COUNT.
+           05  ORD-TRAILER      PIC X(3).
+    """)
+    extra = layout['ORD-EXTRA']
+    assert (extra.occurs_min, extra.occurs, extra.depending_on) == (1, 5, 'ORD-COUNT')
+    assert (extra.offset, extra.length) == (2, 20)
+    assert layout['ORD-TRAILER'].offset == 22
+    assert any('1-5 occurrences' in note for note in extra.notes)
+
+
+def test_redefines_shares_offset_and_takes_longest():
+    layout = offsets("""
+       01  DATE-REC.
+           05  ORD-DATE.
+               10  ORD-YYYY     PIC 9(4).
+               10  ORD-MM       PIC 99.
+               10  ORD-DD       PIC 99.
+           05  ORD-DATE-N REDEFINES ORD-DATE PIC 9(8).
+           05  ORD-DATE-X REDEFINES ORD-DATE PIC X(10).
+           05  ORD-FLAG         PIC X.
+    """)
+    assert layout['ORD-DATE'] == (0, 8)
+    assert layout['ORD-DD'] == (6, 2)
+    assert layout['ORD-DATE-N'] == (0, 8)
+    assert layout['ORD-DATE-X'] == (0, 10)
+    # The next field follows the redefined item, not the longer redefinition
+    assert layout['ORD-FLAG'] == (8, 1)
+    assert layout['DATE-REC'] == (0, 10)
+
+
+def test_group_usage_applies_to_children():
+    layout = layout_of("""
+       01  TOTALS-REC.
+           05  ORD-TOTALS COMP-3.
+               10  TOT-NET      PIC S9(7)V99.
+               10  TOT-TAX      PIC S9(5)V99.
+    """)
+    assert layout['TOT-NET'].usage == 'COMP-3'
+    assert (layout['TOT-TAX'].offset, layout['TOT-TAX'].length) == (5, 4)
+    assert layout['ORD-TOTALS'].length == 9
+
+
+def test_condition_names_and_separate_records():
+    records = parse_copybook("""
+       01  STATUS-REC.
+           05  ORD-STATUS       PIC X.
+               88  ORD-OPEN     VALUE 'O'.
+               88  ORD-CLOSED   VALUE 'C' 'X'.
+       01  OTHER-REC            PIC X(10).
+    """)
+    assert [(record.name, record.offset, record.length) for record in records] == [
+        ('STATUS-REC', 0, 1), ('OTHER-REC', 0, 10)
+    ]
+    conditions = records[0].children[0].conditions
+    assert [(condition.name, condition.values) for condition in conditions] == [
+        ('ORD-OPEN', ["'O'"]), ('ORD-CLOSED', ["'C'", "'X'"])
+    ]
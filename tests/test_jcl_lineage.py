@@ -0,0 +1,151 @@
+import pytest
+
+from jcl_lineage import (
+    jcl_statements, split_operands, disp_status, resolve_dataset, parse_jcl, dataset_uses, DatasetLineageIndex,
+    JOB_KIND, PROC_KIND, PRODUCER, CONSUMER
+)
+
+
+PAYPROC = """\
+//PAYPROC  PROC ENV=TEST,CYCLE=DAILY
+//EXTRACT  EXEC PGM=PAYEXTR
+//INPUT    DD DSN=&ENV..PAY.&CYCLE..MASTER,DISP=SHR
+//OUTPUT   DD DSN=&ENV..PAY.EXTRACT(+1),
+//            DISP=(NEW,CATLG,DELETE)
+//REPORT   EXEC PGM=PAYRPT
+//IN       DD DSN=&ENV..PAY.EXTRACT(+1),DISP=SHR
+//         PEND
+"""
+
+PAYJOB = """\
+//PAYJOB   JOB (ACCT),'PAYROLL'
+//         SET CYCLE=WEEKLY
+//STEP1    EXEC PAYPROC,ENV=PROD
+//EXTRACT.INPUT DD DSN=PROD.PAY.OVERRIDE,DISP=SHR
+//EXTRACT.AUDIT DD DSN=PROD.PAY.AUDIT,DISP=MOD
+//STEP2    EXEC PGM=IEBGENER
+//SYSUT1   DD DSN=PROD.PAY.EXTRACT(0),DISP=SHR
+//SYSUT2   DD DSN=&&TEMP,DISP=(NEW,PASS)
+//SYSUT3   DD DSN=*.STEP1.EXTRACT.OUTPUT,DISP=SHR
+"""
+
+GLJOB = """\
+//GLJOB    JOB (ACCT),'LEDGER'
+//POST     EXEC PGM=GLPOST
+//PAYIN    DD DSN=PROD.PAY.EXTRACT(0),DISP=SHR
+//GLOUT    DD DSN=PROD.GL.POSTINGS,DISP=(NEW,CATLG)
+"""
+
+
+def test_statements_join_continuations_and_skip_comments():
+    statements = list(jcl_statements("//*  COMMENT\n" + PAYPROC))
+    assert statements[0] == (2, 'PAYPROC', 'PROC', 'ENV=TEST,CYCLE=DAILY')
+    assert statements[3] == (5, 'OUTPUT', 'DD', 'DSN=&ENV..PAY.EXTRACT(+1),DISP=(NEW,CATLG,DELETE)')
+
+
+def test_split_operands_respects_parentheses_and_quotes():
+    positional, keywords = split_operands("PAYPROC,PARM='A,B',DISP=(NEW,CATLG),ENV=PROD")
+    assert positional == ['PAYPROC']
+    assert keywords == {'PARM': "'A,B'", 'DISP': '(NEW,CATLG)', 'ENV': 'PROD'}
+
+
+@pytest.mark.parametrize("disp, status", [("", 'NEW'), ("SHR", 'SHR'), ("(MOD,CATLG)", 'MOD'), ("(,KEEP)", 'NEW')])
+def test_disp_status(disp, status):
+    assert disp_status(disp) == status
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("PROD.PAY.MASTER", ('PROD.PAY.MASTER', None)),
+    ("&ENV..PAY.EXTRACT(+1)", ('PROD.PAY.EXTRACT', 1)),
+    ("PROD.PAY.EXTRACT(-2)", ('PROD.PAY.EXTRACT', -2)),
+    ("PROD.SRC.LIB(PAYCALC)", ('PROD.SRC.LIB', None)),
+    ("&&TEMP", None),
+    ("*.STEP1.OUT", None),
+    ("NULLFILE", None),
+])
+def test_resolve_dataset(raw, expected):
+    assert resolve_dataset(raw, {'ENV': 'PROD'}) == expected
+
+
+def test_parse_job_with_in_stream_proc():
+    member = parse_jcl(PAYJOB.replace("//STEP1", PAYPROC + "//STEP1", 1), "/src/PAYJOB.jcl")
+    assert (member.kind, member.name) == (JOB_KIND, 'PAYJOB')
+    assert list(member.procs) == ['PAYPROC']
+    assert [step.name for step in member.steps] == ['STEP1', 'STEP2']
+    assert member.steps[0].proc == 'PAYPROC'
+    assert member.steps[0].parameters == {'ENV': 'PROD'}
+    assert member.steps[0].symbols == {'CYCLE': 'WEEKLY'}
+    assert [(dd.override_step, dd.name) for dd in member.steps[0].dds] == [('EXTRACT', 'INPUT'), ('EXTRACT', 'AUDIT')]
+
+
+def test_parse_cataloged_proc():
+    member = parse_jcl(PAYPROC, "/src/PAYPROC.prc")
+    assert (member.kind, member.name) == (PROC_KIND, 'PAYPROC')
+    assert member.symbols == {'ENV': 'TEST', 'CYCLE': 'DAILY'}
+    assert [(step.name, step.program) for step in member.steps] == [('EXTRACT', 'PAYEXTR'), ('REPORT', 'PAYRPT')]
+
+
+def test_dataset_uses_expand_procs_with_overrides():
+    procs = {'PAYPROC': parse_jcl(PAYPROC, "/src/PAYPROC.prc")}
+    uses = dataset_uses(parse_jcl(PAYJOB, "/src/PAYJOB.jcl"), procs)
+    summary = [(u.step, u.proc_step, u.dd, u.dsn, u.generation, u.role, u.program) for u in uses]
+    assert summary == [
+        # DD override replaces the PROC's DSN but keeps its DISP
+        ('STEP1', 'EXTRACT', 'INPUT', 'PROD.PAY.OVERRIDE', None, CONSUMER, 'PAYEXTR'),
+        # EXEC override beats the PROC default for ENV
+        ('STEP1', 'EXTRACT', 'OUTPUT', 'PROD.PAY.EXTRACT', 1, PRODUCER, 'PAYEXTR'),
+        # A DD not in the PROC step is added to it
+        ('STEP1', 'EXTRACT', 'AUDIT', 'PROD.PAY.AUDIT', None, PRODUCER, 'PAYEXTR'),
+        ('STEP1', 'REPORT', 'IN', 'PROD.PAY.EXTRACT', 1, CONSUMER, 'PAYRPT'),
+        ('STEP2', '', 'SYSUT1', 'PROD.PAY.EXTRACT', 0, CONSUMER, 'IEBGENER'),
+    ]
+    assert uses[0].source_file == "/src/PAYJOB.jcl"
+    assert uses[1].source_file == "/src/PAYPROC.prc"
+
+
+def test_set_symbols_resolve_in_the_proc():
+    job = "//CYCJOB   JOB (ACCT)\n//         SET CYCLE=WEEKLY\n//RUN      EXEC PAYPROC\n"
+    uses = dataset_uses(parse_jcl(job), {'PAYPROC': parse_jcl(PAYPROC)})
+    assert uses[0].dsn == 'TEST.PAY.WEEKLY.MASTER'
+
+
+def test_missing_proc_keeps_job_level_dds():
+    uses = dataset_uses(parse_jcl(PAYJOB), {})
+    assert [(u.proc_step, u.dsn) for u in uses if u.step == 'STEP1'] == [
+        ('EXTRACT', 'PROD.PAY.OVERRIDE'), ('EXTRACT', 'PROD.PAY.AUDIT')
+    ]
+
+
+@pytest.fixture
+def index(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    for name, content in [("PAYPROC.prc", PAYPROC), ("PAYJOB.jcl", PAYJOB), ("GLJOB.jcl", GLJOB)]:
+        (source / name).write_text(content)
+    index = DatasetLineageIndex(str(tmp_path / "lineage.db"))
+    index.build(str(source))
+    yield index
+    index.close()
+
+
+def test_index_links_producers_and_consumers(index):
+    assert {(u.job, u.step, u.generation) for u in index.producers('PROD.PAY.EXTRACT')} == {('PAYJOB', 'STEP1', 1)}
+    assert {u.job for u in index.consumers('prod.pay.extract')} == {'PAYJOB', 'GLJOB'}
+    assert index.downstream_jobs('PAYJOB') == ['GLJOB']
+    assert index.upstream_jobs('GLJOB') == ['PAYJOB']
+    assert index.upstream_jobs('PAYJOB') == []
+
+
+def test_render_context_for_job_and_proc(index, tmp_path):
+    job_context = index.render_context(str(tmp_path / "src" / "GLJOB.jcl"))
+    assert job_context.startswith("Dataset lineage for job GLJOB")
+    assert "PROD.PAY.EXTRACT(0)" in job_context
+    proc_context = index.render_context(str(tmp_path / "src" / "PAYPROC.prc"))
+    assert proc_context.startswith("Dataset lineage for PROC PAYPROC")
+
+
+def test_unchanged_tree_is_not_rebuilt(index, tmp_path):
+    assert index.build(str(tmp_path / "src"))["rebuilt"] == 0
+    (tmp_path / "src" / "GLJOB.jcl").unlink()
+    assert index.build(str(tmp_path / "src"))["rebuilt"] == 1
+    assert index.downstream_jobs('PAYJOB') == []
@@ -0,0 +1,149 @@
+import pytest
+
+# The chunkers reuse CodeChunk and the COBOL chunker from pseudocode, which needs chromadb
+pytest.importorskip("chromadb")
+
+from config import Config  # noqa: E402
+from mainframe_chunkers import (  # noqa: E402
+    JCLChunker, ProcChunker, CLISTChunker, AssemblerChunker, CopybookChunker, COBOLStructuredChunker,
+    chunk_member, get_chunker
+)
+
+
+JOB = """\
+//PAYJOB   JOB (ACCT),'PAYROLL',CLASS=A
+//*  NIGHTLY PAYROLL
+//STEP1    EXEC PGM=PAYCALC
+//INFILE   DD DSN=PROD.PAY.IN,DISP=SHR
+//OUTFILE  DD DSN=PROD.PAY.OUT,
+//            DISP=(NEW,CATLG)
+//         IF (STEP1.RC = 0) THEN
+//STEP2    EXEC PGM=PAYRPT
+//REPORT   DD SYSOUT=*
+//         ENDIF
+"""
+
+PROC = """\
+//PAYPROC  PROC ENV=PROD
+//STEP1    EXEC PGM=PAYCALC
+//INFILE   DD DSN=&ENV..PAY.IN,DISP=SHR
+//STEP2    EXEC PGM=PAYRPT
+//         PEND
+"""
+
+COPYBOOK = """\
+      * CUSTOMER MASTER
+       01  CUSTOMER-REC.
+           05  CUST-ID          PIC X(8).
+           05  CUST-STATUS      PIC X.
+               88  CUST-ACTIVE  VALUE 'A'.
+               88  CUST-CLOSED  VALUE 'C'.
+           05  CUST-NAME        PIC X(30).
+       01  ORDER-REC.
+           05  ORD-ID           PIC 9(6).
+"""
+
+CLIST = """\
+PROC 1 MEMBER
+CONTROL NOMSG
+ALLOC FI(SYSUT1) +
+  DA('PROD.LOAD(&MEMBER)') SHR
+COPYIT: WRITE COPY
+CLEANUP: FREE FI(SYSUT1)
+EXIT CODE(0)
+"""
+
+ASSEMBLER = """\
+PAYASM   CSECT
+         STM   14,12,12(13)
+         BALR  12,0
+         USING *,12
+CALC     DS    0H
+         LA    15,0
+EXIT     LM    14,12,12(13)
+         BR    14
+WORK     DS    F
+REC      DSECT
+RECID    DS    CL8
+         END   PAYASM
+"""
+
+
+def spans(chunks):
+    return [(chunk.start_line, chunk.end_line) for chunk in chunks]
+
+
+def test_jcl_units_are_header_and_steps():
+    assert JCLChunker().split_units(JOB.splitlines(keepends=True)) == [
+        (0, 2, 'JOB HEADER'), (2, 6, 'JOB STEP'), (6, 10, 'CONDITIONAL STEP')
+    ]
+
+
+def test_proc_units_use_proc_section_types():
+    assert ProcChunker().split_units(PROC.splitlines(keepends=True)) == [
+        (0, 1, 'PROC HEADER'), (1, 3, 'PROC STEP'), (3, 5, 'PROC STEP')
+    ]
+
+
+def test_copybook_units_are_records():
+    assert CopybookChunker().split_units(COPYBOOK.splitlines(keepends=True)) == [
+        (0, 1, 'COPYBOOK HEADER'), (1, 7, 'RECORD LAYOUT'), (7, 9, 'RECORD LAYOUT')
+    ]
+
+
+def test_clist_units_are_prologue_and_routines():
+    assert CLISTChunker().split_units(CLIST.splitlines(keepends=True)) == [
+        (0, 4, 'CLIST PROLOGUE'), (4, 5, 'CLIST ROUTINE'), (5, 7, 'CLIST ROUTINE')
+    ]
+
+
+def test_assembler_units_follow_sections_and_routines():
+    assert AssemblerChunker().split_units(ASSEMBLER.splitlines(keepends=True)) == [
+        (0, 4, 'CSECT'), (4, 6, 'ROUTINE'), (6, 9, 'ROUTINE'), (9, 12, 'DSECT')
+    ]
+
+
+def test_small_units_are_packed_up_to_the_budget():
+    chunks = JCLChunker(max_tokens=1000).chunk_text(JOB, "PAYJOB")
+    assert spans(chunks) == [(1, 10)]
+    assert chunks[0].section_type == 'JOB HEADER / JOB STEP / CONDITIONAL STEP'
+    assert chunks[0].file_name == "PAYJOB"
+
+
+@pytest.mark.parametrize("chunker, source", [
+    (JCLChunker, JOB), (ProcChunker, PROC), (CopybookChunker, COPYBOOK),
+    (CLISTChunker, CLIST), (AssemblerChunker, ASSEMBLER),
+])
+@pytest.mark.parametrize("max_tokens", [5, 20, 1000])
+def test_chunks_cover_every_line_once(chunker, source, max_tokens):
+    chunks = chunker(max_tokens=max_tokens).chunk_text(source, "MEMBER")
+    assert ''.join(chunk.content for chunk in chunks) == source
+    assert chunks[0].start_line == 1
+    assert all(b.start_line == a.end_line + 1 for a, b in zip(chunks, chunks[1:]))
+    max_chars = max_tokens * Config.CHARS_PER_TOKEN
+    # Only a single line longer than the budget may exceed it
+    assert all(len(chunk.content) <= max_chars or chunk.start_line == chunk.end_line for chunk in chunks)
+
+
+def test_oversized_step_splits_at_dd_statements():
+    chunks = JCLChunker(max_tokens=20).chunk_text(JOB, "PAYJOB")
+    starts = {chunk.start_line for chunk in chunks}
+    assert 5 in starts      # //OUTFILE DD
+    assert 6 not in starts  # its continuation stays with it
+
+
+def test_oversized_record_keeps_condition_names_with_their_field():
+    lines = COPYBOOK.splitlines()
+    chunks = CopybookChunker(max_tokens=35).chunk_text(COPYBOOK, "CUSTREC")
+    assert any(chunk.start_line == 4 for chunk in chunks)  # the record was split at CUST-STATUS
+    for chunk in chunks:
+        assert ' 88 ' not in lines[chunk.start_line - 1]
+
+
+def test_chunk_member_classifies_when_type_is_unknown():
+    chunks = chunk_member(JOB, "PAYJOB")
+    assert chunks[0].section_type.startswith('JOB HEADER')
+
+
+def test_unknown_types_use_cobol_rules():
+    assert isinstance(get_chunker('UNKNOWN'), COBOLStructuredChunker)
@@ -0,0 +1,109 @@
+import pytest
+
+from member_classifier import (
+    classify_member, classify_files, JCL_TYPE, PROC_TYPE, CLIST_TYPE, COBOL_TYPE, ASSEMBLER_TYPE,
+    COPYBOOK_TYPE, UNKNOWN_TYPE
+)
+
+
+COBOL_PROGRAM = """\
+000100 IDENTIFICATION DIVISION.
+000200 PROGRAM-ID. PAYCALC.
+000300*    COMPUTES NET PAY
+000400 ENVIRONMENT DIVISION.
+000500 DATA DIVISION.
+000600 WORKING-STORAGE SECTION.
+000700 01  WS-TOTAL               PIC 9(7)V99.
+000800 PROCEDURE DIVISION.
+000900     GOBACK.
+"""
+
+COPYBOOK = """\
+       01  CUSTOMER-REC.
+           05  CUST-ID          PIC X(8).
+           05  CUST-NAME        PIC X(30).
+           05  CUST-STATUS      PIC X.
+               88  CUST-ACTIVE  VALUE 'A'.
+           05  CUST-BALANCE     PIC S9(7)V99 COMP-3.
+"""
+
+JOB = """\
+//PAYJOB   JOB (ACCT),'PAYROLL',CLASS=A
+//*  NIGHTLY PAYROLL
+//STEP1    EXEC PGM=PAYCALC
+//INFILE   DD DSN=PROD.PAY.IN,DISP=SHR
+//OUTFILE  DD DSN=PROD.PAY.OUT,DISP=(NEW,CATLG)
+"""
+
+PROC = """\
+//PAYPROC  PROC ENV=PROD
+//STEP1    EXEC PGM=PAYCALC
+//INFILE   DD DSN=&ENV..PAY.IN,DISP=SHR
+//         PEND
+"""
+
+CLIST = """\
+PROC 1 MEMBER
+CONTROL NOMSG NOLIST
+ALLOC FI(SYSUT1) DA('PROD.LOAD(&MEMBER)') SHR
+WRITE COPY COMPLETE
+FREE FI(SYSUT1)
+EXIT CODE(0)
+"""
+
+ASSEMBLER = """\
+PAYASM   CSECT
+         STM   14,12,12(13)
+         BALR  12,0
+         USING *,12
+         LA    15,0
+         LM    14,12,12(13)
+         BR    14
+         LTORG
+         END   PAYASM
+"""
+
+
+@pytest.mark.parametrize("content, expected", [
+    (COBOL_PROGRAM, COBOL_TYPE),
+    (COPYBOOK, COPYBOOK_TYPE),
+    (JOB, JCL_TYPE),
+    (PROC, PROC_TYPE),
+    (CLIST, CLIST_TYPE),
+    (ASSEMBLER, ASSEMBLER_TYPE),
+])
+def test_classifies_members_without_extension(content, expected):
+    result = classify_member(content, "MEMBER")
+    assert result.prog_type == expected
+    assert result.confidence > 0.5
+
+
+def test_copybook_levels_inside_program_do_not_count():
+    result = classify_member(COBOL_PROGRAM)
+    assert result.scores[COPYBOOK_TYPE] == 0
+
+
+def test_extension_hint_only_breaks_ties():
+    # A misleading extension does not override clear content
+    assert classify_member(JOB, "PAYJOB.cbl").prog_type == JCL_TYPE
+    # A short member with little evidence follows its extension
+    assert classify_member("       01  WS-FLAG PIC X.\n", "FLAG.cpy").prog_type == COPYBOOK_TYPE
+
+
+def test_unrecognised_content_is_unknown():
+    result = classify_member("just some release notes\nnothing to see here\n")
+    assert (result.prog_type, result.confidence) == (UNKNOWN_TYPE, 0.0)
+
+
+def test_comments_are_ignored():
+    commented = "//* //NOTAJOB  JOB\n" + "\n".join("      * PROCEDURE DIVISION." for _ in range(5)) + "\n"
+    assert classify_member(commented).prog_type == UNKNOWN_TYPE
+
+
+def test_classify_files_reports_unreadable_members(tmp_path):
+    member = tmp_path / "PAYJOB"
+    member.write_text(JOB)
+    missing = str(tmp_path / "MISSING")
+    results = classify_files([str(member), missing])
+    assert results[str(member)].prog_type == JCL_TYPE
+    assert results[missing].prog_type == UNKNOWN_TYPE
@@ -0,0 +1,37 @@
+import os
+import importlib.util
+from importlib.machinery import SourceFileLoader
+
+import pytest
+
+# The backend is deployed as backend_parser; the file in this tree has no extension
+BACKEND_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'estimation_backend')
+loader = SourceFileLoader('backend_parser', BACKEND_PATH)
+spec = importlib.util.spec_from_loader('backend_parser', loader)
+backend = importlib.util.module_from_spec(spec)
+loader.exec_module(backend)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("$25,000", (25000.0, 25000.0)),
+    ("1.5M", (1500000.0, 1500000.0)),
+    ("2500.0", (2500.0, 2500.0)),
+    ("10-20k", (10000.0, 20000.0)),
+    ("$10k-$20k", (10000.0, 20000.0)),
+    ("$10,000 to $20,000", (10000.0, 20000.0)),
+    ("£10k – £20k", (10000.0, 20000.0)),
+    ("USD 10,000 - USD 20,000", (10000.0, 20000.0)),
+    ("20k-10k", (10000.0, 20000.0)),
+    ("3 to 4 million", (3000000.0, 4000000.0)),
+])
+def test_parse_cost(text, expected):
+    assert backend.parse_cost(text) == expected
+
+
+def test_parse_cost_without_amount():
+    assert backend.parse_cost("TBD") is None
+
+
+def test_parse_cost_two_amounts_not_a_range():
+    # Only a separator makes two amounts a range
+    assert backend.parse_cost("$10k plus $2k contingency") == (10000.0, 10000.0)
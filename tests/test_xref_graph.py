@@ -0,0 +1,138 @@
+import pytest
+
+from xref_graph import (
+    CrossReferenceGraph, extract_cobol_edges, extract_jcl_edges, CALLS, COPIES, LINKS, XCTLS, READS, WRITES,
+    EXECUTES, RUNS_STEP, PROGRAM_NODE, JOB_NODE, STEP_NODE, DATASET_NODE, TABLE_NODE, COPYBOOK_NODE
+)
+
+
+PAYCALC = """\
+       IDENTIFICATION DIVISION.
+       PROGRAM-ID. PAYCALC.
+       DATA DIVISION.
+       WORKING-STORAGE SECTION.
+           COPY PAYREC.
+      *    CALL 'COMMENTED'.
+           EXEC SQL INCLUDE SQLCA END-EXEC.
+       PROCEDURE DIVISION.
+           CALL 'DATEUTL' USING WS-DATE.
+           EXEC SQL
+               SELECT RATE INTO :WS-RATE
+               FROM PAY.RATES R JOIN PAY.GRADES G ON R.GRADE = G.GRADE
+           END-EXEC.
+           EXEC SQL UPDATE PAY.HISTORY SET AMT = 0 END-EXEC.
+           EXEC CICS LINK PROGRAM('AUDITPGM') END-EXEC.
+           EXEC CICS XCTL PROGRAM('MENUPGM') END-EXEC.
+           GOBACK.
+"""
+
+PAYREC = """\
+       01  PAY-REC.
+           05  PAY-ID           PIC X(8).
+"""
+
+JOBA = """\
+//JOBA     JOB (ACCT),'A'
+//STEP1    EXEC PGM=SORT
+//SORTIN   DD DSN=PROD.A.IN,DISP=SHR
+//SORTOUT  DD DSN=PROD.A.OUT,DISP=(NEW,CATLG)
+//STEP2    EXEC PGM=PAYCALC
+//IN       DD DSN=PROD.A.OUT,DISP=SHR
+//OUT      DD DSN=PROD.A.RPT,DISP=(NEW,CATLG)
+"""
+
+JOBB = """\
+//JOBB     JOB (ACCT),'B'
+//STEP1    EXEC PGM=SORT
+//SORTIN   DD DSN=PROD.B.IN,DISP=SHR
+//SORTOUT  DD DSN=PROD.B.OUT,DISP=(NEW,CATLG)
+"""
+
+
+def edge_set(edges):
+    return {(e.src_kind, e.src, e.relation, e.dst_kind, e.dst) for e in edges}
+
+
+@pytest.fixture
+def graph(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    for name, content in [("PAYCALC.cbl", PAYCALC), ("PAYREC.cpy", PAYREC), ("JOBA.jcl", JOBA), ("JOBB.jcl", JOBB)]:
+        (source / name).write_text(content)
+    graph = CrossReferenceGraph(str(tmp_path / "xref.db"))
+    graph.scan_directory(str(source))
+    yield graph
+    graph.close()
+
+
+def test_cobol_edges():
+    edges = edge_set(extract_cobol_edges(PAYCALC, (PROGRAM_NODE, 'PAYCALC')))
+    program = (PROGRAM_NODE, 'PAYCALC')
+    assert edges == {
+        (*program, COPIES, COPYBOOK_NODE, 'PAYREC'),
+        (*program, CALLS, PROGRAM_NODE, 'DATEUTL'),
+        (*program, READS, TABLE_NODE, 'PAY.RATES'),
+        (*program, READS, TABLE_NODE, 'PAY.GRADES'),
+        (*program, WRITES, TABLE_NODE, 'PAY.HISTORY'),
+        (*program, LINKS, PROGRAM_NODE, 'AUDITPGM'),
+        (*program, XCTLS, PROGRAM_NODE, 'MENUPGM'),
+    }
+
+
+def test_jcl_dd_edges_belong_to_the_step():
+    edges = edge_set(extract_jcl_edges(JOBA, (JOB_NODE, 'JOBA')))
+    assert (JOB_NODE, 'JOBA', RUNS_STEP, STEP_NODE, 'JOBA.STEP1') in edges
+    assert (JOB_NODE, 'JOBA', EXECUTES, PROGRAM_NODE, 'SORT') in edges
+    assert (STEP_NODE, 'JOBA.STEP1', EXECUTES, PROGRAM_NODE, 'SORT') in edges
+    assert (STEP_NODE, 'JOBA.STEP1', READS, DATASET_NODE, 'PROD.A.IN') in edges
+    assert (STEP_NODE, 'JOBA.STEP2', WRITES, DATASET_NODE, 'PROD.A.RPT') in edges
+    assert not any(src_kind == PROGRAM_NODE for src_kind, *_ in edges)
+
+
+def test_symbolic_dataset_names_resolve_from_proc_defaults():
+    proc = """\
+//PAYPROC  PROC ENV=PROD
+//STEP1    EXEC PGM=PAYCALC
+//INFILE   DD DSN=&ENV..PAY.IN,DISP=SHR
+//         PEND
+"""
+    edges = edge_set(extract_jcl_edges(proc, ('PROC', 'PAYPROC')))
+    assert (STEP_NODE, 'PAYPROC.STEP1', READS, DATASET_NODE, 'PROD.PAY.IN') in edges
+
+
+def test_impact_does_not_cross_shared_utilities(graph):
+    affected = {(kind, name) for kind, name, _ in graph.impact('PROD.A.IN', DATASET_NODE)}
+    assert (DATASET_NODE, 'PROD.A.OUT') in affected
+    assert (DATASET_NODE, 'PROD.A.RPT') in affected
+    assert (JOB_NODE, 'JOBA') in affected
+    assert (DATASET_NODE, 'PROD.B.OUT') not in affected
+    assert (JOB_NODE, 'JOBB') not in affected
+
+
+def test_impact_of_a_copybook_reaches_programs_and_jobs(graph):
+    affected = {(kind, name): depth for kind, name, depth in graph.impact('PAYREC', COPYBOOK_NODE)}
+    assert affected[(PROGRAM_NODE, 'PAYCALC')] == 1
+    assert (JOB_NODE, 'JOBA') in affected
+    assert (DATASET_NODE, 'PROD.A.RPT') in affected
+
+
+def test_dependencies_follow_producers(graph):
+    needed = {(kind, name) for kind, name, _ in graph.dependencies('PROD.A.RPT', DATASET_NODE)}
+    assert {(STEP_NODE, 'JOBA.STEP2'), (PROGRAM_NODE, 'PAYCALC'), (DATASET_NODE, 'PROD.A.OUT'),
+            (DATASET_NODE, 'PROD.A.IN'), (COPYBOOK_NODE, 'PAYREC')} <= needed
+    assert (DATASET_NODE, 'PROD.B.IN') not in needed
+
+
+def test_render_context_lists_a_programs_datasets(graph, tmp_path):
+    context = graph.render_context(str(tmp_path / "src" / "PAYCALC.cbl"))
+    assert "JOB JOBA EXECUTES this member (STEP2)" in context
+    assert "STEP JOBA.STEP2 WRITES DATASET PROD.A.RPT" in context
+    assert "PROD.A.OUT is produced by STEP JOBA.STEP1" in context
+
+
+def test_rescan_skips_unchanged_and_drops_removed_members(graph, tmp_path):
+    source = tmp_path / "src"
+    (source / "JOBB.jcl").unlink()
+    stats = graph.scan_directory(str(source))
+    assert (stats["indexed"], stats["unchanged"], stats["removed"]) == (0, 3, 1)
+    assert graph.neighbors('JOBB', JOB_NODE) == []
@@ -105,4 +105,3 @@ Please provide comprehensive, step-by-step explanations that would allow process
 
 {code_content}
 """
-"""
@@ -0,0 +1,530 @@
+import os
+import re
+import bisect
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple, Iterator
+
+from config import Config
+from member_classifier import (
+    classify_member, JCL_TYPE, PROC_TYPE, CLIST_TYPE, COBOL_TYPE, ASSEMBLER_TYPE, COPYBOOK_TYPE
+)
+from jcl_lineage import jcl_statements, split_operands, disp_status, resolve_dataset
+
+
+# Node kinds
+PROGRAM_NODE = 'PROGRAM'
+COPYBOOK_NODE = 'COPYBOOK'
+JOB_NODE = 'JOB'
+PROC_NODE = 'PROC'
+STEP_NODE = 'STEP'
+CLIST_NODE = 'CLIST'
+DATASET_NODE = 'DATASET'
+TABLE_NODE = 'TABLE'
+
+# Edge relations; every relation points from the dependent node to what it depends
+# on, except WRITES which points from the producer to the data it produces
+CALLS = 'CALLS'
+LINKS = 'LINKS'
+XCTLS = 'XCTLS'
+COPIES = 'COPIES'
+EXECUTES = 'EXECUTES'
+RUNS_PROC = 'RUNS_PROC'
+RUNS_STEP = 'RUNS_STEP'
+INCLUDES = 'INCLUDES'
+READS = 'READS'
+WRITES = 'WRITES'
+
+# Bumped when extraction changes, so scan_directory re-indexes unchanged members
+XREF_VERSION = 2
+
+# System utilities run by steps of unrelated jobs; traversals never pass through them,
+# otherwise every job that sorts or copies a file would look connected
+UTILITY_PROGRAMS = {
+    'SORT', 'DFSORT', 'SYNCSORT', 'ICEMAN', 'ICETOOL', 'ICEGENER', 'IEBGENER', 'IEBCOPY', 'IEBCOMPR',
+    'IEBPTPCH', 'IEBUPDTE', 'IEFBR14', 'IDCAMS', 'IKJEFT01', 'IKJEFT1A', 'IKJEFT1B', 'IEHLIST',
+    'IEHPROGM', 'ADRDSSU', 'DSNUTILB', 'DFHCSDUP', 'FTP', 'BPXBATCH',
+}
+
+MEMBER_NODE_KINDS = {
+    COBOL_TYPE: PROGRAM_NODE,
+    ASSEMBLER_TYPE: PROGRAM_NODE,
+    COPYBOOK_TYPE: COPYBOOK_NODE,
+    JCL_TYPE: JOB_NODE,
+    PROC_TYPE: PROC_NODE,
+    CLIST_TYPE: CLIST_NODE,
+}
+
+NAME = r"[A-Z0-9@#$][A-Z0-9@#$_-]*"
+
+COBOL_PROGRAM_ID = re.compile(rf"\bPROGRAM-ID\s*\.?\s*['\"]?({NAME})")
+COBOL_CALL = re.compile(rf"\bCALL\s+['\"]({NAME})['\"]")
+COBOL_COPY = re.compile(rf"(?:^|\s)(?:COPY|\+\+INCLUDE|-INC)\s+['\"]?({NAME})")
+EXEC_BLOCK = re.compile(r"\bEXEC\s+(SQL|CICS)\b(.*?)\bEND-EXEC\b", re.DOTALL)
+CICS_TRANSFER = re.compile(rf"\b(LINK|XCTL)\b.*?\bPROGRAM\s*\(\s*['\"]({NAME})['\"]\s*\)")
+SQL_INCLUDE = re.compile(rf"^\s*INCLUDE\s+({NAME})")
+SQL_WRITE = re.compile(rf"\b(?:INSERT INTO|UPDATE|DELETE FROM|MERGE INTO)\s+({NAME}(?:\.{NAME})?)")
+SQL_SOURCES = re.compile(
+    r"(?<!DELETE )\b(?:FROM|JOIN)\s+(.*?)(?=\b(?:WHERE|GROUP|ORDER|HAVING|FETCH|FOR|UNION|EXCEPT|INTERSECT|"
+    r"WITH|ON|INNER|LEFT|RIGHT|FULL|CROSS|JOIN|SET|VALUES)\b|\)|$)"
+)
+SQL_RESERVED_INCLUDES = {'SQLCA', 'SQLDA'}
+
+ASM_STATEMENT = re.compile(r"^(\S*)\s+(CALL|LINK|XCTL|LOAD|COPY)\s+(\S+)")
+ASM_ENTRY_POINT = re.compile(rf"\bEP=\(?({NAME})")
+CLIST_CALL = re.compile(rf"\bCALL\s+'[^'(]*\(({NAME})\)'")
+
+JCL_INCLUDE = re.compile(rf"(?:^|,)MEMBER=({NAME})")
+
+
+@dataclass
+class XrefEdge:
+    """One indexed relationship between two nodes of the cross-reference graph"""
+    src_kind: str
+    src: str
+    relation: str
+    dst_kind: str
+    dst: str
+    file_path: str = ""
+    line: int = 0
+    context: str = ""
+
+
+def _code_lines(content: str) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, code text) without sequence areas or comment lines"""
+    for line_no, line in enumerate(content.upper().splitlines(), 1):
+        if len(line) > 6 and (line[:6].strip() == '' or line[:6].strip().isdigit()):
+            if line[6:7] in ('*', '/'):
+                continue
+            yield line_no, line[7:72]
+        elif not line.lstrip().startswith('*'):
+            yield line_no, line[:72]
+
+
+def member_name(file_path: str) -> str:
+    return os.path.splitext(os.path.basename(file_path))[0].upper()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(f"{XREF_VERSION}:{content}".encode('utf-8', errors='ignore')).hexdigest()
+
+
+def extract_cobol_edges(content: str, node: Tuple[str, str], file_path: str = "") -> List[XrefEdge]:
+    """CALL, COPY, EXEC SQL tables and EXEC CICS LINK/XCTL for a COBOL program or copybook"""
+    kind, name = node
+    edges = []
+    code = list(_code_lines(content))
+
+    for line_no, text in code:
+        for match in COBOL_CALL.finditer(text):
+            edges.append(XrefEdge(kind, name, CALLS, PROGRAM_NODE, match.group(1), file_path, line_no))
+        if 'EXEC ' not in text:
+            for match in COBOL_COPY.finditer(text):
+                edges.append(XrefEdge(kind, name, COPIES, COPYBOOK_NODE, match.group(1), file_path, line_no))
+
+    # EXEC blocks span lines: search the joined text and map offsets back to line numbers
+    joined = "\n".join(text for _, text in code)
+    line_starts = []
+    position = 0
+    for _, text in code:
+        line_starts.append(position)
+        position += len(text) + 1
+
+    for block in EXEC_BLOCK.finditer(joined):
+        line_no = code[bisect.bisect_right(line_starts, block.start()) - 1][0]
+        body = ' '.join(block.group(2).split())
+        if block.group(1) == 'CICS':
+            for match in CICS_TRANSFER.finditer(body):
+                relation = LINKS if match.group(1) == 'LINK' else XCTLS
+                edges.append(XrefEdge(kind, name, relation, PROGRAM_NODE, match.group(2), file_path, line_no))
+            continue
+
+        include = SQL_INCLUDE.match(body)
+        if include:
+            if include.group(1) not in SQL_RESERVED_INCLUDES:
+                edges.append(XrefEdge(kind, name, COPIES, COPYBOOK_NODE, include.group(1), file_path, line_no))
+            continue
+        if body.startswith('DECLARE') and ' TABLE' in body.split('(')[0]:
+            continue  # DCLGEN table declaration, not an access
+
+        for match in SQL_WRITE.finditer(body):
+            edges.append(XrefEdge(kind, name, WRITES, TABLE_NODE, match.group(1), file_path, line_no))
+        for match in SQL_SOURCES.finditer(body):
+            for source in match.group(1).split(','):
+                table = source.strip().split(' ')[0]
+                if table and re.fullmatch(rf"{NAME}(?:\.{NAME})?", table):
+                    edges.append(XrefEdge(kind, name, READS, TABLE_NODE, table, file_path, line_no))
+
+    return edges
+
+
+def extract_jcl_edges(content: str, node: Tuple[str, str], file_path: str = "") -> List[XrefEdge]:
+    """EXEC PGM/PROC, INCLUDE and DD DSN producers/consumers for a job or PROC
+
+    DD datasets are attributed to a JOB.STEP node rather than to the program the
+    step runs, so two jobs running the same program on different data stay apart.
+    """
+    kind, name = node
+    edges = []
+    actor = node
+    step = ""
+    step_count = 0
+    symbols: Dict[str, str] = {}
+
+    for line_no, label, operation, operands in jcl_statements(content):
+        positional, keywords = split_operands(operands)
+        if operation in ('PROC', 'SET'):
+            # PROC defaults and SET values, so symbolic DSNs resolve to real dataset names
+            symbols.update(keywords)
+        elif operation == 'PEND':
+            symbols = {}
+        elif operation == 'EXEC':
+            step_count += 1
+            step = label or f"#{step_count}"
+            actor = (STEP_NODE, f"{name}.{step}")
+            edges.append(XrefEdge(kind, name, RUNS_STEP, STEP_NODE, actor[1], file_path, line_no, step))
+            if 'PGM' in keywords:
+                edges.append(XrefEdge(kind, name, EXECUTES, PROGRAM_NODE, keywords['PGM'], file_path, line_no, step))
+                edges.append(XrefEdge(*actor, EXECUTES, PROGRAM_NODE, keywords['PGM'], file_path, line_no, step))
+            elif 'PROC' in keywords or positional:
+                proc_name = keywords.get('PROC') or positional[0]
+                edges.append(XrefEdge(kind, name, RUNS_PROC, PROC_NODE, proc_name, file_path, line_no, step))
+                edges.append(XrefEdge(*actor, RUNS_PROC, PROC_NODE, proc_name, file_path, line_no, step))
+        elif operation == 'INCLUDE':
+            member = JCL_INCLUDE.search(operands)
+            if member:
+                edges.append(XrefEdge(kind, name, INCLUDES, PROC_NODE, member.group(1), file_path, line_no))
+        elif operation == 'DD':
+            resolved = resolve_dataset(keywords.get('DSN', keywords.get('DSNAME', '')), symbols)
+            if not resolved:
+                continue
+            dataset = resolved[0]
+            status = disp_status(keywords.get('DISP', ''))
+            relation = WRITES if status in ('NEW', 'MOD') else READS
+            context = f"{name}.{step}.{label}" if step else label
+            edges.append(XrefEdge(actor[0], actor[1], relation, DATASET_NODE, dataset, file_path, line_no, context))
+
+    return edges
+
+
+def extract_assembler_edges(content: str, node: Tuple[str, str], file_path: str = "") -> List[XrefEdge]:
+    """CALL/LINK/XCTL/LOAD targets and COPY members of an Assembler program"""
+    kind, name = node
+    edges = []
+    for line_no, line in enumerate(content.upper().splitlines(), 1):
+        if line.startswith('*') or line.startswith('.*'):
+            continue
+        match = ASM_STATEMENT.match(line[:71])
+        if not match:
+            continue
+        operation, operand = match.group(2), match.group(3)
+        if operation == 'COPY':
+            edges.append(XrefEdge(kind, name, COPIES, COPYBOOK_NODE, operand, file_path, line_no))
+        elif operation == 'CALL':
+            target = operand.split(',')[0].strip('()')
+            if re.fullmatch(NAME, target):
+                edges.append(XrefEdge(kind, name, CALLS, PROGRAM_NODE, target, file_path, line_no))
+        else:
+            entry = ASM_ENTRY_POINT.search(operand)
+            if entry:
+                relation = XCTLS if operation == 'XCTL' else LINKS
+                edges.append(XrefEdge(kind, name, relation, PROGRAM_NODE, entry.group(1), file_path, line_no))
+    return edges
+
+
+def extract_clist_edges(content: str, node: Tuple[str, str], file_path: str = "") -> List[XrefEdge]:
+    kind, name = node
+    return [
+        XrefEdge(kind, name, CALLS, PROGRAM_NODE, match.group(1), file_path, line_no)
+        for line_no, line in enumerate(content.upper().splitlines(), 1)
+        for match in CLIST_CALL.finditer(line)
+    ]
+
+
+EXTRACTORS = {
+    COBOL_TYPE: extract_cobol_edges,
+    COPYBOOK_TYPE: extract_cobol_edges,
+    JCL_TYPE: extract_jcl_edges,
+    PROC_TYPE: extract_jcl_edges,
+    ASSEMBLER_TYPE: extract_assembler_edges,
+    CLIST_TYPE: extract_clist_edges,
+}
+
+
+def member_node(content: str, file_path: str, prog_type: str) -> Tuple[str, str]:
+    """The graph node a member defines (COBOL PROGRAM-ID or JOB name when present)"""
+    name = member_name(file_path)
+    if prog_type == COBOL_TYPE:
+        match = COBOL_PROGRAM_ID.search(content.upper())
+        if match:
+            name = match.group(1)
+    elif prog_type == JCL_TYPE:
+        for _, label, operation, _ in jcl_statements(content):
+            if operation == 'JOB' and label:
+                name = label
+                break
+    return MEMBER_NODE_KINDS.get(prog_type, PROGRAM_NODE), name
+
+
+class CrossReferenceGraph:
+    """Persistent inter-program cross-reference graph stored in SQLite"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS members (
+        file_path TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        member_type TEXT NOT NULL,
+        node_kind TEXT NOT NULL,
+        node_name TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        scanned_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_members_node ON members(node_name, node_kind);
+    CREATE INDEX IF NOT EXISTS idx_members_file_name ON members(file_name);
+
+    CREATE TABLE IF NOT EXISTS edges (
+        src_kind TEXT NOT NULL,
+        src TEXT NOT NULL,
+        relation TEXT NOT NULL,
+        dst_kind TEXT NOT NULL,
+        dst TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        line INTEGER,
+        context TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_edges_src ON edges(src, src_kind, relation);
+    CREATE INDEX IF NOT EXISTS idx_edges_dst ON edges(dst, dst_kind, relation);
+    CREATE INDEX IF NOT EXISTS idx_edges_file ON edges(file_path);
+    """
+
+    def __init__(self, db_path: str = Config.XREF_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ----- indexing -----
+
+    def index_member(self, file_path: str, content: str, prog_type: Optional[str] = None) -> int:
+        """(Re)index one member; returns the number of edges stored"""
+        file_path = os.path.abspath(file_path)
+        if prog_type is None:
+            prog_type = classify_member(content, file_path).prog_type
+
+        extractor = EXTRACTORS.get(prog_type)
+        if extractor is None:
+            return 0
+
+        node = member_node(content, file_path, prog_type)
+        edges = extractor(content, node, file_path)
+
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM edges WHERE file_path = ?", (file_path,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_path, os.path.basename(file_path), prog_type, node[0], node[1],
+                 content_hash(content), datetime.now().isoformat())
+            )
+            self.conn.executemany(
+                "INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(e.src_kind, e.src, e.relation, e.dst_kind, e.dst, e.file_path, e.line, e.context) for e in edges]
+            )
+        return len(edges)
+
+    def scan_directory(self, source_dir: str, extensions: Optional[List[str]] = None) -> Dict[str, int]:
+        """Index every member under source_dir, skipping members whose content is unchanged"""
+        wanted = {ext.lower() for ext in extensions} if extensions else None
+        with self.lock:
+            known = dict(self.conn.execute("SELECT file_path, content_hash FROM members").fetchall())
+
+        stats = {"scanned": 0, "unchanged": 0, "indexed": 0, "edges": 0, "removed": 0}
+        seen = set()
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.') or (wanted is not None and os.path.splitext(name)[1].lower() not in wanted):
+                    continue
+                file_path = os.path.abspath(os.path.join(root, name))
+                seen.add(file_path)
+                stats["scanned"] += 1
+                try:
+                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                        content = f.read()
+                except OSError as e:
+                    print(f"Error reading {file_path}: {e}")
+                    continue
+
+                if known.get(file_path) == content_hash(content):
+                    stats["unchanged"] += 1
+                    continue
+                stats["edges"] += self.index_member(file_path, content)
+                stats["indexed"] += 1
+
+        # Members deleted from the tree take their edges with them
+        root_prefix = os.path.join(os.path.abspath(source_dir), '')
+        removed = [
+            path for path in known
+            if path.startswith(root_prefix) and path not in seen
+            and (wanted is None or os.path.splitext(path)[1].lower() in wanted)
+        ]
+        if removed:
+            with self.lock, self.conn:
+                self.conn.executemany("DELETE FROM edges WHERE file_path = ?", [(p,) for p in removed])
+                self.conn.executemany("DELETE FROM members WHERE file_path = ?", [(p,) for p in removed])
+        stats["removed"] = len(removed)
+
+        print(f"Cross-reference scan: {stats['indexed']} indexed, {stats['unchanged']} unchanged, "
+              f"{stats['removed']} removed, {stats['edges']} edges")
+        return stats
+
+    # ----- queries -----
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def nodes_for_file(self, file_name: str) -> List[Tuple[str, str]]:
+        """Nodes defined by a member, looked up by path or base file name"""
+        rows = self._query(
+            "SELECT node_kind, node_name FROM members WHERE file_path = ? OR file_name = ?",
+            (os.path.abspath(file_name), os.path.basename(file_name))
+        )
+        return list(dict.fromkeys((row[0], row[1]) for row in rows))
+
+    def neighbors(self, name: str, kind: Optional[str] = None, direction: str = "both",
+                  relations: Optional[List[str]] = None) -> List[XrefEdge]:
+        """Edges touching a node; direction is 'out', 'in' or 'both'"""
+        relation_filter = ""
+        params_extra: tuple = ()
+        if relations:
+            relation_filter = f" AND relation IN ({','.join('?' * len(relations))})"
+            params_extra = tuple(relations)
+
+        queries = []
+        if direction in ("out", "both"):
+            queries.append((f"SELECT * FROM edges WHERE src = ? AND (? IS NULL OR src_kind = ?){relation_filter}",
+                            (name.upper(), kind, kind) + params_extra))
+        if direction in ("in", "both"):
+            queries.append((f"SELECT * FROM edges WHERE dst = ? AND (? IS NULL OR dst_kind = ?){relation_filter}",
+                            (name.upper(), kind, kind) + params_extra))
+
+        edges = []
+        for sql, params in queries:
+            edges.extend(XrefEdge(*tuple(row)) for row in self._query(sql, params))
+        return edges
+
+    def _traverse(self, name: str, kind: Optional[str], max_depth: int, downstream: bool) -> List[Tuple[str, str, int]]:
+        # Impact (downstream) walks dependency edges backwards and WRITES edges forwards;
+        # dependencies (upstream) do the opposite.
+        back, forward = ("relation != 'WRITES'", "relation = 'WRITES'") if downstream else \
+                        ("relation = 'WRITES'", "relation != 'WRITES'")
+        # Utilities are reported when reached but never expanded (unless they are the start node)
+        utilities = ','.join(f"'{program}'" for program in sorted(UTILITY_PROGRAMS))
+        expand = f"(w.depth = 0 OR NOT (w.kind = '{PROGRAM_NODE}' AND w.name IN ({utilities})))"
+        sql = f"""
+        WITH RECURSIVE walk(kind, name, depth) AS (
+            SELECT ?, ?, 0
+            UNION
+            SELECT e.src_kind, e.src, w.depth + 1 FROM walk w JOIN edges e
+                ON e.dst = w.name AND (w.kind IS NULL OR e.dst_kind = w.kind)
+                WHERE w.depth < ? AND e.{back} AND {expand}
+            UNION
+            SELECT e.dst_kind, e.dst, w.depth + 1 FROM walk w JOIN edges e
+                ON e.src = w.name AND (w.kind IS NULL OR e.src_kind = w.kind)
+                WHERE w.depth < ? AND e.{forward} AND {expand}
+        )
+        SELECT kind, name, MIN(depth) AS depth FROM walk
+        WHERE depth > 0 AND NOT (name = ? AND (? IS NULL OR kind = ?))
+        GROUP BY kind, name ORDER BY depth, kind, name
+        """
+        name = name.upper()
+        rows = self._query(sql, (kind, name, max_depth, max_depth, name, kind, kind))
+        return [(row[0], row[1], row[2]) for row in rows]
+
+    def impact(self, name: str, kind: Optional[str] = None, max_depth: int = 5) -> List[Tuple[str, str, int]]:
+        """Everything affected if the node changes: callers, includers, jobs and data consumers"""
+        return self._traverse(name, kind, max_depth, downstream=True)
+
+    def dependencies(self, name: str, kind: Optional[str] = None, max_depth: int = 5) -> List[Tuple[str, str, int]]:
+        """Everything the node depends on: callees, copybooks, PROCs and data producers"""
+        return self._traverse(name, kind, max_depth, downstream=False)
+
+    def neighbor_files(self, file_names: List[str], limit: int = 10) -> List[Tuple[str, str]]:
+        """(file name, relationship) for members directly connected to the given members"""
+        nodes = []
+        for file_name in file_names:
+            nodes.extend(self.nodes_for_file(file_name))
+        own = {os.path.basename(f) for f in file_names}
+
+        found: Dict[str, str] = {}
+        for kind, name in dict.fromkeys(nodes):
+            for edge in self.neighbors(name, kind):
+                outgoing = edge.src == name and edge.src_kind == kind
+                other = (edge.dst_kind, edge.dst) if outgoing else (edge.src_kind, edge.src)
+                for row in self._query(
+                        "SELECT file_name FROM members WHERE node_name = ? AND node_kind = ?", (other[1], other[0])):
+                    if row[0] not in own and row[0] not in found:
+                        found[row[0]] = (f"{name} {edge.relation} {other[1]}" if outgoing
+                                         else f"{other[1]} {edge.relation} {name}")
+                if len(found) >= limit:
+                    return list(found.items())
+        return list(found.items())
+
+    def render_context(self, file_path: str, max_items: int = 40) -> Optional[str]:
+        """Upstream/downstream summary of a member for documentation prompts"""
+        nodes = self.nodes_for_file(file_path)
+        if not nodes:
+            return None
+
+        abs_path = os.path.abspath(file_path)
+        own_nodes = set(nodes)
+        edges = [edge for kind, name in nodes for edge in self.neighbors(name, kind)]
+        # Jobs and PROCs attribute their DD edges to a node per step
+        edges.extend(XrefEdge(*tuple(row)) for row in self._query(
+            "SELECT * FROM edges WHERE file_path = ?", (abs_path,)))
+        # A program's data is what the steps that run it read and write
+        steps = {
+            (edge.src_kind, edge.src) for edge in edges
+            if edge.src_kind == STEP_NODE and (edge.dst_kind, edge.dst) in own_nodes
+        }
+        for kind, name in sorted(steps):
+            edges.extend(self.neighbors(name, kind, "out", [READS, WRITES]))
+
+        upstream, downstream = [], []
+        for edge in edges:
+            where = f" ({edge.context})" if edge.context else ""
+            if edge.relation == RUNS_STEP or (edge.src_kind == STEP_NODE and edge.relation not in (READS, WRITES)):
+                continue  # Repeats the job-level EXECUTES/RUNS_PROC edge
+            if (edge.src_kind, edge.src) in own_nodes or (edge.src_kind, edge.src) in steps \
+                    or edge.file_path == abs_path:
+                actor = "" if (edge.src_kind, edge.src) in own_nodes else f"{edge.src_kind} {edge.src} "
+                downstream.append(f"- {actor}{edge.relation} {edge.dst_kind} {edge.dst}{where}")
+                if edge.relation == WRITES:
+                    for reader in self.neighbors(edge.dst, edge.dst_kind, "in", [READS]):
+                        downstream.append(f"- {edge.dst} is read by {reader.src_kind} {reader.src}"
+                                          f"{f' ({reader.context})' if reader.context else ''}")
+                elif edge.relation == READS:
+                    for writer in self.neighbors(edge.dst, edge.dst_kind, "in", [WRITES]):
+                        upstream.append(f"- {edge.dst} is produced by {writer.src_kind} {writer.src}"
+                                        f"{f' ({writer.context})' if writer.context else ''}")
+            elif edge.relation != WRITES:
+                upstream.append(f"- {edge.src_kind} {edge.src} {edge.relation} this member{where}")
+
+        if not upstream and not downstream:
+            return None
+
+        upstream = list(dict.fromkeys(upstream))[:max_items]
+        downstream = list(dict.fromkeys(downstream))[:max_items]
+        return (
+            "Cross-reference graph for this member (computed from the whole source tree):\n\n"
+            "Upstream (what uses or feeds it):\n" + ("\n".join(upstream) or "- none found") + "\n\n"
+            "Downstream (what it uses or feeds):\n" + ("\n".join(downstream) or "- none found")
+        )